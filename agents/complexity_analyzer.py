@@ -1,31 +1,96 @@
-def analyze(proc):
-    definition_upper = proc["definition"].upper()
-    lines = proc["definition"].count("\n")
-    
-    # Calculate complexity factors
+import os
+import re
+from core.tsql_lexer import FLAT_NON_CODE_PATTERN, may_nest_comments, segments, CODE
+
+# Comments, literals and delimited identifiers match the unnamed alternatives and come
+# back from findall as "", so one scan yields the bare words of the code in source order.
+# Variables keep their @ prefix, so "@IF" is never mistaken for a keyword.
+_WORD_SCAN_RE = re.compile("(?:" + FLAT_NON_CODE_PATTERN + r")|([A-Z_@#][A-Z0-9_@#$]*)", re.VERBOSE)
+
+# BEGIN followed by one of these starts a statement, not a BEGIN ... END block
+_NON_BLOCK_BEGIN = {"TRAN", "TRANSACTION", "DISTRIBUTED", "DIALOG", "CONVERSATION"}
+
+# Boolean feature columns, in the order returned by extract_features()
+FEATURES = ("cursor", "join", "loops", "conditional", "error_handling", "transactions", "calls", "creates_objects")
+
+def _words(sql):
+    """Upper-cased words of sql, with "" for each comment, literal or delimited identifier."""
+    if may_nest_comments(sql):
+        # Nested block comments need the exact lexer; scan its code segments only
+        sql = " ".join(sql[start:end] for kind, start, end in segments(sql) if kind == CODE)
+    # Upper-casing first matches keywords case-insensitively at a fraction of re.IGNORECASE's cost
+    return _WORD_SCAN_RE.findall(sql.upper())
+
+def extract_features(definition):
+    """
+    Scan a definition once and return (lines, nesting_depth, branch_count, *feature_flags)
+    with flags in FEATURES order. Plain tuple so it is cheap to send back from worker processes.
+    """
+    definition = definition or ""
+    seen = set()
+    depth = 0
+    max_depth = 0
+    branches = 0
+    transactions = False
+    creates_objects = False
+    previous = None
+    for word in _words(definition):
+        if not word:
+            continue
+        if previous == "BEGIN":
+            if word in _NON_BLOCK_BEGIN:
+                transactions = True
+            else:
+                depth += 1
+                max_depth = max(max_depth, depth)
+        if word == "CASE":
+            depth += 1
+            max_depth = max(max_depth, depth)
+        elif word == "END":
+            depth = max(0, depth - 1)
+        elif word == "IF" or word == "WHEN":
+            branches += 1
+        elif previous == "CREATE" and (word == "TABLE" or word == "VIEW"):
+            creates_objects = True
+        seen.add(word)
+        previous = word
+    if previous == "BEGIN":
+        max_depth = max(max_depth, depth + 1)
+    return (
+        definition.count("\n"),
+        max_depth,
+        branches,
+        "CURSOR" in seen,
+        "JOIN" in seen,
+        "WHILE" in seen or "LOOP" in seen,
+        "IF" in seen or "CASE" in seen,
+        "TRY" in seen and "CATCH" in seen,
+        transactions or "TRANSACTION" in seen,
+        "EXEC" in seen or "EXECUTE" in seen,
+        creates_objects
+    )
+
+def describe_factors(lines, cursor, join, loops, conditional, error_handling, transactions, calls, creates_objects):
     factors = []
-    weight = 1
     
     # Check for complexity factors
-    if "CURSOR" in definition_upper:
-        weight = 2
+    if cursor:
         factors.append("Contains CURSOR (2x multiplier)")
-    elif "JOIN" in definition_upper:
-        weight = 1.5
+    elif join:
         factors.append("Contains JOIN operations (1.5x multiplier)")
     
     # Count other complexity indicators
-    if "WHILE" in definition_upper or "LOOP" in definition_upper:
+    if loops:
         factors.append("Contains loops")
-    if "IF" in definition_upper or "CASE" in definition_upper:
+    if conditional:
         factors.append("Contains conditional logic")
-    if "TRY" in definition_upper and "CATCH" in definition_upper:
+    if error_handling:
         factors.append("Contains error handling")
-    if "TRANSACTION" in definition_upper or "BEGIN TRAN" in definition_upper:
+    if transactions:
         factors.append("Contains transaction management")
-    if "EXEC" in definition_upper or "EXECUTE" in definition_upper:
+    if calls:
         factors.append("Calls other procedures/functions")
-    if "CREATE" in definition_upper and ("TABLE" in definition_upper or "VIEW" in definition_upper):
+    if creates_objects:
         factors.append("Creates database objects")
     
     # Add line count factor
@@ -36,15 +101,66 @@ def analyze(proc):
     else:
         factors.append(f"Small procedure ({lines} lines)")
     
+    # Create factors explanation
+    return "; ".join(factors) if factors else "Simple procedure with basic operations"
+
+def analyze(proc):
+    lines, nesting_depth, branch_count, *flags = extract_features(proc["definition"])
+    cursor, join = flags[0], flags[1]
+    
+    # CURSOR doubles the size-based score, JOIN adds half again
+    weight = 2 if cursor else 1.5 if join else 1
+    
     # Calculate final complexity
     complexity = min(10, int((lines / 20) * weight))
     
-    # Create factors explanation
-    factors_explanation = "; ".join(factors) if factors else "Simple procedure with basic operations"
-    
     return {
         "name": proc["name"], 
         "complexity": complexity,
         "lines_of_code": lines,
-        "complexity_factors": factors_explanation
+        "complexity_factors": describe_factors(lines, *flags),
+        "nesting_depth": nesting_depth,
+        "branch_count": branch_count
     }
+
+# Below this much SQL, process start-up costs more than tokenizing in-process
+PARALLEL_THRESHOLD_CHARS = 2_000_000
+
+def analyze_many(procs, workers=None, chunksize=64):
+    """
+    Score many procedures at once and return a pandas DataFrame with the same
+    columns as analyze(), one row per procedure in input order; it can be passed
+    straight to write_csv.
+    Tokenizing is spread over a process pool (workers=1 keeps it in-process) and the
+    weight/score arithmetic runs vectorized over the whole estate.
+    """
+    import numpy as np
+    import pandas as pd
+
+    definitions = [proc["definition"] or "" for proc in procs]
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or sum(len(d) for d in definitions) < PARALLEL_THRESHOLD_CHARS:
+        features = [extract_features(d) for d in definitions]
+    else:
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+        # Spawned, not forked: callers such as the Streamlit worker and per-database threads
+        # are multi-threaded, and a forked child can inherit locks held by other threads
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            features = list(pool.map(extract_features, definitions, chunksize=chunksize))
+
+    table = np.array(features, dtype=np.int64).reshape(len(procs), 3 + len(FEATURES))
+    lines = table[:, 0]
+    flags = table[:, 3:].astype(bool)
+    weight = np.where(flags[:, 0], 2.0, np.where(flags[:, 1], 1.5, 1.0))
+    complexity = np.minimum(10, ((lines / 20) * weight).astype(np.int64))
+
+    factors = [describe_factors(row[0], *map(bool, row[3:])) for row in table.tolist()]
+    return pd.DataFrame({
+        "name": [proc["name"] for proc in procs],
+        "complexity": complexity,
+        "lines_of_code": lines,
+        "complexity_factors": factors,
+        "nesting_depth": table[:, 1],
+        "branch_count": table[:, 2]
+    })
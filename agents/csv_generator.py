@@ -1,5 +1,231 @@
-import pandas as pd
+import csv
+import os
+from datetime import datetime
+from dotenv import load_dotenv
 
-def write_csv(results, path="outputs/analysis.csv"):
-    df = pd.DataFrame(results)
-    df.to_csv(path, index=False)
+# Load environment variables
+load_dotenv('config/settings.env')
+
+DEFAULT_CSV_PATH = "outputs/analysis.csv"
+
+def _fieldnames(rows):
+    """Union of row keys in first-seen order (the same columns pandas would produce)."""
+    names = {}
+    for row in rows:
+        for key in row:
+            names.setdefault(key, None)
+    return list(names)
+
+def _fsync(f):
+    f.flush()
+    os.fsync(f.fileno())
+
+class CsvStreamWriter:
+    """
+    Append analysis rows to <path>.partial as soon as they are produced, so a crashed
+    run keeps everything completed so far. Rows are flushed and fsynced every
+    flush_every rows (CSV_FLUSH_EVERY). finalize() atomically publishes the CSV at path.
+    """
+
+    def __init__(self, path=DEFAULT_CSV_PATH, fieldnames=None, flush_every=None):
+        self.path = path
+        self.partial_path = path + ".partial"
+        self.fieldnames = fieldnames
+        self.flush_every = flush_every or int(os.getenv("CSV_FLUSH_EVERY", "25"))
+        self.rows_written = 0
+        self._pending = 0
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = open(self.partial_path, "w", newline="", encoding="utf-8")
+        self._writer = None
+
+    def append(self, row):
+        if self._writer is None:
+            self.fieldnames = self.fieldnames or list(row)
+            self._writer = csv.DictWriter(self._file, fieldnames=self.fieldnames, extrasaction="ignore", restval="", lineterminator=os.linesep)
+            self._writer.writeheader()
+        self._writer.writerow(row)
+        self.rows_written += 1
+        self._pending += 1
+        if self._pending >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._file.closed:
+            _fsync(self._file)
+            self._pending = 0
+
+    def close(self):
+        """Flush and close without publishing; the .partial file is left for inspection or recovery."""
+        if not self._file.closed:
+            self.flush()
+            self._file.close()
+
+    def finalize(self, rows=None):
+        """
+        Atomically replace path with the finished CSV.
+        If rows is given it is written instead of the streamed rows (e.g. to restore crawl
+        order or include carried-forward rows) and the .partial file is removed.
+        """
+        self.close()
+        if rows is None:
+            os.replace(self.partial_path, self.path)
+            return self.path
+        write_csv(rows, self.path)
+        os.remove(self.partial_path)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        return False
+
+def write_csv(results, path=DEFAULT_CSV_PATH):
+    """Write rows (list of dicts or a DataFrame) to path atomically."""
+    tmp_path = path + ".tmp"
+    if hasattr(results, "to_csv"):
+        results.to_csv(tmp_path, index=False)
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=_fieldnames(results), restval="", lineterminator=os.linesep)
+            writer.writeheader()
+            writer.writerows(results)
+            _fsync(f)
+    os.replace(tmp_path, path)
+
+DEFAULT_DATASET_DIR = "outputs/analysis_dataset"
+DATASET_FORMATS = {"parquet": ".parquet", "arrow": ".arrow"}
+
+# Column types of the analysis dataset; columns not listed here keep the type pyarrow infers.
+# Low-cardinality strings are dictionary-encoded in memory and in the files. run_date and
+# database are partition columns: readers get them from the directory names.
+PARTITION_COLUMNS = ("run_date", "database")
+DATASET_COLUMNS = [
+    ("run_id", "category"),
+    ("schema", "category"),
+    ("sp_name", "string"),
+    ("summary", "string"),
+    ("complexity", "int8"),
+    ("lines_of_code", "int32"),
+    ("complexity_factors", "string"),
+    ("nesting_depth", "int16"),
+    ("branch_count", "int32"),
+    ("last_execution_time", "timestamp"),
+    ("definition_tokens", "int64"),
+    ("prompt_tokens", "int64"),
+    ("execution_count", "int64"),
+    ("executions_per_day", "float64"),
+    ("total_worker_time_ms", "float64"),
+    ("avg_worker_time_ms", "float64"),
+    ("total_elapsed_time_ms", "float64"),
+    ("avg_elapsed_time_ms", "float64"),
+    ("total_logical_reads", "int64"),
+    ("avg_logical_reads", "float64"),
+    ("cached_time", "timestamp"),
+    ("hotness", "float64"),
+    ("priority_score", "float64"),
+]
+
+def dataset_format():
+    """Typed dataset written next to the CSV (ANALYSIS_DATASET_FORMAT): "" (none), "parquet" or "arrow"."""
+    fmt = os.getenv("ANALYSIS_DATASET_FORMAT", "").strip().lower()
+    if fmt and fmt not in DATASET_FORMATS:
+        raise ValueError(f"ANALYSIS_DATASET_FORMAT must be 'parquet' or 'arrow', not '{fmt}'")
+    return fmt
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+    except ImportError as e:
+        raise ImportError("Writing the analysis dataset requires pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+def validate_dataset_format(fmt=None):
+    """
+    The dataset format to write (fmt, else ANALYSIS_DATASET_FORMAT; "" for none), checked
+    along with the pyarrow import so runs fail before any LLM spend rather than at report time.
+    """
+    fmt = fmt or dataset_format()
+    if fmt and fmt not in DATASET_FORMATS:
+        raise ValueError(f"Dataset format must be 'parquet' or 'arrow', not '{fmt}'")
+    if fmt:
+        _import_pyarrow()
+    return fmt
+
+def _timestamp(value):
+    """Crawled times are 'YYYY-MM-DD HH:MM:SS' text, or 'Never executed'/'' when unknown."""
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+def _arrow_type(pa, kind):
+    if kind == "category":
+        return pa.dictionary(pa.int32(), pa.string())
+    if kind == "timestamp":
+        return pa.timestamp("s")
+    return getattr(pa, kind)()
+
+def _table(pa, rows, run_id):
+    """The rows as an Arrow table with DATASET_COLUMNS' types."""
+    names = [name for name, _ in DATASET_COLUMNS]
+    extra = [name for name in _fieldnames(rows) if name not in names and name not in PARTITION_COLUMNS]
+    arrays, fields = [], []
+    for name, kind in DATASET_COLUMNS:
+        if name == "run_id":
+            values = [run_id] * len(rows)
+        elif kind == "timestamp":
+            values = [_timestamp(row.get(name)) for row in rows]
+        else:
+            values = [row.get(name) for row in rows]
+        arrays.append(pa.array(values, type=_arrow_type(pa, kind)))
+        fields.append(name)
+    for name in extra:
+        arrays.append(pa.array([row.get(name) for row in rows]))
+        fields.append(name)
+    return pa.Table.from_arrays(arrays, names=fields)
+
+def write_dataset(rows, run_id, database=None, run_date=None, directory=DEFAULT_DATASET_DIR, fmt=None):
+    """
+    Write rows as a typed dataset partitioned hive-style by run date and database:
+    <directory>/run_date=YYYY-MM-DD/database=<name>/part-<run_id>.parquet (or .arrow).
+    Rows with a "database" column (consolidated reports) are split by it; otherwise they
+    all go under database. Parquet files carry column statistics and dictionary-encoded
+    strings; Arrow IPC files are uncompressed so readers can memory-map them.
+    Each file is written atomically, and rerunning run_id replaces its files.
+    Returns the paths written. Needs pyarrow (an optional dependency).
+    """
+    fmt = fmt or dataset_format() or "parquet"
+    if fmt not in DATASET_FORMATS:
+        raise ValueError(f"Dataset format must be 'parquet' or 'arrow', not '{fmt}'")
+    pa = _import_pyarrow()
+    from urllib.parse import quote
+
+    run_date = run_date or datetime.now().date()
+    partitions = {}
+    for row in rows:
+        partitions.setdefault(row.get("database", database) or "default", []).append(row)
+
+    paths = []
+    for name, partition_rows in partitions.items():
+        table = _table(pa, partition_rows, run_id)
+        # Partition values are URI-encoded in directory names, as pyarrow's hive partitioning expects
+        partition_dir = os.path.join(directory, f"run_date={run_date.isoformat()}", f"database={quote(name, safe='')}")
+        os.makedirs(partition_dir, exist_ok=True)
+        path = os.path.join(partition_dir, f"part-{run_id}{DATASET_FORMATS[fmt]}")
+        tmp_path = path + ".tmp"
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            pq.write_table(table, tmp_path, compression="zstd", use_dictionary=True, write_statistics=True)
+        else:
+            import pyarrow.ipc as ipc
+            with ipc.new_file(tmp_path, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+        paths.append(path)
+    return paths
@@ -1,54 +1,236 @@
+import glob
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
+from docx.opc.constants import RELATIONSHIP_TYPE
+from docx.oxml import OxmlElement
+from docx.oxml.ns import qn
+from dotenv import load_dotenv
+from core.runtime_stats import rank_by_priority
 
-def write_summary(docs, technical_analyses, path="outputs/summary.docx"):
+# Load environment variables
+load_dotenv('config/settings.env')
+
+DEFAULT_VOLUME_SIZE = 500
+_UNSAFE_FILE_CHARS = re.compile(r"[^\w.-]")
+
+def split_mode():
+    """How the report is split into volumes (DOCX_SPLIT_BY): "" (one document), "schema" or "count"."""
+    mode = os.getenv("DOCX_SPLIT_BY", "").strip().lower()
+    if mode not in ("", "schema", "count"):
+        raise ValueError(f"DOCX_SPLIT_BY must be 'schema' or 'count', not '{mode}'")
+    return mode
+
+def volume_size():
+    """Procedures per volume when splitting by count (DOCX_VOLUME_SIZE)."""
+    value = os.getenv("DOCX_VOLUME_SIZE", str(DEFAULT_VOLUME_SIZE)).strip()
+    try:
+        return max(1, int(value))
+    except ValueError:
+        raise ValueError(f"DOCX_VOLUME_SIZE must be a whole number, not '{value}'") from None
+
+def validate_report_settings():
+    """Raise ValueError for bad DOCX_SPLIT_BY / DOCX_VOLUME_SIZE; runs call this before any LLM spend."""
+    split_mode()
+    volume_size()
+
+class _ReportWriter:
     """
-    Write Word document with detailed technical analysis for procedures with complexity > 3.
-    This document is intended to flag procedures that may need refactoring.
+    Appends headings and paragraphs to a Document in constant time. Document.add_heading
+    looks its style up by name and add_paragraph scans the body for the section
+    properties, so both cost O(document) and large reports took quadratic time.
     """
-    document = Document()
-    
-    # Add title and introduction
-    document.add_heading("Stored Procedures Requiring Refactoring Review", level=1)
+
+    def __init__(self, document):
+        self._body = document.element.body
+        # Body content goes before the final section properties
+        self._end = self._body.sectPr
+        self._styles = {level: document.styles[f"Heading {level}"].style_id for level in (1, 2, 3)}
+
+    def paragraph(self, text="", style_id=None):
+        p = OxmlElement("w:p")
+        if style_id:
+            p.style = style_id
+        if text:
+            run = OxmlElement("w:r")
+            for index, line in enumerate(str(text).split("\n")):
+                if index:
+                    run.append(OxmlElement("w:br"))
+                element = OxmlElement("w:t")
+                element.set(qn("xml:space"), "preserve")
+                element.text = line
+                run.append(element)
+            p.append(run)
+        if self._end is not None:
+            self._end.addprevious(p)
+        else:
+            self._body.append(p)
+        return p
+
+    def heading(self, text, level):
+        return self.paragraph(text, self._styles[level])
+
+def _add_procedure(writer, number, doc, tech_analysis):
+    # Add procedure heading with complexity score
+    writer.heading(f'{number}. {doc["sp_name"]} (Complexity: {doc["complexity"]}, Priority: {doc.get("priority_score", 0)})', 2)
+
+    # Add business summary
+    writer.heading("Business Function", 3)
+    writer.paragraph(doc["summary"])
+
+    # Add technical analysis if available
+    if tech_analysis:
+        writer.heading("Technical Analysis & Refactoring Recommendations", 3)
+        writer.paragraph(tech_analysis["technical_analysis"])
+
+    # Add complexity factors
+    writer.heading("Complexity Factors", 3)
+    factors_text = doc["complexity_factors"] if doc["complexity_factors"] else "No specific factors identified"
+    writer.paragraph(f"Lines of Code: {doc['lines_of_code']}")
+    writer.paragraph(f"Contributing Factors: {factors_text}")
+
+    # Add runtime cost from the plan cache
+    writer.heading("Runtime Profile", 3)
+    if doc.get("execution_count"):
+        writer.paragraph(f"Executions: {doc['execution_count']:,} since {doc['cached_time']} ({doc['executions_per_day']:,.0f} per day)")
+        writer.paragraph(f"Average worker time: {doc['avg_worker_time_ms']:,} ms, average elapsed time: {doc['avg_elapsed_time_ms']:,} ms")
+        writer.paragraph(f"Average logical reads: {doc['avg_logical_reads']:,}")
+    else:
+        writer.paragraph("No executions recorded in the plan cache")
+
+    # Add separator
+    writer.paragraph("─" * 50)
+
+def _add_introduction(document, title):
+    document.add_heading(title, level=1)
     intro = document.add_paragraph()
     intro.add_run("This document contains detailed technical analysis of stored procedures with complexity scores greater than 3. ")
-    intro.add_run("These procedures have been flagged for potential refactoring to improve maintainability, performance, and code quality.")
-    
-    # Filter and add only high-complexity procedures
-    high_complexity_count = 0
-    for doc in docs:
-        if doc["complexity"] > 3:
-            high_complexity_count += 1
-            
-            # Find corresponding technical analysis
-            tech_analysis = next((ta for ta in technical_analyses if ta["name"] == doc["sp_name"]), None)
-            
-            # Add procedure heading with complexity score
-            document.add_heading(f'{doc["sp_name"]} (Complexity: {doc["complexity"]})', level=2)
-            
-            # Add business summary
-            document.add_heading("Business Function", level=3)
-            document.add_paragraph(doc["summary"])
-            
-            # Add technical analysis if available
-            if tech_analysis:
-                document.add_heading("Technical Analysis & Refactoring Recommendations", level=3)
-                document.add_paragraph(tech_analysis["technical_analysis"])
-            
-            # Add complexity factors
-            document.add_heading("Complexity Factors", level=3)
-            factors_text = doc["complexity_factors"] if doc["complexity_factors"] else "No specific factors identified"
-            document.add_paragraph(f"Lines of Code: {doc['lines_of_code']}")
-            document.add_paragraph(f"Contributing Factors: {factors_text}")
-            
-            # Add separator
-            document.add_paragraph("─" * 50)
-    
-    # Add summary at the end
+    intro.add_run("These procedures have been flagged for potential refactoring to improve maintainability, performance, and code quality. ")
+    intro.add_run("They are ranked by priority, which combines the complexity score with how often the procedure runs.")
+
+def _add_totals(document, total, flagged):
     document.add_heading("Summary", level=2)
     summary_para = document.add_paragraph()
-    summary_para.add_run(f"Total procedures analyzed: {len(docs)}")
-    summary_para.add_run(f"\nProcedures flagged for refactoring review: {high_complexity_count}")
-    summary_para.add_run(f"\nPercentage requiring attention: {(high_complexity_count/len(docs)*100):.1f}%" if len(docs) > 0 else "\nPercentage requiring attention: 0%")
-    
+    summary_para.add_run(f"Total procedures analyzed: {total}")
+    summary_para.add_run(f"\nProcedures flagged for refactoring review: {flagged}")
+    summary_para.add_run(f"\nPercentage requiring attention: {(flagged/total*100):.1f}%" if total > 0 else "\nPercentage requiring attention: 0%")
+
+def _add_hyperlink(paragraph, text, target):
+    """Append a run linking to target (a relative path or URL) to paragraph."""
+    r_id = paragraph.part.relate_to(target, RELATIONSHIP_TYPE.HYPERLINK, is_external=True)
+    hyperlink = OxmlElement("w:hyperlink")
+    hyperlink.set(qn("r:id"), r_id)
+    run = OxmlElement("w:r")
+    properties = OxmlElement("w:rPr")
+    style = OxmlElement("w:rStyle")
+    style.set(qn("w:val"), "Hyperlink")
+    properties.append(style)
+    underline = OxmlElement("w:u")
+    underline.set(qn("w:val"), "single")
+    properties.append(underline)
+    run.append(properties)
+    text_element = OxmlElement("w:t")
+    text_element.text = text
+    run.append(text_element)
+    hyperlink.append(run)
+    paragraph._p.append(hyperlink)
+
+def render_volume(path, title, entries):
+    """Write one report document; entries are (number, doc, tech_analysis). Runs in a worker process."""
+    document = Document()
+    _add_introduction(document, title)
+    writer = _ReportWriter(document)
+    for number, doc, tech_analysis in entries:
+        _add_procedure(writer, number, doc, tech_analysis)
     document.save(path)
-    return high_complexity_count
+    return path
+
+def plan_volumes(candidates, split_by, size=None):
+    """
+    Group (number, doc, tech_analysis) entries, already in priority order, into
+    [(label, entries)]: one volume per schema (database.schema in consolidated reports),
+    or consecutive runs of size procedures.
+    """
+    if split_by == "schema":
+        volumes = {}
+        for entry in candidates:
+            doc = entry[1]
+            label = ".".join(part for part in (doc.get("database"), doc.get("schema") or "unknown") if part)
+            volumes.setdefault(label, []).append(entry)
+        return sorted(volumes.items())
+    size = size or volume_size()
+    return [
+        (f"{candidates[start][0]}-{candidates[min(start + size, len(candidates)) - 1][0]}", candidates[start:start + size])
+        for start in range(0, len(candidates), size)
+    ]
+
+def write_summary(docs, technical_analyses, path="outputs/summary.docx", split_by=None, size=None, max_workers=None):
+    """
+    Write Word document with detailed technical analysis for procedures with complexity > 3.
+    This document is intended to flag procedures that may need refactoring.
+    Procedures are ordered by priority (complexity x how often they run), so hot
+    complex procedures come before complex ones that rarely or never run.
+    With split_by "schema" or "count" (default DOCX_SPLIT_BY), the procedures go into
+    volumes under <path without .docx>/ rendered in parallel worker processes, and path
+    becomes an index document linking to them.
+    """
+    analyses = {ta["name"]: ta for ta in technical_analyses}
+    candidates = [
+        (number, doc, analyses.get(doc["sp_name"]))
+        for number, doc in enumerate((doc for doc in rank_by_priority(docs) if doc["complexity"] > 3), 1)
+    ]
+    split_by = split_mode() if split_by is None else split_by
+
+    # Volumes from an earlier run are stale whichever layout this run writes
+    directory = os.path.splitext(path)[0]
+    for stale in glob.glob(os.path.join(directory, "volume_*.docx")):
+        os.remove(stale)
+
+    if not split_by:
+        if os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+        document = Document()
+        _add_introduction(document, "Stored Procedures Requiring Refactoring Review")
+        writer = _ReportWriter(document)
+        for number, doc, tech_analysis in candidates:
+            _add_procedure(writer, number, doc, tech_analysis)
+        _add_totals(document, len(docs), len(candidates))
+        document.save(path)
+        return len(candidates)
+
+    volumes = plan_volumes(candidates, split_by, size)
+    os.makedirs(directory, exist_ok=True)
+    jobs = []
+    for index, (label, entries) in enumerate(volumes, 1):
+        file_name = f"volume_{index:03d}_{_UNSAFE_FILE_CHARS.sub('_', label)}.docx"
+        title = f"Stored Procedures Requiring Refactoring Review - Volume {index} ({label})"
+        jobs.append((os.path.join(directory, file_name), title, entries))
+
+    # python-docx is pure Python, so volumes are rendered in separate processes
+    # (spawned, since callers such as the Streamlit worker are multi-threaded)
+    if len(jobs) > 1 and (max_workers or os.cpu_count() or 1) > 1:
+        with ProcessPoolExecutor(max_workers=min(max_workers or os.cpu_count(), len(jobs)), mp_context=multiprocessing.get_context("spawn")) as pool:
+            list(pool.map(render_volume, *zip(*jobs)))
+    else:
+        for job in jobs:
+            render_volume(*job)
+
+    # The index only lists volumes, so it stays small however many procedures there are
+    index = Document()
+    _add_introduction(index, "Stored Procedures Requiring Refactoring Review - Index")
+    index.add_paragraph(f"The report is split into {len(jobs)} volumes by {'schema' if split_by == 'schema' else f'{size or volume_size()} procedures'}.")
+    table = index.add_table(rows=1, cols=4)
+    table.style = "Table Grid"
+    for cell, heading in zip(table.rows[0].cells, ("Volume", "Procedures", "Highest priority", "Count")):
+        cell.text = heading
+    for (volume_path, title, entries), (label, _) in zip(jobs, volumes):
+        cells = table.add_row().cells
+        _add_hyperlink(cells[0].paragraphs[0], label, f"{os.path.basename(directory)}/{os.path.basename(volume_path)}")
+        cells[1].text = f"{entries[0][0]}. {entries[0][1]['sp_name']} ... {entries[-1][0]}. {entries[-1][1]['sp_name']}" if len(entries) > 1 else f"{entries[0][0]}. {entries[0][1]['sp_name']}"
+        cells[2].text = str(entries[0][1].get("priority_score", 0))
+        cells[3].text = str(len(entries))
+    _add_totals(index, len(docs), len(candidates))
+    index.save(path)
+    return len(candidates)
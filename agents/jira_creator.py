@@ -1,7 +1,37 @@
-from jira import JIRA
+import base64
+import hashlib
+import json
 import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+from types import SimpleNamespace
+from dotenv import load_dotenv
+from core.executor import run_concurrent
+from core.metrics import get_metrics
+from core.rate_limiter import AdaptiveLimiter, call_with_retry
+
+# Load environment variables
+load_dotenv('config/settings.env')
+
+DEFAULT_PROJECT = "APP"
+DEFAULT_LEDGER_PATH = "outputs/jira_ledger.json"
+# Jira accepts at most 50 issues per bulk-create request
+DEFAULT_BATCH_SIZE = 50
+DEFAULT_MAX_CONCURRENCY = 4
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_RETRY_BASE_SECONDS = 2.0
+DEFAULT_RETRY_MAX_SECONDS = 60.0
+# Time for the search index to catch up with a bulk create before its labels are searched again
+DEFAULT_SEARCH_SETTLE_SECONDS = 2.0
+# Every bulk-created issue carries this label plus its idempotency key, so issues created
+# by an earlier push are found again even if the local ledger is lost
+IDEMPOTENCY_LABEL_PREFIX = "sp-analyzer-"
 
 def connect_jira():
+    from jira import JIRA
     return JIRA(
         server=os.getenv("JIRA_SERVER"),
         basic_auth=(os.getenv("JIRA_USER"), os.getenv("JIRA_TOKEN"))
@@ -15,3 +45,216 @@ def create_ticket(jira, summary, description, project="APP"):
         'issuetype': {'name': 'Story'}
     }
     return jira.create_issue(fields=issue_dict)
+
+class JiraAPIError(RuntimeError):
+    """A failed Jira REST call; status_code and response.headers are what the retry logic reads."""
+
+    def __init__(self, status_code, body, headers=None):
+        super().__init__(f"Jira API returned {status_code}: {body[:500]}")
+        self.status_code = status_code
+        self.body = body
+        self.response = SimpleNamespace(status_code=status_code, headers=headers or {})
+
+def idempotency_key(procedure_name, definition_hash):
+    """Stable key for one procedure's story: the same name and definition never create a second issue."""
+    return hashlib.sha256(f"{procedure_name}\x1f{definition_hash}".encode("utf-8")).hexdigest()[:20]
+
+class JiraLedger:
+    """
+    JSON record under outputs/ of the issues created per idempotency key.
+    Thread-safe; rewritten atomically after every batch.
+    """
+
+    def __init__(self, path=DEFAULT_LEDGER_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.entries = json.load(f)
+
+    def get(self, key):
+        with self._lock:
+            return self.entries.get(key)
+
+    def record(self, issues):
+        """issues: {idempotency_key: {"issue_key", "procedure_name"}}"""
+        with self._lock:
+            now = datetime.now().isoformat(timespec="seconds")
+            for key, issue in issues.items():
+                self.entries[key] = {**issue, "recorded_at": now}
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with open(self.path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(self.entries, f, indent=2)
+            os.replace(self.path + ".tmp", self.path)
+
+class JiraClient:
+    """Minimal Jira REST v2 client for bulk creation and label search (basic auth, JSON)."""
+
+    def __init__(self, server=None, user=None, token=None, timeout=30):
+        self.server = (server or os.getenv("JIRA_SERVER", "")).rstrip("/")
+        if not self.server:
+            raise ValueError("JIRA_SERVER is not set")
+        user = user if user is not None else os.getenv("JIRA_USER", "")
+        token = token if token is not None else os.getenv("JIRA_TOKEN", "")
+        self._auth = "Basic " + base64.b64encode(f"{user}:{token}".encode("utf-8")).decode("ascii")
+        self.timeout = timeout
+
+    def request(self, method, path, payload=None, accept=(200, 201)):
+        """Send a JSON request; returns (status, parsed body). Statuses outside accept raise JiraAPIError."""
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(f"{self.server}{path}", data=data, method=method, headers={
+            "Authorization": self._auth, "Content-Type": "application/json", "Accept": "application/json"
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                status, body, headers = response.status, response.read().decode("utf-8"), response.headers
+        except urllib.error.HTTPError as e:
+            status, body, headers = e.code, e.read().decode("utf-8", "replace"), e.headers
+        if status not in accept:
+            raise JiraAPIError(status, body, {key.lower(): value for key, value in (headers or {}).items()})
+        return status, json.loads(body) if body else {}
+
+    def find_labeled(self, project, labels):
+        """{label: issue key} for the issues in project carrying any of labels."""
+        if not labels:
+            return {}
+        quoted = ", ".join(f'"{label}"' for label in labels)
+        jql = f'project = "{project}" AND labels in ({quoted})'
+        _, body = self.request("POST", "/rest/api/2/search", {"jql": jql, "fields": ["labels"], "maxResults": len(labels)})
+        wanted = set(labels)
+        return {
+            label: issue["key"]
+            for issue in body.get("issues", [])
+            for label in issue.get("fields", {}).get("labels", []) if label in wanted
+        }
+
+    def bulk_create(self, issue_fields):
+        """
+        Create issues in one request. Returns one (issue_key, error) per input, in order;
+        Jira reports partly failed batches as per-element errors.
+        """
+        _, body = self.request("POST", "/rest/api/2/issue/bulk", {"issueUpdates": [{"fields": fields} for fields in issue_fields]}, accept=(200, 201, 400))
+        errors = {error.get("failedElementNumber"): error for error in body.get("errors", [])}
+        created = iter(body.get("issues", []))
+        results = []
+        for index in range(len(issue_fields)):
+            if index in errors:
+                results.append((None, json.dumps(errors[index].get("elementErrors", errors[index]))))
+            else:
+                issue = next(created, None)
+                results.append((issue["key"], None) if issue else (None, "No issue returned"))
+        return results
+
+def bulk_create_tickets(stories, project=None, client=None, ledger=None, batch_size=None, max_workers=None, requests_per_minute=None, on_batch=None):
+    """
+    Create a Story per user story ({"title", "description", "procedure_name", "definition_hash"})
+    with Jira's bulk-create endpoint: batches of batch_size (JIRA_BULK_BATCH_SIZE) sent at most
+    max_workers (JIRA_MAX_CONCURRENCY) at a time, retried with backoff on throttling and
+    transient errors (JIRA_MAX_RETRIES, JIRA_RETRY_BASE_SECONDS, JIRA_RETRY_MAX_SECONDS), and
+    paced to JIRA_REQUESTS_PER_MINUTE (the label search and the bulk create each count as a request).
+    Each story's idempotency key (procedure name + definition hash) is kept in the ledger and as
+    an issue label; stories already pushed are skipped, and every attempt first searches for
+    the batch's labels so a retry does not recreate issues the search already returns. Jira's
+    search index lags behind issue creation, so after a bulk create whose response was lost
+    the retry waits JIRA_SEARCH_SETTLE_SECONDS before searching; that makes a duplicate
+    unlikely, not impossible.
+    on_batch(done_batches, total_batches) reports progress.
+    Returns one {"procedure_name", "idempotency_key", "issue_key", "status", "error"} per story,
+    status being "created", "existing" (created by an earlier push) or "failed".
+    """
+    project = project or os.getenv("JIRA_PROJECT", DEFAULT_PROJECT)
+    client = client or JiraClient()
+    ledger = ledger or JiraLedger()
+    batch_size = min(DEFAULT_BATCH_SIZE, batch_size or int(os.getenv("JIRA_BULK_BATCH_SIZE", DEFAULT_BATCH_SIZE)))
+    max_workers = max_workers or int(os.getenv("JIRA_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY))
+    if requests_per_minute is None:
+        requests_per_minute = int(os.getenv("JIRA_REQUESTS_PER_MINUTE", "0"))
+    # Jira has its own rate limits, separate from the LLM's
+    limiter = AdaptiveLimiter(max_workers, requests_per_minute=requests_per_minute)
+    max_retries = int(os.getenv("JIRA_MAX_RETRIES", DEFAULT_MAX_RETRIES))
+    retry_base = float(os.getenv("JIRA_RETRY_BASE_SECONDS", DEFAULT_RETRY_BASE_SECONDS))
+    retry_cap = float(os.getenv("JIRA_RETRY_MAX_SECONDS", DEFAULT_RETRY_MAX_SECONDS))
+    settle_seconds = float(os.getenv("JIRA_SEARCH_SETTLE_SECONDS", DEFAULT_SEARCH_SETTLE_SECONDS))
+
+    results = []
+    pending = []
+    seen = set()
+    for story in stories:
+        key = idempotency_key(story["procedure_name"], story.get("definition_hash") or story["description"])
+        result = {"procedure_name": story["procedure_name"], "idempotency_key": key, "issue_key": None, "status": None, "error": None}
+        results.append(result)
+        recorded = ledger.get(key)
+        if recorded:
+            result.update(issue_key=recorded["issue_key"], status="existing")
+        elif key in seen:
+            result.update(status="failed", error="Duplicate story in this push")
+        else:
+            seen.add(key)
+            pending.append((story, result))
+    batches = [pending[start:start + batch_size] for start in range(0, len(pending), batch_size)]
+
+    def push(batch):
+        labels = {IDEMPOTENCY_LABEL_PREFIX + result["idempotency_key"]: (story, result) for story, result in batch}
+        # Labels sent in a bulk create by this push; found later, they were created by us
+        submitted = set()
+
+        def attempt():
+            if submitted:
+                # An earlier attempt sent a bulk create; let the search index see its issues
+                time.sleep(settle_seconds)
+            # Issues from an earlier attempt whose response was lost are found, not recreated
+            existing = client.find_labeled(project, list(labels))
+            missing = [label for label in labels if label not in existing]
+            if missing:
+                # The slot paced the search; the bulk create is a second request
+                limiter.pace()
+                submitted.update(missing)
+            created = client.bulk_create([
+                {
+                    "project": {"key": project},
+                    "summary": labels[label][0]["title"],
+                    "description": labels[label][0]["description"],
+                    "issuetype": {"name": "Story"},
+                    "labels": [IDEMPOTENCY_LABEL_PREFIX.rstrip("-"), label]
+                }
+                for label in missing
+            ]) if missing else []
+            return existing, dict(zip(missing, created))
+
+        with get_metrics().stage("jira_push"):
+            existing, created = call_with_retry(
+                attempt, limiter=limiter, max_retries=max_retries, base=retry_base, cap=retry_cap, llm=False,
+                retryable_exceptions=(urllib.error.URLError, TimeoutError, ConnectionError)
+            )
+        for label, (story, result) in labels.items():
+            if label in existing:
+                result.update(issue_key=existing[label], status="created" if label in submitted else "existing")
+            else:
+                issue_key, error = created[label]
+                result.update(issue_key=issue_key, status="created" if issue_key else "failed", error=error)
+        ledger.record({
+            result["idempotency_key"]: {"issue_key": result["issue_key"], "procedure_name": result["procedure_name"]}
+            for _, result in batch if result["issue_key"]
+        })
+
+    done = []
+
+    def report(index, _, elapsed):
+        done.append(index)
+        if on_batch:
+            on_batch(len(done), len(batches))
+
+    def push_safely(batch):
+        try:
+            push(batch)
+        except Exception as e:
+            # One batch failing (after its retries) doesn't stop the others
+            for _, result in batch:
+                if result["status"] is None:
+                    result.update(status="failed", error=f"{type(e).__name__}: {e}")
+
+    run_concurrent(push_safely, batches, max_workers=max_workers, on_complete=report)
+    return results
@@ -1,8 +1,136 @@
-from core.prompts import REVERSE_ENGINEER_PROMPT
+import json
+import os
+import re
+from core.prompts import (
+    REVERSE_ENGINEER_PROMPT, BATCH_REVERSE_ENGINEER_PROMPT, BATCH_PROCEDURE_ENTRY,
+    CHUNK_REVERSE_ENGINEER_PROMPT, REDUCE_REVERSE_ENGINEER_PROMPT,
+    CALLER_REVERSE_ENGINEER_PROMPT, CALLER_REDUCE_REVERSE_ENGINEER_PROMPT
+)
 from core.llm import call_llm
+from core.metrics import get_metrics, procedure_label
+from core.chunking import estimate_tokens, needs_chunking, map_reduce
+from core.normalizer import prompt_definition
 
-def reverse_engineer(proc):
+def format_callee_summaries(callee_summaries, token_budget=None):
+    """
+    Callee summaries as a bulleted list for a caller's prompt. Once token_budget
+    (LLM_CALLEE_CONTEXT_TOKENS) is used up, remaining callees are listed by name only.
+    """
+    token_budget = token_budget or int(os.getenv("LLM_CALLEE_CONTEXT_TOKENS", "1500"))
+    lines = []
+    used = 0
+    for callee in sorted(callee_summaries, key=lambda c: c["name"]):
+        line = f"- {callee['name']}: {callee['summary'].strip()}"
+        used += estimate_tokens(line)
+        lines.append(line if used <= token_budget else f"- {callee['name']}")
+    return "\n".join(lines)
+
+def reverse_engineer(proc, callee_summaries=None):
+    """
+    Summarize a procedure. callee_summaries ([{"name", "summary"}] for procedures it
+    calls, from call-graph ordered runs) are given to the model as context.
+    """
+    callees = format_callee_summaries(callee_summaries) if callee_summaries else None
+    code = prompt_definition(proc)
+    # Definitions too large for one prompt are summarized section by section
+    if needs_chunking(code):
+        if callees:
+            summary = map_reduce(proc, CHUNK_REVERSE_ENGINEER_PROMPT, CALLER_REDUCE_REVERSE_ENGINEER_PROMPT, callees=callees)
+        else:
+            summary = map_reduce(proc, CHUNK_REVERSE_ENGINEER_PROMPT, REDUCE_REVERSE_ENGINEER_PROMPT)
+    elif callees:
+        summary = call_llm(CALLER_REVERSE_ENGINEER_PROMPT.format(name=proc["name"], callees=callees, code=code))
+    else:
+        summary = call_llm(REVERSE_ENGINEER_PROMPT.format(name=proc["name"], code=code))
     return {
         "name": proc["name"],
-        "summary": call_llm(REVERSE_ENGINEER_PROMPT.format(name=proc["name"], code=proc["definition"]))
+        "summary": summary
     }
+
+def is_batchable(proc, max_lines=None):
+    """Small procedures (LLM_BATCH_MAX_LINES, default 40) are worth packing into shared requests."""
+    max_lines = max_lines or int(os.getenv("LLM_BATCH_MAX_LINES", "40"))
+    return (prompt_definition(proc) or "").count("\n") < max_lines
+
+def plan_batches(procs, token_budget=None, max_batch_size=None):
+    """
+    Group procedures into batches whose rendered prompt stays under token_budget
+    (LLM_BATCH_TOKEN_BUDGET) with at most max_batch_size (LLM_BATCH_MAX_SIZE) procedures each.
+    """
+    token_budget = token_budget or int(os.getenv("LLM_BATCH_TOKEN_BUDGET", "3000"))
+    max_batch_size = max_batch_size or int(os.getenv("LLM_BATCH_MAX_SIZE", "20"))
+    overhead = estimate_tokens(BATCH_REVERSE_ENGINEER_PROMPT)
+    batches = []
+    current = []
+    current_tokens = overhead
+    for proc in procs:
+        tokens = estimate_tokens(BATCH_PROCEDURE_ENTRY.format(name=proc["name"], code=prompt_definition(proc)))
+        if current and (current_tokens + tokens > token_budget or len(current) >= max_batch_size):
+            batches.append(current)
+            current = []
+            current_tokens = overhead
+        current.append(proc)
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def parse_batch_response(response, names):
+    """
+    Extract {name: summary} from a JSON array response, keeping only well-formed
+    entries for the requested names. Anything else is dropped so the caller can retry it,
+    including names that appear more than once: there is no telling which entry is right.
+    """
+    text = (response or "").strip()
+    # Tolerate the array being wrapped in a markdown code fence or surrounding prose
+    match = re.search(r"\[.*\]", text, re.DOTALL)
+    if not match:
+        return {}
+    try:
+        items = json.loads(match.group())
+    except ValueError:
+        return {}
+    if not isinstance(items, list):
+        return {}
+    summaries = {}
+    seen = set()
+    ambiguous = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        name, summary = item.get("name"), item.get("summary")
+        if not isinstance(name, str) or name not in names:
+            continue
+        if name in seen:
+            ambiguous.add(name)
+        seen.add(name)
+        if isinstance(summary, str) and summary.strip():
+            summaries[name] = summary.strip()
+    return {name: summary for name, summary in summaries.items() if name not in ambiguous}
+
+def reverse_engineer_batch(procs):
+    """
+    Summarize several procedures in one request.
+    Procedures missing from (or malformed in) the response fall back to reverse_engineer().
+    Returns results in the same order and shape as reverse_engineer().
+    """
+    if len(procs) == 1:
+        return [reverse_engineer(procs[0])]
+    entries = "".join(BATCH_PROCEDURE_ENTRY.format(name=proc["name"], code=prompt_definition(proc)) for proc in procs)
+    try:
+        summaries = parse_batch_response(
+            call_llm(BATCH_REVERSE_ENGINEER_PROMPT.format(procedures=entries)),
+            {proc["name"] for proc in procs}
+        )
+    except Exception as e:
+        print(f"   ⚠️  Batched summary request failed ({str(e)[:100]}), falling back to single-procedure calls")
+        summaries = {}
+    results = []
+    for proc in procs:
+        if proc["name"] in summaries:
+            results.append({"name": proc["name"], "summary": summaries[proc["name"]]})
+        else:
+            # A fallback request serves only this procedure, so it isn't split across the batch
+            with get_metrics().stage("reverse_engineer", procedure_label(proc)):
+                results.append(reverse_engineer(proc))
+    return results
@@ -1,21 +1,106 @@
-def extract_schema():
+import os
+
+DEFAULT_BATCH_SIZE = 500
+
+def _row_to_proc(row):
+    return {
+        # Schema-qualified, so same-named procedures in different schemas never collide
+        # in anything keyed by name (manifest, journal, call graph, result store)
+        "name": f"{row[5]}.{row[0]}",
+        "object_name": row[0],
+        "definition": row[1],
+        "last_execution_time": str(row[2]),
+        "object_id": row[3],
+        "modify_date": row[4],
+        "schema": row[5],
+        # Runtime cost since the plan was cached; zeros when it is not in the plan cache
+        "execution_count": row[6],
+        "total_worker_time_ms": float(row[7]),
+        "total_elapsed_time_ms": float(row[8]),
+        "total_logical_reads": row[9],
+        "cached_time": row[10],
+        "stats_age_seconds": row[11]
+    }
+
+def iter_schema(batch_size=None, connection_string=None):
+    """
+    Stream stored procedures one at a time, ordered by schema and name.
+    Full definitions come from sys.sql_modules (INFORMATION_SCHEMA.ROUTINES truncates at 4,000 characters).
+    Rows are pulled batch_size at a time (SCHEMA_BATCH_SIZE) with fetchmany on the driver's default
+    cursor, which is what bounds memory: pyodbc has no server-side cursors, so SQLAlchemy's
+    stream_results option would be ignored. Consumers that process procedures as they arrive stay flat.
+    Each procedure's "name" is schema-qualified (schema.procedure); "object_name" is the bare name.
+    Runtime cost comes from sys.dm_exec_procedure_stats, summed over the procedure's cached plans.
+    connection_string defaults to DB_CONNECTION_STRING.
+    """
     from core.db_connector import get_engine
     from sqlalchemy import text
-    engine = get_engine()
+    batch_size = batch_size or int(os.getenv("SCHEMA_BATCH_SIZE", DEFAULT_BATCH_SIZE))
+    engine = get_engine(connection_string)
     query = text("""
-    SELECT 
-        r.ROUTINE_NAME,
-        r.ROUTINE_DEFINITION,
-        CASE 
+    SELECT
+        p.name,
+        m.definition,
+        CASE
             WHEN ps.last_execution_time IS NULL THEN 'Never executed'
             ELSE CONVERT(VARCHAR(19), ps.last_execution_time, 120)
-        END as last_execution_time
-    FROM INFORMATION_SCHEMA.ROUTINES r
-    LEFT JOIN sys.dm_exec_procedure_stats ps ON 
-        ps.object_id = OBJECT_ID(r.ROUTINE_SCHEMA + '.' + r.ROUTINE_NAME)
-    WHERE r.ROUTINE_TYPE='PROCEDURE'
-    ORDER BY r.ROUTINE_NAME;
+        END as last_execution_time,
+        p.object_id,
+        CONVERT(VARCHAR(23), p.modify_date, 121) as modify_date,
+        SCHEMA_NAME(p.schema_id) as schema_name,
+        ISNULL(ps.execution_count, 0) as execution_count,
+        ISNULL(ps.total_worker_time, 0) / 1000.0 as total_worker_time_ms,
+        ISNULL(ps.total_elapsed_time, 0) / 1000.0 as total_elapsed_time_ms,
+        ISNULL(ps.total_logical_reads, 0) as total_logical_reads,
+        CONVERT(VARCHAR(19), ps.cached_time, 120) as cached_time,
+        DATEDIFF(SECOND, ps.cached_time, GETDATE()) as stats_age_seconds
+    FROM sys.procedures p
+    JOIN sys.sql_modules m ON
+        m.object_id = p.object_id
+    OUTER APPLY (
+        SELECT
+            MAX(s.last_execution_time) as last_execution_time,
+            SUM(s.execution_count) as execution_count,
+            SUM(s.total_worker_time) as total_worker_time,
+            SUM(s.total_elapsed_time) as total_elapsed_time,
+            SUM(s.total_logical_reads) as total_logical_reads,
+            MIN(s.cached_time) as cached_time
+        FROM sys.dm_exec_procedure_stats s
+        WHERE s.object_id = p.object_id AND s.database_id = DB_ID()
+    ) ps
+    WHERE p.is_ms_shipped = 0
+    ORDER BY schema_name, p.name;
     """)
     with engine.connect() as conn:
-        results = conn.execute(query).fetchall()
-    return [{"name": row[0], "definition": row[1], "last_execution_time": str(row[2])} for row in results]
+        result = conn.execute(query)
+        while True:
+            batch = result.fetchmany(batch_size)
+            if not batch:
+                break
+            for row in batch:
+                yield _row_to_proc(row)
+
+def extract_schema(batch_size=None, connection_string=None):
+    """
+    Every procedure from iter_schema as a list. The analysis needs all definitions at once
+    (call graph, near-duplicate clustering, reports), so runs hold the whole estate in memory.
+    """
+    return list(iter_schema(batch_size, connection_string))
+
+def extract_dependencies(connection_string=None):
+    """
+    (caller object_id, callee object_id) pairs for procedures that reference other
+    procedures, from sys.sql_expression_dependencies. Dynamic SQL is not covered;
+    core.call_graph adds EXEC statements parsed from the definitions.
+    """
+    from core.db_connector import get_engine
+    from sqlalchemy import text
+    query = text("""
+    SELECT DISTINCT d.referencing_id, d.referenced_id
+    FROM sys.sql_expression_dependencies d
+    JOIN sys.procedures caller ON caller.object_id = d.referencing_id
+    JOIN sys.procedures callee ON callee.object_id = d.referenced_id
+    WHERE d.referencing_id <> d.referenced_id;
+    """)
+    with get_engine(connection_string).connect() as conn:
+        return [(row[0], row[1]) for row in conn.execute(query)]
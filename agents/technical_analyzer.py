@@ -1,17 +1,27 @@
-from core.prompts import TECHNICAL_ANALYSIS_PROMPT
+from core.prompts import TECHNICAL_ANALYSIS_PROMPT, CHUNK_TECHNICAL_ANALYSIS_PROMPT, REDUCE_TECHNICAL_ANALYSIS_PROMPT
 from core.llm import call_llm
+from core.chunking import needs_chunking, map_reduce
+from core.normalizer import prompt_definition
 
 def analyze_for_refactoring(proc, complexity_score):
     """
     Generate detailed technical analysis for procedures that may need refactoring.
     Only called for procedures with complexity > 3.
+    Definitions too large for one prompt are reviewed section by section and then combined.
     """
-    return {
-        "name": proc["name"],
-        "complexity": complexity_score,
-        "technical_analysis": call_llm(TECHNICAL_ANALYSIS_PROMPT.format(
+    code = prompt_definition(proc, technical=True)
+    if needs_chunking(code):
+        technical_analysis = map_reduce(
+            proc, CHUNK_TECHNICAL_ANALYSIS_PROMPT, REDUCE_TECHNICAL_ANALYSIS_PROMPT, technical=True, complexity=complexity_score
+        )
+    else:
+        technical_analysis = call_llm(TECHNICAL_ANALYSIS_PROMPT.format(
             name=proc["name"], 
             complexity=complexity_score,
-            code=proc["definition"]
+            code=code
         ))
+    return {
+        "name": proc["name"],
+        "complexity": complexity_score,
+        "technical_analysis": technical_analysis
     }
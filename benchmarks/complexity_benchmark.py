@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Compare the token-based complexity analyzer with the original substring-based one
+on a synthetic multi-megabyte procedure corpus.
+
+    python benchmarks/complexity_benchmark.py --procedures 200 --repeat 400
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from agents.complexity_analyzer import analyze
+
+def legacy_analyze(proc):
+    """The original substring-matching implementation, kept here as the baseline."""
+    definition_upper = proc["definition"].upper()
+    lines = proc["definition"].count("\n")
+    factors = []
+    weight = 1
+    if "CURSOR" in definition_upper:
+        weight = 2
+        factors.append("Contains CURSOR (2x multiplier)")
+    elif "JOIN" in definition_upper:
+        weight = 1.5
+        factors.append("Contains JOIN operations (1.5x multiplier)")
+    if "WHILE" in definition_upper or "LOOP" in definition_upper:
+        factors.append("Contains loops")
+    if "IF" in definition_upper or "CASE" in definition_upper:
+        factors.append("Contains conditional logic")
+    if "TRY" in definition_upper and "CATCH" in definition_upper:
+        factors.append("Contains error handling")
+    if "TRANSACTION" in definition_upper or "BEGIN TRAN" in definition_upper:
+        factors.append("Contains transaction management")
+    if "EXEC" in definition_upper or "EXECUTE" in definition_upper:
+        factors.append("Calls other procedures/functions")
+    if "CREATE" in definition_upper and ("TABLE" in definition_upper or "VIEW" in definition_upper):
+        factors.append("Creates database objects")
+    if lines > 100:
+        factors.append(f"Large procedure ({lines} lines)")
+    elif lines > 50:
+        factors.append(f"Medium-sized procedure ({lines} lines)")
+    else:
+        factors.append(f"Small procedure ({lines} lines)")
+    complexity = min(10, int((lines / 20) * weight))
+    return {
+        "name": proc["name"],
+        "complexity": complexity,
+        "lines_of_code": lines,
+        "complexity_factors": "; ".join(factors)
+    }
+
+BLOCK = """
+    -- Modified by ETL team: JOIN to history removed, see ticket
+    /* Legacy banner: IF you change this, notify the EXEC committee */
+    IF @Mode = 1
+    BEGIN
+        UPDATE o SET o.Status = N'MODIFIED - JOIN pending'
+        FROM dbo.[Order] o
+        WHERE o.OrderDate < @Cutoff;
+    END
+    ELSE
+        SELECT CASE WHEN o.Total > 100 THEN 'High' ELSE 'Low' END AS Band
+        FROM dbo.[Order] o;
+"""
+
+def build_corpus(procedures, repeat):
+    corpus = []
+    for i in range(procedures):
+        body = BLOCK * repeat
+        corpus.append({
+            "name": f"usp_Synthetic_{i}",
+            "definition": f"CREATE PROCEDURE dbo.usp_Synthetic_{i} @Mode INT, @Cutoff DATE\nAS\nBEGIN\n{body}END\n"
+        })
+    return corpus
+
+def time_it(func, corpus):
+    started = time.perf_counter()
+    results = [func(proc) for proc in corpus]
+    return time.perf_counter() - started, results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--procedures", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=400, help="Body blocks per procedure")
+    args = parser.parse_args()
+
+    corpus = build_corpus(args.procedures, args.repeat)
+    size_mb = sum(len(proc["definition"]) for proc in corpus) / 1_000_000
+    print(f"📦 Corpus: {len(corpus)} procedures, {size_mb:.1f} MB")
+
+    legacy_seconds, legacy_results = time_it(legacy_analyze, corpus)
+    token_seconds, token_results = time_it(analyze, corpus)
+    print(f"⏱️  Substring analyzer: {legacy_seconds:.3f}s ({size_mb / legacy_seconds:.1f} MB/s)")
+    print(f"⏱️  Token analyzer:     {token_seconds:.3f}s ({size_mb / token_seconds:.1f} MB/s)")
+
+    differing = sum(1 for old, new in zip(legacy_results, token_results) if old["complexity_factors"] != new["complexity_factors"])
+    print(f"🔍 Procedures whose factors changed (substring false positives removed): {differing}")
+    print(f"   Substring: {legacy_results[0]['complexity_factors']}")
+    print(f"   Token:     {token_results[0]['complexity_factors']}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,181 @@
+"""
+Synthetic T-SQL procedure corpora shaped like a legacy estate, from tiny CRUD procedures
+to cursor-heavy procedures thousands of lines long. Records have the same fields as
+agents.schema_crawler produces, so they can go straight into the pipeline.
+"""
+
+import random
+
+SHAPES = ("crud", "etl", "generated", "cursor", "orchestrator")
+DEFAULT_MIX = "crud=40,etl=30,generated=20,cursor=5,orchestrator=5"
+
+TABLES = ["Customer", "Order", "OrderLine", "Product", "Invoice", "Payment", "Shipment", "Supplier",
+          "Employee", "Account", "Ledger", "Warehouse", "Stock", "Price", "Contract", "Region"]
+
+BANNER = """/******************************************************************
+ * Procedure: {name}
+ * Author:    ETL team
+ * History:   {year}-01-12 initial version
+ *            {year}-06-30 added audit columns (ticket {ticket})
+ ******************************************************************/
+"""
+
+CATCH = """    BEGIN CATCH
+        IF @@TRANCOUNT > 0 ROLLBACK TRANSACTION;
+        DECLARE @ErrorMessage NVARCHAR(4000) = ERROR_MESSAGE();
+        INSERT INTO audit.ErrorLog (ProcedureName, ErrorMessage, LoggedAt)
+        VALUES (OBJECT_NAME(@@PROCID), @ErrorMessage, SYSDATETIME());
+        THROW;
+    END CATCH
+"""
+
+def parse_mix(mix):
+    """'crud=40,etl=30' -> {'crud': 40, 'etl': 30}"""
+    weights = {}
+    for part in (mix or DEFAULT_MIX).split(","):
+        shape, _, weight = part.partition("=")
+        if shape.strip() not in SHAPES:
+            raise ValueError(f"Unknown procedure shape '{shape}'; expected one of {', '.join(SHAPES)}")
+        weights[shape.strip()] = float(weight or 1)
+    return weights
+
+def _header(name, params, rng):
+    return BANNER.format(name=name, year=rng.randint(2008, 2020), ticket=rng.randint(1000, 9999)) + (
+        f"CREATE PROCEDURE dbo.{name}\n    {params}\nAS\nBEGIN\n    SET NOCOUNT ON;\n"
+    )
+
+def crud(name, rng, max_lines):
+    table = rng.choice(TABLES)
+    verb = rng.choice(["Get", "Insert", "Update", "Delete"])
+    body = {
+        "Get": f"    SELECT * FROM dbo.[{table}] WHERE {table}Id = @Id;\n",
+        "Insert": f"    INSERT INTO dbo.[{table}] (Name, CreatedAt) VALUES (@Name, SYSDATETIME());\n    SELECT SCOPE_IDENTITY() AS {table}Id;\n",
+        "Update": f"    UPDATE dbo.[{table}] SET Name = @Name, ModifiedAt = SYSDATETIME() WHERE {table}Id = @Id;\n",
+        "Delete": f"    DELETE FROM dbo.[{table}] WHERE {table}Id = @Id;\n",
+    }[verb]
+    return _header(name, "@Id INT = NULL, @Name NVARCHAR(100) = NULL", rng) + body + "END\n"
+
+def etl(name, rng, max_lines):
+    target_lines = min(max_lines, rng.randint(50, 400))
+    parts = [_header(name, "@BatchDate DATE", rng)]
+    lines = sum(part.count("\n") for part in parts)
+    while lines < target_lines:
+        source, target = rng.sample(TABLES, 2)
+        block = f"""    -- Load {target} from {source}
+    BEGIN TRY
+        BEGIN TRANSACTION;
+        MERGE stg.[{target}] AS t
+        USING (
+            SELECT s.{source}Id, s.Name, SUM(s.Amount) AS Amount
+            FROM dbo.[{source}] s
+            INNER JOIN dbo.[{target}] x ON x.{source}Id = s.{source}Id
+            WHERE s.ModifiedAt >= @BatchDate
+            GROUP BY s.{source}Id, s.Name
+        ) AS src ON t.{source}Id = src.{source}Id
+        WHEN MATCHED AND t.Amount <> src.Amount THEN UPDATE SET t.Amount = src.Amount
+        WHEN NOT MATCHED THEN INSERT ({source}Id, Name, Amount) VALUES (src.{source}Id, src.Name, src.Amount);
+        -- UPDATE stg.[{target}] SET Amount = 0 WHERE Amount IS NULL; -- disabled 2016
+        COMMIT TRANSACTION;
+    END TRY
+""" + CATCH
+        parts.append(block)
+        lines += block.count("\n")
+    parts.append("END\n")
+    return "".join(parts)
+
+def generated(name, rng, max_lines, table):
+    return _header(name, "@LoadDate DATE = NULL", rng) + f"""    BEGIN TRY
+        BEGIN TRANSACTION;
+        DELETE FROM stg.[{table}] WHERE LoadDate < DATEADD(DAY, -7, ISNULL(@LoadDate, GETDATE()));
+        INSERT INTO stg.[{table}] ({table}Id, Name, Amount, LoadDate)
+        SELECT s.{table}Id, s.Name, s.Amount, ISNULL(@LoadDate, GETDATE())
+        FROM src.[{table}] s
+        LEFT JOIN stg.[{table}] d ON d.{table}Id = s.{table}Id
+        WHERE d.{table}Id IS NULL;
+        UPDATE d SET d.Amount = s.Amount
+        FROM stg.[{table}] d
+        INNER JOIN src.[{table}] s ON s.{table}Id = d.{table}Id
+        WHERE d.Amount <> s.Amount;
+        COMMIT TRANSACTION;
+    END TRY
+""" + CATCH + "END\n"
+
+def cursor(name, rng, max_lines):
+    target_lines = min(max_lines, rng.randint(1000, 10000))
+    table = rng.choice(TABLES)
+    parts = [_header(name, "@RunDate DATE", rng), f"""    DECLARE @Id INT, @Amount MONEY, @Status INT;
+    DECLARE item_cursor CURSOR LOCAL FAST_FORWARD FOR
+        SELECT {table}Id, Amount, Status FROM dbo.[{table}] WHERE ProcessedAt IS NULL;
+    OPEN item_cursor;
+    FETCH NEXT FROM item_cursor INTO @Id, @Amount, @Status;
+    WHILE @@FETCH_STATUS = 0
+    BEGIN
+"""]
+    lines = sum(part.count("\n") for part in parts)
+    step = 0
+    while lines < target_lines - 8:
+        step += 1
+        block = f"""        IF @Status = {step % 7}
+        BEGIN
+            IF @Amount > {step * 10}
+                UPDATE dbo.[{table}] SET Status = {step % 7 + 1}, Amount = @Amount * 1.0{step % 10} WHERE {table}Id = @Id;
+            ELSE
+                INSERT INTO audit.[{table}History] ({table}Id, Step, Amount) VALUES (@Id, {step}, @Amount);
+        END
+"""
+        parts.append(block)
+        lines += block.count("\n")
+    parts.append("""        FETCH NEXT FROM item_cursor INTO @Id, @Amount, @Status;
+    END
+    CLOSE item_cursor;
+    DEALLOCATE item_cursor;
+END
+""")
+    return "".join(parts)
+
+def orchestrator(name, rng, max_lines, callees=()):
+    calls = "".join(f"        EXEC dbo.{callee} @BatchDate;\n" for callee in callees) or "        PRINT 'nothing to run';\n"
+    return _header(name, "@BatchDate DATE", rng) + "    BEGIN TRY\n" + calls + "    END TRY\n" + CATCH + "END\n"
+
+def generate_corpus(procedures=100, mix=DEFAULT_MIX, max_lines=10000, seed=0):
+    """
+    procedures synthetic procedure records drawn from mix (shape=weight, comma separated),
+    reproducible for a given seed. Cursor and ETL procedures are capped at max_lines.
+    """
+    rng = random.Random(seed)
+    weights = parse_mix(mix)
+    shapes = rng.choices(list(weights), weights=list(weights.values()), k=procedures)
+    corpus = []
+    names = []
+    for index, shape in enumerate(shapes):
+        if shape == "generated":
+            # Distinct table per procedure, named from words so the family differs only by table
+            table = TABLES[index % len(TABLES)] + TABLES[index // len(TABLES) % len(TABLES)]
+            if index >= len(TABLES) ** 2:
+                table += str(index)
+            name = f"usp_Load_{table}"
+            definition = generated(name, rng, max_lines, table=table)
+        elif shape == "orchestrator":
+            name = f"usp_Run_{index}"
+            definition = orchestrator(name, rng, max_lines, rng.sample(names, min(len(names), rng.randint(2, 6))))
+        else:
+            name = f"usp_{shape.title()}_{index}"
+            definition = globals()[shape](name, rng, max_lines)
+        names.append(name)
+        executions = rng.choice([0, 0, rng.randint(1, 100), rng.randint(100, 1_000_000)])
+        corpus.append({
+            "name": name,
+            "definition": definition,
+            "last_execution_time": "2026-01-01 00:00:00" if executions else "Never executed",
+            "object_id": 1000 + index,
+            "modify_date": "2024-01-01 00:00:00.000",
+            "schema": "dbo",
+            "execution_count": executions,
+            "total_worker_time_ms": executions * rng.uniform(0.1, 50),
+            "total_elapsed_time_ms": executions * rng.uniform(0.2, 80),
+            "total_logical_reads": executions * rng.randint(1, 5000),
+            "cached_time": "2025-12-25 00:00:00" if executions else None,
+            "stats_age_seconds": 7 * 86400 if executions else None,
+            "shape": shape
+        })
+    return corpus
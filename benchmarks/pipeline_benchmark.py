@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Time the analysis pipeline end to end, offline, on a synthetic procedure corpus with a
+stub LLM: crawl, complexity scoring, LLM fan-out and CSV/DOCX generation are timed
+separately and written as JSON, so runs can be compared between versions.
+
+    python benchmarks/pipeline_benchmark.py --procedures 500 --latency-ms 300 --output bench.json
+    python benchmarks/pipeline_benchmark.py --compare bench.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# The real client is never called, but core.llm builds one at import time;
+# cached responses would hide the fan-out cost being measured
+os.environ.setdefault("OPENAI_API_KEY", "benchmark-stub")
+os.environ.setdefault("LLM_CACHE_DISABLED", "true")
+
+from corpus import DEFAULT_MIX, generate_corpus
+from stub_llm import StubLLM, install
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], cwd=ROOT, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+class Stages:
+    """Wall-clock time per named stage."""
+
+    def __init__(self):
+        self.results = {}
+
+    def run(self, name, func, items=None):
+        print(f"⏱️  {name}...", end="", flush=True)
+        started = time.perf_counter()
+        result = func()
+        seconds = time.perf_counter() - started
+        self.results[name] = {"seconds": round(seconds, 4)}
+        if items:
+            self.results[name]["items_per_second"] = round(items / seconds, 2) if seconds else None
+        print(f" {seconds:.3f}s")
+        return result
+
+def crawl(corpus, directory, batch_size):
+    """
+    Stream the corpus back through SQLAlchemy and the crawler's row mapping from a SQLite
+    table laid out like the crawl query's result. Measures the client side of a crawl
+    (driver, streaming, record construction); server query time is not modelled.
+    """
+    from sqlalchemy import create_engine, text
+    from agents.schema_crawler import _row_to_proc
+    engine = create_engine(f"sqlite:///{os.path.join(directory, 'crawl.sqlite')}")
+    columns = ["name", "definition", "last_execution_time", "object_id", "modify_date", "schema",
+               "execution_count", "total_worker_time_ms", "total_elapsed_time_ms", "total_logical_reads",
+               "cached_time", "stats_age_seconds"]
+    with engine.begin() as conn:
+        conn.execute(text(f"CREATE TABLE procedures ({', '.join(f'[{column}]' for column in columns)})"))
+        conn.execute(
+            text(f"INSERT INTO procedures VALUES ({', '.join(':' + column for column in columns)})"),
+            [{column: proc[column] for column in columns} for proc in corpus]
+        )
+
+    def stream():
+        procs = []
+        with engine.connect() as conn:
+            result = conn.execution_options(stream_results=True, max_row_buffer=batch_size).execute(
+                text("SELECT * FROM procedures ORDER BY name")
+            )
+            for batch in result.partitions(batch_size):
+                procs.extend(_row_to_proc(row) for row in batch)
+        return procs
+
+    return stream, engine
+
+def compare(current, baseline):
+    print(f"\n📈 Compared with {baseline.get('revision') or 'baseline'} ({baseline.get('timestamp')}):")
+    for name, stage in current["stages"].items():
+        before = baseline.get("stages", {}).get(name)
+        if not before or not before.get("seconds"):
+            continue
+        ratio = stage["seconds"] / before["seconds"]
+        marker = "🔺" if ratio > 1.1 else ("🔻" if ratio < 0.9 else "  ")
+        print(f"   {marker} {name:<14} {before['seconds']:>9.3f}s -> {stage['seconds']:>9.3f}s ({ratio:.2f}x)")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--procedures", type=int, default=200)
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Procedure shapes and weights (default {DEFAULT_MIX})")
+    parser.add_argument("--max-lines", type=int, default=10000, help="Upper bound for ETL and cursor-heavy procedures")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Stub LLM latency per call")
+    parser.add_argument("--jitter-ms", type=float, default=50)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=20, help="Extra stub latency per thousand prompt tokens")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of stub LLM calls that fail with a retryable 503")
+    parser.add_argument("--capacity", type=int, default=None, help="Stub LLM requests in flight beyond which it answers 429")
+    parser.add_argument("--retry-after", type=float, default=1, help="Retry-After seconds sent with stub 429s")
+    parser.add_argument("--max-workers", type=int, default=None, help="LLM fan-out width (default LLM_MAX_CONCURRENCY)")
+    parser.add_argument("--batch-summaries", action="store_true", default=None)
+    parser.add_argument("--call-graph", action="store_true", help="Order analysis by the EXEC call graph")
+    parser.add_argument("--near-duplicates", action="store_true", default=None)
+    parser.add_argument("--crawl-batch-size", type=int, default=500)
+    parser.add_argument("--output", help="Write the JSON results here (default: stdout)")
+    parser.add_argument("--compare", metavar="BASELINE_JSON", help="Print per-stage ratios against an earlier result")
+    args = parser.parse_args()
+
+    from agents.complexity_analyzer import analyze_many
+    from agents.csv_generator import write_csv
+    from agents.documentation_writer import write_summary
+    from core.call_graph import build_call_graph
+    from core.pipeline import analyze_procedures
+    from core.metrics import reset_metrics
+    from core.rate_limiter import get_limiter
+
+    stub = StubLLM(args.latency_ms, args.jitter_ms, args.ms_per_1k_tokens, args.error_rate, args.seed, args.capacity, args.retry_after)
+    install(stub)
+
+    corpus = generate_corpus(args.procedures, args.mix, args.max_lines, args.seed)
+    shapes = {}
+    for proc in corpus:
+        shapes[proc["shape"]] = shapes.get(proc["shape"], 0) + 1
+    corpus_bytes = sum(len(proc["definition"]) for proc in corpus)
+    corpus_lines = sum(proc["definition"].count("\n") for proc in corpus)
+    print(f"📦 Corpus: {len(corpus)} procedures, {corpus_lines:,} lines, {corpus_bytes / 1_000_000:.1f} MB {shapes}")
+
+    metrics = reset_metrics()
+    stages = Stages()
+    outcome = "completed"
+    error = None
+    with tempfile.TemporaryDirectory() as directory:
+        stream, engine = crawl(corpus, directory, args.crawl_batch_size)
+        procs = stages.run("crawl", stream, len(corpus))
+        engine.dispose()
+        complexities = stages.run("complexity", lambda: analyze_many(procs).to_dict("records"), len(procs))
+        call_graph = stages.run("call_graph", lambda: build_call_graph(procs), len(procs)) if args.call_graph else None
+        try:
+            rows, technical_analyses = stages.run("llm_fanout", lambda: analyze_procedures(
+                procs, max_workers=args.max_workers, batch_summaries=args.batch_summaries,
+                call_graph=call_graph, near_duplicates=args.near_duplicates, complexities=complexities
+            ), len(procs))
+            stages.run("csv", lambda: write_csv(rows, os.path.join(directory, "analysis.csv")), len(rows))
+            stages.run("docx", lambda: write_summary(rows, technical_analyses, os.path.join(directory, "summary.docx")), len(rows))
+        except Exception as e:
+            # A failed run is still a result worth recording (e.g. with --error-rate)
+            outcome, error = "failed", f"{type(e).__name__}: {e}"
+            print(f"\n❌ Pipeline failed: {error}")
+
+    results = {
+        "revision": git_revision(),
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "cpu_count": os.cpu_count(),
+        "config": vars(args),
+        "corpus": {"procedures": len(corpus), "lines": corpus_lines, "bytes": corpus_bytes, "shapes": shapes},
+        "outcome": outcome,
+        "error": error,
+        "stages": stages.results,
+        "total_seconds": round(sum(stage["seconds"] for stage in stages.results.values()), 4),
+        "llm": {**stub.stats(), "retries": metrics.summary()["totals"]["retries"], "failed_requests": metrics.summary()["totals"]["errors"],
+                "final_concurrency": round(get_limiter().concurrency, 2)}
+    }
+
+    output = json.dumps(results, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(output + "\n")
+        print(f"💾 Results written to {args.output}")
+    else:
+        print(output)
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(results, json.load(f))
+    return 0 if outcome == "completed" else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
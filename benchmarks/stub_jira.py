@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for the Jira REST endpoints used by agents.jira_creator (bulk create and
+label search), with simulated throttling and lost responses, so bulk pushes can be
+exercised offline. Run directly to push synthetic stories twice and check that no
+duplicate issues were created:
+
+    python benchmarks/stub_jira.py --stories 300 --throttle-rate 0.2 --lost-response-rate 0.1
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+class StubJira:
+    """
+    In-memory issue store behind POST /rest/api/2/issue/bulk and POST /rest/api/2/search.
+    With throttle_rate a request is answered 429 with Retry-After; with lost_response_rate
+    a bulk request creates its issues but answers 502, as when a response is lost.
+    """
+
+    def __init__(self, throttle_rate=0.0, lost_response_rate=0.0, retry_after=1, latency_ms=20, seed=0):
+        self.throttle_rate = throttle_rate
+        self.lost_response_rate = lost_response_rate
+        self.retry_after = retry_after
+        self.latency_ms = latency_ms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.issues = []
+        self.requests = 0
+        self.throttled = 0
+        self.lost_responses = 0
+
+    def handle(self, path, payload):
+        """(status, body, headers) for one request."""
+        time.sleep(self.latency_ms / 1000)
+        with self._lock:
+            self.requests += 1
+            if self._rng.random() < self.throttle_rate:
+                self.throttled += 1
+                return 429, {"errorMessages": ["Rate limit exceeded"]}, {"Retry-After": str(self.retry_after)}
+            if path == "/rest/api/2/search":
+                labels = set(re.findall(r'"([^"]+)"', payload["jql"].split("labels in", 1)[1]))
+                matches = [issue for issue in self.issues if labels & set(issue["fields"].get("labels", []))]
+                return 200, {"issues": matches[:payload.get("maxResults", 50)], "total": len(matches)}, {}
+            if path == "/rest/api/2/issue/bulk":
+                created, errors = [], []
+                for index, update in enumerate(payload["issueUpdates"]):
+                    if not update["fields"].get("summary"):
+                        errors.append({"status": 400, "failedElementNumber": index, "elementErrors": {"errors": {"summary": "required"}}})
+                        continue
+                    key = f"{update['fields']['project']['key']}-{len(self.issues) + 1}"
+                    self.issues.append({"key": key, "fields": update["fields"]})
+                    created.append({"id": str(len(self.issues)), "key": key})
+                if self._rng.random() < self.lost_response_rate:
+                    self.lost_responses += 1
+                    return 502, {"errorMessages": ["Bad gateway"]}, {}
+                return (201 if created else 400), {"issues": created, "errors": errors}, {}
+            return 404, {"errorMessages": ["Not found"]}, {}
+
+    def serve(self, host="127.0.0.1", port=0):
+        """Start serving on a background thread; returns the server (server.server_address has the port)."""
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                status, body, headers = stub.handle(self.path, payload)
+                data = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--stories", type=int, default=300)
+    parser.add_argument("--throttle-rate", type=float, default=0.1)
+    parser.add_argument("--lost-response-rate", type=float, default=0.05)
+    parser.add_argument("--retry-after", type=float, default=0.2)
+    parser.add_argument("--max-workers", type=int, default=4)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    os.environ.setdefault("JIRA_RETRY_BASE_SECONDS", "0.1")
+    os.environ.setdefault("JIRA_SEARCH_SETTLE_SECONDS", "0.05")
+
+    from agents.jira_creator import JiraClient, JiraLedger, bulk_create_tickets
+
+    stub = StubJira(args.throttle_rate, args.lost_response_rate, args.retry_after, seed=args.seed)
+    server = stub.serve()
+    client = JiraClient(f"http://127.0.0.1:{server.server_address[1]}", "stub", "stub")
+    stories = [
+        {"title": f"SP Refactor - usp_Proc_{index}", "description": f"Refactor usp_Proc_{index}",
+         "procedure_name": f"usp_Proc_{index}", "definition_hash": f"{index:08x}"}
+        for index in range(args.stories)
+    ]
+    with tempfile.TemporaryDirectory() as directory:
+        ledger_path = os.path.join(directory, "jira_ledger.json")
+        outcomes = {}
+        for attempt in ("first push", "second push", "push with a lost ledger"):
+            if attempt == "push with a lost ledger":
+                os.remove(ledger_path)
+            started = time.perf_counter()
+            results = bulk_create_tickets(stories, client=client, ledger=JiraLedger(ledger_path), max_workers=args.max_workers)
+            counts = {}
+            for result in results:
+                counts[result["status"]] = counts.get(result["status"], 0) + 1
+            outcomes[attempt] = counts
+            print(f"📤 {attempt}: {counts} in {time.perf_counter() - started:.2f}s")
+    server.shutdown()
+
+    duplicates = len(stub.issues) - len({issue["fields"]["labels"][1] for issue in stub.issues})
+    print(f"🎫 {len(stub.issues)} issues, {duplicates} duplicates; {stub.requests} requests, "
+          f"{stub.throttled} throttled, {stub.lost_responses} lost responses")
+    ok = duplicates == 0 and len(stub.issues) == args.stories and all(
+        counts.get("failed", 0) == 0 for counts in outcomes.values()
+    )
+    print("✅ No duplicates" if ok else "❌ Unexpected result")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
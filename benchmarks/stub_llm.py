@@ -0,0 +1,92 @@
+"""
+Local stand-in for the OpenAI client behind core.llm.call_llm, with configurable latency,
+error rate and capacity, so the pipeline (including retries and rate limiting) can be
+benchmarked offline and without API cost.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from types import SimpleNamespace
+
+class StubLLMError(RuntimeError):
+    """A simulated API error; status_code and Retry-After look like the provider's."""
+
+    def __init__(self, message, status_code, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        headers = {"retry-after": str(retry_after)} if retry_after is not None else {}
+        self.response = SimpleNamespace(status_code=status_code, headers=headers)
+
+class StubLLM:
+    """
+    Client with the chat.completions.create() shape. Each call sleeps latency_ms
+    (+/- jitter_ms) plus ms_per_1k_tokens per thousand prompt tokens, fails with a 503
+    with probability error_rate, and otherwise returns a canned response (a JSON array
+    for batched summary prompts) with usage. With capacity, requests beyond that many in
+    flight get a 429 with Retry-After instead.
+    """
+
+    def __init__(self, latency_ms=200, jitter_ms=50, ms_per_1k_tokens=0, error_rate=0.0, seed=0, capacity=None, retry_after=1):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.error_rate = error_rate
+        self.capacity = capacity
+        self.retry_after = retry_after
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.calls = 0
+        self.errors = 0
+        self.throttled = 0
+        self.prompt_tokens = 0
+        self.chat = SimpleNamespace(completions=SimpleNamespace(create=self.create))
+
+    def create(self, model="gpt-4", messages=(), temperature=0, **kwargs):
+        prompt = messages[-1]["content"]
+        tokens = len(prompt) // 4 + 1
+        with self._lock:
+            self.calls += 1
+            if self.capacity and self.in_flight >= self.capacity:
+                self.throttled += 1
+                raise StubLLMError("Simulated rate limit", 429, self.retry_after)
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+            self.prompt_tokens += tokens
+            delay = self.latency_ms + self._rng.uniform(-self.jitter_ms, self.jitter_ms)
+            failed = self._rng.random() < self.error_rate
+        try:
+            time.sleep(max(0.0, delay + tokens / 1000 * self.ms_per_1k_tokens) / 1000)
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+        if failed:
+            with self._lock:
+                self.errors += 1
+            raise StubLLMError("Simulated LLM failure", 503)
+        content = self.respond(prompt)
+        completion_tokens = len(content) // 4 + 1
+        return SimpleNamespace(
+            choices=[SimpleNamespace(message=SimpleNamespace(content=content))],
+            usage=SimpleNamespace(prompt_tokens=tokens, completion_tokens=completion_tokens, total_tokens=tokens + completion_tokens)
+        )
+
+    def respond(self, prompt):
+        names = re.findall(r"^Stored Procedure: (.+)$", prompt, re.MULTILINE)
+        if "JSON array" in prompt:
+            return json.dumps([{"name": name, "summary": f"{name} maintains business data."} for name in names])
+        name = names[0] if names else "This procedure"
+        return f"{name} maintains business data. It reads and updates several tables. It applies the batch rules."
+
+    def stats(self):
+        return {"calls": self.calls, "errors": self.errors, "throttled": self.throttled,
+                "peak_in_flight": self.peak_in_flight, "prompt_tokens": self.prompt_tokens}
+
+def install(stub):
+    """Send call_llm's requests to stub instead of the OpenAI API."""
+    import core.llm
+    core.llm.client = stub
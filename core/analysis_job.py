@@ -0,0 +1,199 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from agents.schema_crawler import extract_schema
+from agents.csv_generator import CsvStreamWriter, dataset_format, validate_dataset_format, write_dataset
+from agents.documentation_writer import validate_report_settings, write_summary
+from core.pipeline import analyze_procedures, analyze_procedures_incremental, REFACTORING_THRESHOLD
+from core.manifest import save_manifest, build_manifest
+from core.journal import RunJournal
+from core.call_graph import call_graph_enabled, load_call_graph
+from core.metrics import reset_metrics
+from core.inventory import database_name
+from core.result_store import save_results
+
+# Recently completed procedures kept for the UI's windowed view
+DEFAULT_WINDOW = 25
+
+def run_analysis(publish, incremental=False, resume_run_id=None):
+    """
+    Crawl (or reload a journaled run), analyze and write the reports, publishing progress
+    as publish(kind, **data) events. Results are saved to the result store; returns the
+    run's store entry.
+    """
+    metrics = reset_metrics()
+    if resume_run_id:
+        journal = RunJournal.open(resume_run_id)
+        incremental = journal.options.get("incremental", False)
+        procs = journal.load_procedures()
+    else:
+        publish("phase", text="🔍 Schema Crawler Agent: Connecting to database and extracting stored procedures...")
+        with metrics.stage("crawl"):
+            procs = extract_schema()
+        journal = RunJournal.create(procs, options={"incremental": incremental})
+    publish("started", total=len(procs), run_id=journal.run_id)
+
+    def on_stage(name, agent, status):
+        publish("stage", name=name, agent=agent, status=status)
+
+    # Rows are streamed to disk as they complete so a failure mid-run keeps finished work
+    csv_writer = CsvStreamWriter()
+
+    def on_complete(index, row, elapsed):
+        csv_writer.append(row)
+        publish("completed", name=row["sp_name"], complexity=row["complexity"], elapsed=elapsed)
+
+    # Callees first, so callers can be summarized from their callees' summaries
+    call_graph = None
+    if call_graph_enabled():
+        publish("phase", text="🕸️ Building procedure call graph...")
+        call_graph = load_call_graph(procs)
+
+    publish("phase", text="🤖 Analyzing stored procedures...")
+    with csv_writer:
+        if incremental:
+            combined, technical_analyses, analyzed_count = analyze_procedures_incremental(procs, on_stage=on_stage, on_complete=on_complete, journal=journal, call_graph=call_graph)
+            publish("carried", count=len(procs) - analyzed_count)
+        else:
+            combined, technical_analyses = analyze_procedures(procs, on_stage=on_stage, on_complete=on_complete, journal=journal, call_graph=call_graph)
+            save_manifest(build_manifest(procs, combined, technical_analyses))
+
+    publish("phase", text="📋 **CSV Generator Agent**: Creating analysis spreadsheet...")
+    csv_writer.finalize(combined)
+    if dataset_format():
+        write_dataset(combined, journal.run_id, database=database_name(os.getenv("DB_CONNECTION_STRING", "")))
+    publish("phase", text="📝 **Documentation Writer Agent**: Compiling refactoring report...")
+    with metrics.stage("reports"):
+        write_summary(combined, technical_analyses)
+    run = save_results(journal.run_id, combined, technical_analyses, database=database_name(os.getenv("DB_CONNECTION_STRING", "")))
+    journal.mark_complete()
+    metrics.export()
+    return run
+
+class AnalysisJob:
+    """
+    An analysis run on a background thread. The worker only puts events on a queue;
+    poll() (called from the UI) folds them into aggregate counters, the procedures in
+    flight and a window of recently completed ones, so rendering cost does not grow
+    with the number of procedures.
+    """
+
+    def __init__(self, incremental=False, resume_run_id=None, window=DEFAULT_WINDOW):
+        self.id = uuid.uuid4().hex[:8]
+        self.incremental = incremental
+        self.resume_run_id = resume_run_id
+        self.events = queue.Queue()
+        self.status = "running"
+        self.phase = "Starting..."
+        self.run_id = resume_run_id
+        self.total = 0
+        self.completed = 0
+        self.carried = 0
+        self.high_complexity = 0
+        self.active = {}
+        self.recent = deque(maxlen=window)
+        self.agent_counts = Counter()
+        self.result = None
+        self.error = None
+        self.started_at = time.time()
+        self._poll_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name=f"analysis-{self.id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def _publish(self, kind, **data):
+        self.events.put((kind, data))
+
+    def _run(self):
+        try:
+            result = run_analysis(self._publish, self.incremental, self.resume_run_id)
+        except Exception as e:
+            self._publish("failed", error=f"{type(e).__name__}: {e}")
+        else:
+            self._publish("done", result=result)
+
+    def poll(self):
+        """Apply every queued event; safe to call from several sessions."""
+        with self._poll_lock:
+            while True:
+                try:
+                    kind, data = self.events.get_nowait()
+                except queue.Empty:
+                    break
+                self._apply(kind, data)
+        return self
+
+    def _apply(self, kind, data):
+        if kind == "phase":
+            self.phase = data["text"]
+        elif kind == "started":
+            self.total = data["total"]
+            self.run_id = data["run_id"]
+        elif kind == "stage":
+            if data["status"] == "active":
+                self.active[data["name"]] = data["agent"]
+            else:
+                self.agent_counts[(data["agent"], data["status"])] += 1
+        elif kind == "completed":
+            self.completed += 1
+            self.active.pop(data["name"], None)
+            if data["complexity"] > REFACTORING_THRESHOLD:
+                self.high_complexity += 1
+            self.recent.append(data)
+        elif kind == "carried":
+            self.carried = data["count"]
+        elif kind == "done":
+            self.status = "complete"
+            self.result = data["result"]
+            self.active.clear()
+        elif kind == "failed":
+            self.status = "failed"
+            self.error = data["error"]
+            self.active.clear()
+
+    @property
+    def running(self):
+        return self.status == "running"
+
+    @property
+    def elapsed(self):
+        return time.time() - self.started_at
+
+# Jobs outlive Streamlit reruns and sessions because imported modules are kept;
+# only the running job and the most recent finished one are held
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def start_job(incremental=False, resume_run_id=None):
+    """Start an analysis in the background, or return the one already running (one at a time: they share outputs/)."""
+    with _jobs_lock:
+        running = next((job for job in _jobs.values() if job.poll().running), None)
+        if running:
+            return running
+        job = AnalysisJob(incremental, resume_run_id)
+        try:
+            # Report settings are only read at the end; fail before spending on the LLM
+            validate_report_settings()
+            validate_dataset_format()
+        except (ValueError, ImportError) as e:
+            job._publish("failed", error=f"{type(e).__name__}: {e}")
+        else:
+            job.start()
+        # Nothing is running here, so keep only the most recent finished job next to the new one
+        for finished_id in list(_jobs)[:-1]:
+            del _jobs[finished_id]
+        _jobs[job.id] = job
+        return job
+
+def get_job(job_id):
+    return _jobs.get(job_id)
+
+def running_job():
+    """The job still in flight, if any (e.g. to reattach after a browser refresh)."""
+    with _jobs_lock:
+        return next((job for job in _jobs.values() if job.poll().running), None)
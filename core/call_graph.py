@@ -0,0 +1,106 @@
+from core.settings import env_flag
+from core.tsql_lexer import tokenize, WORD, VARIABLE, SYMBOL, IDENTIFIER
+
+_NAME_PART_KINDS = (WORD, IDENTIFIER)
+
+def _name_parts(tokens, position):
+    """Dotted name starting at tokens[position] as a list of parts ('' for an omitted part)."""
+    parts = [tokens[position].value]
+    position += 1
+    while position < len(tokens) and tokens[position].kind == SYMBOL and tokens[position].value == ".":
+        position += 1
+        if position < len(tokens) and tokens[position].kind in _NAME_PART_KINDS:
+            parts.append(tokens[position].value)
+            position += 1
+        else:
+            # db..proc leaves the schema part empty
+            parts.append("")
+    return parts
+
+def parse_exec_targets(definition):
+    """
+    Procedures called by EXEC/EXECUTE statements in a definition, as (schema, name)
+    pairs (schema is None when the call is unqualified). Calls through dynamic SQL or
+    a procedure-name variable are skipped, as are EXECUTE AS and calls qualified with
+    a database or server name, which cannot be resolved within one crawl.
+    """
+    sql = definition or ""
+    tokens = list(tokenize(sql))
+    targets = []
+    for index, token in enumerate(tokens):
+        if token.kind != WORD or token.value not in ("EXEC", "EXECUTE"):
+            continue
+        position = index + 1
+        if position >= len(tokens):
+            continue
+        # EXEC @status = dbo.Proc captures a return code; EXEC @proc_name is dynamic
+        if tokens[position].kind == VARIABLE:
+            after_variable = tokens[position].position + len(tokens[position].value)
+            next_start = tokens[position + 1].position if position + 1 < len(tokens) else len(sql)
+            if sql[after_variable:next_start].strip() != "=":
+                continue
+            position += 1
+        if position >= len(tokens) or tokens[position].kind not in _NAME_PART_KINDS or tokens[position].value == "AS":
+            continue
+        parts = _name_parts(tokens, position)
+        if len(parts) <= 2 and parts[-1]:
+            schema = parts[-2] if len(parts) >= 2 and parts[-2] else None
+            targets.append((schema, parts[-1]))
+    return targets
+
+def build_call_graph(procs, dependencies=()):
+    """
+    Index of which procedures each procedure calls: callees[i] lists the positions in
+    procs of the procedures that procs[i] calls, from EXEC statements in its definition
+    plus any (caller object_id, callee object_id) dependency pairs from the catalog.
+    Unqualified calls resolve to the only procedure of that name, or the dbo one.
+    """
+    by_name = {}
+    by_qualified_name = {}
+    by_object_id = {}
+    for index, proc in enumerate(procs):
+        # Crawled names are schema-qualified; EXEC targets are matched on the bare name
+        name = proc.get("object_name", proc["name"]).casefold()
+        schema = (proc.get("schema") or "dbo").casefold()
+        by_name.setdefault(name, []).append(index)
+        by_qualified_name[(schema, name)] = index
+        if proc.get("object_id") is not None:
+            by_object_id[proc["object_id"]] = index
+
+    def resolve(schema, name):
+        name = name.casefold()
+        if schema:
+            return by_qualified_name.get((schema.casefold(), name))
+        candidates = by_name.get(name, [])
+        if len(candidates) == 1:
+            return candidates[0]
+        return by_qualified_name.get(("dbo", name))
+
+    callees = [set() for _ in procs]
+    for index, proc in enumerate(procs):
+        for schema, name in parse_exec_targets(proc["definition"]):
+            callee = resolve(schema, name)
+            if callee is not None:
+                callees[index].add(callee)
+    for caller_id, callee_id in dependencies:
+        if caller_id in by_object_id and callee_id in by_object_id:
+            callees[by_object_id[caller_id]].add(by_object_id[callee_id])
+
+    return [sorted(callee for callee in calls if callee != index) for index, calls in enumerate(callees)]
+
+def call_graph_enabled():
+    """Whether runs order analysis by the call graph and pass callee summaries to callers (LLM_CALLEE_SUMMARIES)."""
+    return env_flag("LLM_CALLEE_SUMMARIES")
+
+def load_call_graph(procs, connection_string=None):
+    """
+    build_call_graph with the catalog's dependencies; when the catalog is unreachable
+    (e.g. resuming a run offline) only EXEC statements are used.
+    """
+    from agents.schema_crawler import extract_dependencies
+    try:
+        dependencies = extract_dependencies(connection_string)
+    except Exception as e:
+        print(f"   ⚠️  Could not read sys.sql_expression_dependencies ({str(e)[:100]}), using EXEC statements only")
+        dependencies = ()
+    return build_call_graph(procs, dependencies)
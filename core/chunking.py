@@ -0,0 +1,106 @@
+import bisect
+import os
+import re
+from core.tsql_lexer import segments, CODE
+from core.llm import call_llm
+from core.executor import run_concurrent
+from core.normalizer import prompt_definition
+
+# Split priorities: a GO batch separator beats a statement boundary beats any line break
+_BATCH = 3
+_STATEMENT = 2
+_LINE = 1
+
+_GO_LINE_RE = re.compile(r"[ \t]*GO[ \t]*(?:\d+)?[ \t]*(?:\r?\n|$)", re.IGNORECASE)
+_STATEMENT_START_RE = re.compile(
+    r"[ \t]*(?:SELECT|INSERT|UPDATE|DELETE|MERGE|WITH|IF|ELSE|WHILE|DECLARE|SET|EXEC|EXECUTE|BEGIN|END|RETURN|"
+    r"CREATE|ALTER|DROP|TRUNCATE|OPEN|FETCH|CLOSE|DEALLOCATE|COMMIT|ROLLBACK|PRINT|RAISERROR|THROW)\b",
+    re.IGNORECASE
+)
+
+def estimate_tokens(text):
+    """Rough token count (about 4 characters per token for English and SQL)."""
+    return len(text or "") // 4 + 1
+
+def max_prompt_tokens():
+    """Definitions estimated above this many tokens (LLM_MAX_PROMPT_TOKENS) go through map-reduce."""
+    return int(os.getenv("LLM_MAX_PROMPT_TOKENS", "6000"))
+
+def chunk_tokens():
+    """Target size of each chunk (LLM_CHUNK_TOKENS)."""
+    return int(os.getenv("LLM_CHUNK_TOKENS", "3000"))
+
+def needs_chunking(definition):
+    return estimate_tokens(definition) > max_prompt_tokens()
+
+def _boundaries(sql):
+    """Candidate split positions (start of a line) with their priority, in ascending order."""
+    positions = []
+    priorities = []
+    for kind, start, end in segments(sql):
+        if kind != CODE:
+            continue
+        newline = sql.find("\n", start, end)
+        while newline != -1:
+            position = newline + 1
+            if _GO_LINE_RE.match(sql, position):
+                priority = _BATCH
+            elif _STATEMENT_START_RE.match(sql, position) or sql[start:newline].rstrip().endswith(";"):
+                priority = _STATEMENT
+            else:
+                priority = _LINE
+            positions.append(position)
+            priorities.append(priority)
+            newline = sql.find("\n", position, end)
+    return positions, priorities
+
+def split_definition(sql, max_tokens=None):
+    """
+    Split a definition into chunks of roughly max_tokens, cutting only at line breaks
+    outside comments and literals. Every GO batch separator is a cut, and inside a batch
+    statement boundaries are preferred, so chunks stay aligned with the source and an
+    edit in one batch leaves the other chunks (and their cached results) unchanged.
+    """
+    max_chars = (max_tokens or chunk_tokens()) * 4
+    if not sql or len(sql) <= max_chars:
+        return [sql]
+    positions, priorities = _boundaries(sql)
+    chunks = []
+    start = 0
+    while start < len(sql):
+        limit = start + max_chars
+        lo = bisect.bisect_right(positions, start)
+        hi = bisect.bisect_right(positions, min(limit, len(sql) - 1))
+        # Always cut at a GO within reach
+        cut = next((positions[i] for i in range(lo, hi) if priorities[i] == _BATCH), None)
+        if cut is None and len(sql) - start <= max_chars:
+            cut = len(sql)
+        if cut is None:
+            # Highest priority boundary in the second half of the window, latest first
+            floor = bisect.bisect_right(positions, start + max_chars // 2, lo, hi)
+            best = max(range(floor, hi), key=lambda i: (priorities[i], i), default=None)
+            if best is None and hi > lo:
+                best = hi - 1
+            cut = positions[best] if best is not None else limit
+        chunks.append(sql[start:cut])
+        start = cut
+    return [chunk for chunk in chunks if chunk.strip()]
+
+def map_reduce(proc, chunk_prompt, reduce_prompt, max_workers=None, technical=False, **fields):
+    """
+    Summarize an oversized definition chunk by chunk in parallel, then combine the
+    partial results with reduce_prompt. chunk_prompt gets name and code; reduce_prompt
+    gets name, notes and any extra fields. Chunk prompts carry no position information,
+    so each chunk's response is cached on its own content. technical selects the
+    definition text for technical prompts (see prompt_definition).
+    """
+    chunks = split_definition(prompt_definition(proc, technical))
+    # Also fanned out when this procedure is one of many analyzed concurrently: every
+    # call_llm goes through the process-wide limiter, which caps requests in flight
+    notes = run_concurrent(
+        lambda chunk: call_llm(chunk_prompt.format(name=proc["name"], code=chunk)),
+        chunks,
+        max_workers=max_workers
+    )
+    combined_notes = "\n\n".join(f"Section {i} of {len(notes)}:\n{note}" for i, note in enumerate(notes, 1))
+    return call_llm(reduce_prompt.format(name=proc["name"], notes=combined_notes, **fields))
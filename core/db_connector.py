@@ -1,8 +1,66 @@
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from sqlalchemy import create_engine
 from dotenv import load_dotenv
+from core.settings import env_flag
 
 load_dotenv(dotenv_path="config/settings.env")
 
-def get_engine():
-    return create_engine(os.getenv("DB_CONNECTION_STRING"))
+_engines = {}
+_engine_lock = threading.Lock()
+
+def _build_engine(url):
+    options = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "5")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        "pool_pre_ping": env_flag("DB_POOL_PRE_PING", True),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    }
+    # fast_executemany and the login timeout keyword are pyodbc-only
+    if url and url.startswith("mssql+pyodbc"):
+        options["fast_executemany"] = env_flag("DB_FAST_EXECUTEMANY", True)
+        options["connect_args"] = {"timeout": int(os.getenv("DB_CONNECT_TIMEOUT", "30"))}
+    return create_engine(url, **options)
+
+def get_engine(connection_string=None):
+    """
+    Process-wide engine for connection_string (default DB_CONNECTION_STRING), created on
+    first use and reused afterwards so connection pooling amortizes driver load and
+    login handshakes across the whole run.
+    """
+    url = connection_string or os.getenv("DB_CONNECTION_STRING")
+    with _engine_lock:
+        engine = _engines.get(url)
+        if engine is not None:
+            return engine
+        engine = _engines[url] = _build_engine(url)
+    # Outside the lock, so a slow server doesn't hold up engines for other URLs
+    warm_up_count = int(os.getenv("DB_WARM_UP_CONNECTIONS", "0"))
+    if warm_up_count > 0:
+        warm_up(warm_up_count, engine=engine)
+    return engine
+
+def warm_up(connections=1, engine=None):
+    """Open connections in parallel and return them to the pool so later checkouts are instant."""
+    engine = engine or get_engine()
+
+    def open_connection(_):
+        return engine.connect()
+
+    with ThreadPoolExecutor(max_workers=connections) as pool:
+        opened = list(pool.map(open_connection, range(connections)))
+    for conn in opened:
+        conn.close()
+
+def dispose_engine(connection_string=None):
+    """
+    Close pooled connections and forget cached engines (e.g. after settings change):
+    only connection_string's engine if given, otherwise all of them.
+    """
+    with _engine_lock:
+        urls = [connection_string] if connection_string else list(_engines)
+        for url in urls:
+            engine = _engines.pop(url, None)
+            if engine is not None:
+                engine.dispose()
@@ -0,0 +1,113 @@
+import contextvars
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('config/settings.env')
+
+DEFAULT_MAX_CONCURRENCY = 8
+
+def get_max_concurrency():
+    """Maximum number of LLM calls allowed in flight at once (LLM_MAX_CONCURRENCY)."""
+    try:
+        return max(1, int(os.getenv("LLM_MAX_CONCURRENCY", DEFAULT_MAX_CONCURRENCY)))
+    except ValueError:
+        return DEFAULT_MAX_CONCURRENCY
+
+def run_concurrent(func, items, max_workers=None, on_complete=None):
+    """
+    Call func(item) for every item on a bounded thread pool.
+    Results are returned in the same order as items, regardless of completion order.
+    on_complete(index, result, elapsed_seconds) is invoked from the calling thread
+    as each call finishes, so callers can report progress and per-call latency.
+    Each call runs in a copy of the caller's context, so run metrics stay attributed.
+    """
+    items = list(items)
+    if not items:
+        return []
+    max_workers = max_workers or get_max_concurrency()
+
+    def timed_call(item):
+        started = time.perf_counter()
+        result = func(item)
+        return result, time.perf_counter() - started
+
+    results = [None] * len(items)
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        futures = {pool.submit(contextvars.copy_context().run, timed_call, item): index for index, item in enumerate(items)}
+        try:
+            for future in as_completed(futures):
+                index = futures[future]
+                result, elapsed = future.result()
+                results[index] = result
+                if on_complete:
+                    on_complete(index, result, elapsed)
+        except BaseException:
+            # Don't start queued calls once one has failed
+            for future in futures:
+                future.cancel()
+            raise
+    return results
+
+def run_after_dependencies(func, items, dependencies, max_workers=None, on_complete=None):
+    """
+    Like run_concurrent, but item i only starts once every item in dependencies[i]
+    (a list of indexes) has finished; func(item, dependency_results) receives their
+    results in that order. Independent items run in parallel. When only a cycle is
+    left, the member with the fewest unfinished dependencies starts anyway and gets
+    the results available so far.
+    """
+    items = list(items)
+    if not items:
+        return []
+    max_workers = max_workers or get_max_concurrency()
+    dependencies = [[d for d in dependencies[index] if d != index] for index in range(len(items))]
+    dependents = [[] for _ in items]
+    waiting_on = []
+    for index, deps in enumerate(dependencies):
+        waiting_on.append(len(set(deps)))
+        for dep in set(deps):
+            dependents[dep].append(index)
+
+    results = [None] * len(items)
+    finished = [False] * len(items)
+    ready = [index for index, count in enumerate(waiting_on) if count == 0]
+    pending = set(range(len(items))) - set(ready)
+
+    def timed_call(index):
+        started = time.perf_counter()
+        result = func(items[index], [results[d] for d in dependencies[index] if finished[d]])
+        return result, time.perf_counter() - started
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(items))) as pool:
+        running = {}
+        try:
+            while ready or running or pending:
+                if not ready and not running:
+                    # Only cycles remain: break one where it is least incomplete
+                    index = min(pending, key=lambda i: (waiting_on[i], i))
+                    pending.discard(index)
+                    ready.append(index)
+                while ready and len(running) < max_workers:
+                    index = ready.pop(0)
+                    running[pool.submit(contextvars.copy_context().run, timed_call, index)] = index
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in sorted(done, key=running.get):
+                    index = running.pop(future)
+                    result, elapsed = future.result()
+                    results[index] = result
+                    finished[index] = True
+                    if on_complete:
+                        on_complete(index, result, elapsed)
+                    for dependent in dependents[index]:
+                        waiting_on[dependent] -= 1
+                        if waiting_on[dependent] == 0 and dependent in pending:
+                            pending.discard(dependent)
+                            ready.append(dependent)
+        except BaseException:
+            for future in running:
+                future.cancel()
+            raise
+    return results
@@ -0,0 +1,95 @@
+import json
+import os
+import re
+from urllib.parse import unquote
+from dotenv import load_dotenv
+
+load_dotenv(dotenv_path="config/settings.env")
+
+DEFAULT_TARGETS_PATH = "config/targets.json"
+
+_DATABASE_RE = re.compile(r"(DATABASE=)[^;]*", re.IGNORECASE)
+
+def database_name(connection_string, default="Unknown Database"):
+    """Database named by a connection string (the ODBC DATABASE= parameter or the URL path)."""
+    try:
+        decoded = unquote(connection_string or "")
+        match = _DATABASE_RE.search(decoded)
+        if match:
+            return match.group(0)[len(match.group(1)):]
+        from sqlalchemy.engine import make_url
+        return make_url(connection_string).database or default
+    except Exception:
+        return default
+
+def with_database(connection_string, database):
+    """Same server and credentials as connection_string, pointed at another database."""
+    from sqlalchemy.engine import make_url
+    url = make_url(connection_string)
+    odbc_connect = url.query.get("odbc_connect")
+    if odbc_connect:
+        if _DATABASE_RE.search(odbc_connect):
+            odbc_connect = _DATABASE_RE.sub(lambda m: m.group(1) + database, odbc_connect, count=1)
+        else:
+            odbc_connect = odbc_connect.rstrip(";") + f";DATABASE={database}"
+        url = url.update_query_dict({"odbc_connect": odbc_connect})
+    else:
+        url = url.set(database=database)
+    return url.render_as_string(hide_password=False)
+
+def list_databases(connection_string, pattern="%"):
+    """Online user databases on the server behind connection_string whose name matches a LIKE pattern."""
+    from core.db_connector import get_engine
+    from sqlalchemy import text
+    query = text("""
+    SELECT name
+    FROM sys.databases
+    WHERE database_id > 4
+        AND state_desc = 'ONLINE'
+        AND HAS_DBACCESS(name) = 1
+        AND name LIKE :pattern
+    ORDER BY name;
+    """)
+    with get_engine(connection_string).connect() as conn:
+        return [row[0] for row in conn.execute(query, {"pattern": pattern})]
+
+def load_targets(path=None):
+    """
+    Databases to analyze, from the JSON inventory at path (DB_TARGETS_FILE, default
+    config/targets.json). Each entry is either a single database:
+        {"name": "sales", "connection_string": "mssql+pyodbc://..."}
+    or a server plus a database LIKE pattern, expanded against sys.databases:
+        {"server": "mssql+pyodbc://...", "databases": "Sales%"}
+    Returns [{"name", "connection_string"}]; names must be unique as they name the
+    per-database output directories.
+    """
+    path = path or os.getenv("DB_TARGETS_FILE", DEFAULT_TARGETS_PATH)
+    with open(path, "r", encoding="utf-8") as f:
+        entries = json.load(f)
+    if isinstance(entries, dict):
+        entries = entries.get("targets", [])
+
+    targets = []
+    for entry in entries:
+        if "connection_string" in entry:
+            connection_string = entry["connection_string"]
+            targets.append({"name": entry.get("name") or database_name(connection_string), "connection_string": connection_string})
+        elif "server" in entry:
+            prefix = entry.get("name_prefix", "")
+            try:
+                databases = list_databases(entry["server"], entry.get("databases", "%"))
+            finally:
+                # The server-level engine is only needed for the listing; each database gets its own
+                from core.db_connector import dispose_engine
+                dispose_engine(entry["server"])
+            for database in databases:
+                targets.append({"name": prefix + database, "connection_string": with_database(entry["server"], database)})
+        else:
+            raise ValueError(f"Target entry needs 'connection_string' or 'server': {entry}")
+
+    seen = set()
+    for target in targets:
+        if target["name"] in seen:
+            raise ValueError(f"Duplicate target name '{target['name']}'; give the entries distinct 'name' or 'name_prefix' values")
+        seen.add(target["name"])
+    return targets
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import uuid
+from datetime import datetime
+
+DEFAULT_RUNS_DIR = "outputs/runs"
+
+# Per-procedure stages recorded in the journal
+SUMMARY = "summary"
+COMPLEXITY = "complexity"
+TECHNICAL_ANALYSIS = "technical_analysis"
+
+def new_run_id():
+    return datetime.now().strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+
+class RunJournal:
+    """
+    Append-only record of a run under outputs/runs/<run_id>/:
+    procedures.jsonl holds the crawled procedures, journal.jsonl one line per completed
+    stage, and run.json the run options and status. Every journal line is fsynced, so an
+    interrupted run can be resumed without repeating any finished LLM call.
+    """
+
+    def __init__(self, run_id, runs_dir=DEFAULT_RUNS_DIR):
+        self.run_id = run_id
+        self.directory = os.path.join(runs_dir, run_id)
+        self._lock = threading.Lock()
+        self._results = {}
+        if os.path.exists(self._path("journal.jsonl")):
+            with open(self._path("journal.jsonl"), "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A line cut short by a crash; that stage simply runs again
+                        continue
+                    self._results.setdefault(entry["name"], {})[entry["stage"]] = entry["result"]
+        self._file = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    @classmethod
+    def create(cls, procs, options=None, runs_dir=DEFAULT_RUNS_DIR, run_id=None):
+        """Start a new run, snapshotting the procedures so a resume needs no database access."""
+        run_id = run_id or new_run_id()
+        journal = cls(run_id, runs_dir)
+        os.makedirs(journal.directory, exist_ok=True)
+        with open(journal._path("procedures.jsonl"), "w", encoding="utf-8") as f:
+            for proc in procs:
+                f.write(json.dumps(proc, default=str) + "\n")
+        journal._write_meta({"run_id": run_id, "status": "running", "options": options or {},
+                             "started_at": datetime.now().isoformat(timespec="seconds")})
+        return journal
+
+    @classmethod
+    def open(cls, run_id, runs_dir=DEFAULT_RUNS_DIR):
+        journal = cls(run_id, runs_dir)
+        if not os.path.exists(journal._path("run.json")):
+            raise FileNotFoundError(f"No run '{run_id}' found in {runs_dir}")
+        return journal
+
+    def _write_meta(self, meta):
+        tmp_path = self._path("run.json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        os.replace(tmp_path, self._path("run.json"))
+
+    @property
+    def meta(self):
+        with open(self._path("run.json"), "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    @property
+    def options(self):
+        return self.meta.get("options", {})
+
+    def load_procedures(self):
+        with open(self._path("procedures.jsonl"), "r", encoding="utf-8") as f:
+            return [json.loads(line) for line in f if line.strip()]
+
+    def get(self, name, stage, default=None):
+        return self._results.get(name, {}).get(stage, default)
+
+    def has(self, name, stage):
+        return stage in self._results.get(name, {})
+
+    def record(self, name, stage, result):
+        """Durably record a completed stage. Safe to call from worker threads."""
+        line = json.dumps({"name": name, "stage": stage, "result": result}, default=str) + "\n"
+        with self._lock:
+            if self._file is None:
+                self._file = open(self._path("journal.jsonl"), "a", encoding="utf-8")
+            self._file.write(line)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._results.setdefault(name, {})[stage] = result
+
+    def mark_complete(self):
+        meta = self.meta
+        meta["status"] = "complete"
+        meta["completed_at"] = datetime.now().isoformat(timespec="seconds")
+        self._write_meta(meta)
+        self.close()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+def latest_incomplete_run(runs_dir=DEFAULT_RUNS_DIR):
+    """run_id of the most recently started run that never completed, or None."""
+    if not os.path.isdir(runs_dir):
+        return None
+    for run_id in sorted(os.listdir(runs_dir), reverse=True):
+        meta_path = os.path.join(runs_dir, run_id, "run.json")
+        if not os.path.exists(meta_path):
+            continue
+        with open(meta_path, "r", encoding="utf-8") as f:
+            if json.load(f).get("status") != "complete":
+                return run_id
+    return None
@@ -1,16 +1,63 @@
-from openai import OpenAI
+from openai import OpenAI, APIConnectionError
 import os
 from dotenv import load_dotenv
+from core.llm_cache import cache_key, cache_enabled, get_cache
+from core.metrics import get_metrics
+from core.rate_limiter import call_with_retry
 
 # Load environment variables
 load_dotenv('config/settings.env')
 
-client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Retries are done by call_with_retry, which also adapts concurrency to throttling
+client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "120")), max_retries=0)
 
-def call_llm(prompt, model="gpt-4", temperature=0):
-    response = client.chat.completions.create(
-        model=model,
-        messages=[{"role": "user", "content": prompt}],
-        temperature=temperature
+# Completion tokens reserved per request against LLM_TOKENS_PER_MINUTE until usage is known
+EXPECTED_COMPLETION_TOKENS = 500
+
+def _total_tokens(response):
+    usage = getattr(response, "usage", None)
+    return getattr(usage, "total_tokens", 0) or 0
+
+def call_llm(prompt, model="gpt-4", temperature=0, use_cache=True):
+    """
+    Send a single-message chat completion and return the response text.
+    Responses are served from the on-disk cache when the same model, temperature
+    and prompt were seen before; pass use_cache=False to force a fresh call.
+    Requests go through the process-wide rate limiter: throttled and transient failures
+    are retried with backoff (honoring Retry-After) and concurrency adapts to throttling.
+    Token usage, estimated cost and cache hits are recorded in the run metrics.
+    """
+    metrics = get_metrics()
+    cache = get_cache() if use_cache and cache_enabled() else None
+    if cache:
+        key = cache_key(model, temperature, prompt)
+        cached = cache.get(key)
+        if cached is not None:
+            metrics.record_llm_call(model, cached=True)
+            return cached
+
+    try:
+        response = call_with_retry(
+            lambda: client.chat.completions.create(
+                model=model,
+                messages=[{"role": "user", "content": prompt}],
+                temperature=temperature
+            ),
+            estimated_tokens=len(prompt) // 4 + EXPECTED_COMPLETION_TOKENS,
+            retryable_exceptions=(APIConnectionError,),
+            usage=_total_tokens
+        )
+    except Exception:
+        metrics.record_error()
+        raise
+    usage = getattr(response, "usage", None)
+    metrics.record_llm_call(
+        model,
+        prompt_tokens=getattr(usage, "prompt_tokens", 0) or 0,
+        completion_tokens=getattr(usage, "completion_tokens", 0) or 0
     )
-    return response.choices[0].message.content
+    content = response.choices[0].message.content
+
+    if cache and content is not None:
+        cache.put(key, content)
+    return content
@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from dotenv import load_dotenv
+from core.settings import env_flag
+
+# Load environment variables
+load_dotenv('config/settings.env')
+
+DEFAULT_CACHE_PATH = "outputs/llm_cache.sqlite"
+DEFAULT_MAX_ENTRIES = 100000
+DEFAULT_MAX_AGE_DAYS = 30
+# Eviction runs after this many writes rather than on every write
+EVICT_EVERY = 500
+
+def cache_key(model, temperature, prompt):
+    """Content hash of everything that determines the model's response."""
+    payload = json.dumps({"model": model, "temperature": temperature, "prompt": prompt}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class LLMCache:
+    """
+    On-disk SQLite cache of LLM responses keyed by cache_key().
+    Entries older than max_age_days are dropped, and the least recently used
+    entries are dropped once the cache holds more than max_entries.
+    Safe to share between threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_MAX_ENTRIES, max_age_days=DEFAULT_MAX_AGE_DAYS):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_age_seconds = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                response TEXT NOT NULL,
+                created_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_accessed ON responses(accessed_at)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached response for key, or None on a miss or expired entry."""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.max_age_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key, response):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, response, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, response, now, now)
+            )
+            self._conn.commit()
+            self._writes += 1
+            if self._writes % EVICT_EVERY == 0:
+                self._evict(now)
+
+    def evict(self):
+        """Drop expired entries and trim the cache down to max_entries."""
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now):
+        self._conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age_seconds,))
+        count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        if count > self.max_entries:
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at LIMIT ?)",
+                (count - self.max_entries,)
+            )
+        self._conn.commit()
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        return {"hits": self.hits, "misses": self.misses, "entries": entries}
+
+def cache_enabled():
+    """The cache can be bypassed for a whole run with LLM_CACHE_DISABLED=true."""
+    return not env_flag("LLM_CACHE_DISABLED")
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_cache():
+    """Process-wide cache configured from LLM_CACHE_PATH, LLM_CACHE_MAX_ENTRIES and LLM_CACHE_MAX_AGE_DAYS."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = LLMCache(
+                path=os.getenv("LLM_CACHE_PATH", DEFAULT_CACHE_PATH),
+                max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", DEFAULT_MAX_ENTRIES)),
+                max_age_days=float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", DEFAULT_MAX_AGE_DAYS))
+            )
+        return _cache
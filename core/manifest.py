@@ -0,0 +1,112 @@
+import hashlib
+import json
+import os
+from collections import Counter
+from core.runtime_stats import refresh_runtime
+
+DEFAULT_MANIFEST_PATH = "outputs/manifest.json"
+
+def definition_hash(definition):
+    return hashlib.sha256((definition or "").encode("utf-8")).hexdigest()
+
+def load_manifest(path=DEFAULT_MANIFEST_PATH):
+    """Load the previous run's manifest, or an empty one if there is none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f).get("procedures", {})
+
+def save_manifest(manifest, path=DEFAULT_MANIFEST_PATH):
+    """Write the manifest atomically so an interrupted run never leaves it half-written."""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"procedures": manifest}, f, indent=2, default=str)
+    os.replace(tmp_path, path)
+
+def is_unchanged(proc, entry):
+    """A procedure is unchanged when it is the same object with an identical definition."""
+    return (
+        entry is not None
+        and entry.get("object_id") == proc.get("object_id")
+        and entry.get("definition_hash") == definition_hash(proc["definition"])
+    )
+
+def partition(procs, manifest):
+    """
+    Split procedures into those that need analysis and those whose previous results can be reused.
+    Returns (changed_procs, carried) where carried maps procedure name to its manifest entry.
+    """
+    changed = []
+    carried = {}
+    for proc in procs:
+        entry = manifest.get(proc["name"])
+        if is_unchanged(proc, entry):
+            carried[proc["name"]] = entry
+        else:
+            changed.append(proc)
+    return changed, carried
+
+def carry_forward(proc, entry):
+    """Previous (row, technical_analysis) for an unchanged procedure, with runtime fields refreshed."""
+    return refresh_runtime(entry["row"], proc), entry.get("technical_analysis")
+
+def merge_results(procs, carried, combined, technical_analyses):
+    """
+    Combine freshly analyzed results with carried-forward ones in crawl order.
+    Returns (combined_rows, technical_analyses).
+    """
+    fresh_rows = {row["sp_name"]: row for row in combined}
+    fresh_analyses = {ta["name"]: ta for ta in technical_analyses}
+    merged_rows = []
+    merged_analyses = []
+    for proc in procs:
+        if proc["name"] in carried:
+            row, technical_analysis = carry_forward(proc, carried[proc["name"]])
+        else:
+            row, technical_analysis = fresh_rows[proc["name"]], fresh_analyses.get(proc["name"])
+        merged_rows.append(row)
+        if technical_analysis:
+            merged_analyses.append(technical_analysis)
+    return renumber_clusters(merged_rows), merged_analyses
+
+def renumber_clusters(rows):
+    """
+    Rows with cluster_id and cluster_size recomputed over the whole set, so carried-forward
+    clusters and newly assigned ones never share an id. Clusters are keyed by
+    cluster_representative and numbered in order of first appearance.
+    """
+    representatives = [row["cluster_representative"] for row in rows if row.get("cluster_representative")]
+    cluster_ids = {}
+    for representative in representatives:
+        cluster_ids.setdefault(representative, len(cluster_ids) + 1)
+    cluster_sizes = Counter(representatives)
+    renumbered = []
+    for row in rows:
+        representative = row.get("cluster_representative")
+        if representative:
+            row = dict(row, cluster_id=cluster_ids[representative], cluster_size=cluster_sizes[representative])
+        renumbered.append(row)
+    return renumbered
+
+def build_manifest(procs, combined, technical_analyses):
+    """
+    Manifest entries for a completed run, one per procedure. Procedures whose analysis
+    failed are left out, so the next incremental run analyzes them again.
+    """
+    rows = {row["sp_name"]: row for row in combined if not row.get("analysis_error")}
+    analyses = {ta["name"]: ta for ta in technical_analyses}
+    manifest = {}
+    for proc in procs:
+        if proc["name"] not in rows:
+            continue
+        manifest[proc["name"]] = {
+            "object_id": proc.get("object_id"),
+            "modify_date": proc.get("modify_date"),
+            "definition_hash": definition_hash(proc["definition"]),
+            "row": rows[proc["name"]],
+            "technical_analysis": analyses.get(proc["name"])
+        }
+    return manifest
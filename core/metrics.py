@@ -0,0 +1,190 @@
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv('config/settings.env')
+
+DEFAULT_METRICS_DIR = "outputs"
+
+# USD per 1K (prompt, completion) tokens; LLM_PROMPT_PRICE_PER_1K / LLM_COMPLETION_PRICE_PER_1K override
+MODEL_PRICES = {
+    "gpt-4": (0.03, 0.06),
+    "gpt-4-turbo": (0.01, 0.03),
+    "gpt-4o": (0.0025, 0.01),
+    "gpt-4o-mini": (0.00015, 0.0006),
+}
+
+# (procedure, stage) the current thread is working on; executor.run_concurrent carries it into worker threads
+_current = contextvars.ContextVar("metrics_context", default=(None, None))
+
+def procedure_label(proc):
+    """Name a procedure's work is recorded under: database.name in multi-database runs."""
+    return f"{proc['database']}.{proc['name']}" if proc.get("database") else proc["name"]
+
+def price_per_1k(model):
+    prompt_price, completion_price = MODEL_PRICES.get(model, MODEL_PRICES["gpt-4"])
+    return (
+        float(os.getenv("LLM_PROMPT_PRICE_PER_1K", prompt_price)),
+        float(os.getenv("LLM_COMPLETION_PRICE_PER_1K", completion_price))
+    )
+
+def _counters():
+    return {"seconds": 0.0, "count": 0, "llm_calls": 0, "prompt_tokens": 0, "completion_tokens": 0,
+            "cost_usd": 0.0, "cache_hits": 0, "retries": 0, "errors": 0}
+
+class RunMetrics:
+    """
+    Thread-safe timing, token, cost, cache-hit and retry counters for a run, broken down
+    by stage and by procedure. LLM calls are attributed to the innermost stage() active
+    on the calling thread (or the thread that fanned the work out).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+        self.stages = {}
+        self.procedures = {}
+        self.totals = _counters()
+
+    def _buckets(self):
+        """(counters, share of the usage) for each bucket the current context's work counts towards."""
+        procedure, stage = _current.get()
+        stage = stage or "unattributed"
+        buckets = [(self.totals, 1.0), (self.stages.setdefault(stage, _counters()), 1.0)]
+        # A stage shared by several procedures carries {procedure: share} instead of a name
+        for name, share in (procedure.items() if isinstance(procedure, dict) else [(procedure, 1.0)] if procedure else []):
+            buckets.append((self.procedures.setdefault(name, {}).setdefault(stage, _counters()), share))
+        return buckets
+
+    @contextmanager
+    def stage(self, name, procedure=None, shares=None):
+        """
+        Time a stage (optionally of one procedure) and attribute LLM calls made inside it.
+        shares ({procedure: positive weight}) is for a stage whose requests serve several procedures,
+        such as a batched summary: its tokens and cost are split across them by weight,
+        while calls, cache hits, retries, errors and time count in full for each.
+        """
+        parent_procedure, _ = _current.get()
+        if shares:
+            total = sum(shares.values())
+            procedure = {key: weight / total for key, weight in shares.items()}
+        token = _current.set((procedure or parent_procedure, name))
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                for bucket, _ in self._buckets():
+                    if bucket is not self.totals:
+                        bucket["seconds"] += elapsed
+                        bucket["count"] += 1
+            _current.reset(token)
+
+    def record_llm_call(self, model, prompt_tokens=0, completion_tokens=0, cached=False):
+        prompt_price, completion_price = price_per_1k(model)
+        cost = 0.0 if cached else (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1000
+        with self._lock:
+            for bucket, share in self._buckets():
+                if cached:
+                    bucket["cache_hits"] += 1
+                else:
+                    bucket["llm_calls"] += 1
+                    bucket["prompt_tokens"] += round(prompt_tokens * share)
+                    bucket["completion_tokens"] += round(completion_tokens * share)
+                    bucket["cost_usd"] += cost * share
+
+    def record_retry(self, llm=True):
+        """Count a retried request; llm=False (e.g. Jira) counts it for the current stage only, not the LLM totals."""
+        with self._lock:
+            for bucket, _ in self._buckets():
+                if llm or bucket is not self.totals:
+                    bucket["retries"] += 1
+
+    def record_error(self):
+        with self._lock:
+            for bucket, _ in self._buckets():
+                bucket["errors"] += 1
+
+    def summary(self, top=20):
+        """Run summary: totals, per-stage counters, per-procedure counters and the top spenders."""
+        with self._lock:
+            procedures = {
+                name: {"stages": {stage: dict(counters) for stage, counters in stages.items()},
+                       **{key: sum(counters[key] for counters in stages.values()) for key in _counters()}}
+                for name, stages in self.procedures.items()
+            }
+            result = {
+                "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+                "wall_seconds": round(time.time() - self.started_at, 3),
+                "totals": {key: value for key, value in self.totals.items() if key not in ("seconds", "count")},
+                "stages": {name: dict(counters) for name, counters in self.stages.items()},
+                "procedures": procedures
+            }
+        result["top_procedures_by_cost"] = [
+            {"name": name, "cost_usd": round(counters["cost_usd"], 6), "prompt_tokens": counters["prompt_tokens"],
+             "completion_tokens": counters["completion_tokens"], "seconds": round(counters["seconds"], 3)}
+            for name, counters in sorted(procedures.items(), key=lambda item: item[1]["cost_usd"], reverse=True)[:top]
+        ]
+        return result
+
+    def prometheus_text(self):
+        """The run summary in Prometheus text exposition format (for the node_exporter textfile collector)."""
+        summary = self.summary()
+        lines = []
+
+        def metric(name, help_text, kind, samples):
+            lines.append(f"# HELP sp_analyzer_{name} {help_text}")
+            lines.append(f"# TYPE sp_analyzer_{name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(f'{key}="{str(val).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for key, val in labels.items())
+                lines.append(f"sp_analyzer_{name}{{{label_text}}} {value}" if label_text else f"sp_analyzer_{name} {value}")
+
+        stages = summary["stages"].items()
+        metric("run_wall_seconds", "Wall-clock duration of the run", "gauge", [({}, summary["wall_seconds"])])
+        metric("stage_seconds", "Time spent per stage, summed over procedures", "gauge", [({"stage": s}, round(c["seconds"], 3)) for s, c in stages])
+        metric("llm_calls", "LLM requests sent", "gauge", [({"stage": s}, c["llm_calls"]) for s, c in stages])
+        metric("llm_cache_hits", "LLM responses served from the cache", "gauge", [({"stage": s}, c["cache_hits"]) for s, c in stages])
+        metric("llm_retries", "LLM requests retried", "gauge", [({"stage": s}, c["retries"]) for s, c in stages])
+        metric("llm_errors", "LLM requests that failed", "gauge", [({"stage": s}, c["errors"]) for s, c in stages])
+        metric("llm_tokens", "LLM tokens used", "gauge",
+               [({"stage": s, "type": "prompt"}, c["prompt_tokens"]) for s, c in stages]
+               + [({"stage": s, "type": "completion"}, c["completion_tokens"]) for s, c in stages])
+        metric("llm_cost_usd", "Estimated LLM cost in USD", "gauge", [({"stage": s}, round(c["cost_usd"], 6)) for s, c in stages])
+        metric("procedures_analyzed", "Procedures with recorded work", "gauge", [({}, len(summary["procedures"]))])
+        return "\n".join(lines) + "\n"
+
+    def export(self, directory=DEFAULT_METRICS_DIR, name="run_metrics"):
+        """Write <name>.json and <name>.prom to directory atomically; returns both paths."""
+        os.makedirs(directory, exist_ok=True)
+        paths = []
+        for extension, content in (("json", json.dumps(self.summary(), indent=2)), ("prom", self.prometheus_text())):
+            path = os.path.join(directory, f"{name}.{extension}")
+            with open(path + ".tmp", "w", encoding="utf-8") as f:
+                f.write(content)
+            os.replace(path + ".tmp", path)
+            paths.append(path)
+        return paths
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+def get_metrics():
+    """Process-wide metrics for the current run."""
+    global _metrics
+    with _metrics_lock:
+        if _metrics is None:
+            _metrics = RunMetrics()
+        return _metrics
+
+def reset_metrics():
+    """Start a fresh set of metrics (at the beginning of each run)."""
+    global _metrics
+    with _metrics_lock:
+        _metrics = RunMetrics()
+        return _metrics
@@ -0,0 +1,219 @@
+import os
+import re
+from agents.schema_crawler import extract_schema
+from agents.csv_generator import CsvStreamWriter, write_csv, write_dataset
+from agents.documentation_writer import write_summary
+from core.executor import run_concurrent, get_max_concurrency
+from core.journal import RunJournal, new_run_id
+from core.manifest import definition_hash
+from core.metrics import get_metrics
+from core.pipeline import analyze_procedures, analyze_procedures_incremental
+from core.runtime_stats import refresh_runtime
+
+DEFAULT_OUTPUT_DIR = "outputs"
+
+def max_concurrent_databases():
+    """Databases crawled and analyzed at the same time (DB_MAX_CONCURRENT_DATABASES)."""
+    return int(os.getenv("DB_MAX_CONCURRENT_DATABASES", "4"))
+
+def _safe_name(target):
+    return re.sub(r"[^\w.-]", "_", target["name"])
+
+def target_directory(target, output_dir=DEFAULT_OUTPUT_DIR):
+    return os.path.join(output_dir, "databases", _safe_name(target))
+
+def _error_text(e):
+    return f"{type(e).__name__}: {e}"
+
+def crawl_targets(targets, max_workers=None, failures=None):
+    """
+    Extract every target's procedures concurrently; each procedure is tagged with its database.
+    A database that cannot be crawled gets None, with its error in failures (by target name).
+    """
+    failures = {} if failures is None else failures
+
+    def crawl(target):
+        try:
+            with get_metrics().stage("crawl"):
+                procs = extract_schema(connection_string=target["connection_string"])
+        except Exception as e:
+            failures[target["name"]] = _error_text(e)
+            return None
+        for proc in procs:
+            proc["database"] = target["name"]
+        return procs
+
+    def report(index, procs, elapsed):
+        if procs is None:
+            print(f"   ❌ {targets[index]['name']}: {failures[targets[index]['name']]}")
+        else:
+            print(f"   ✅ {targets[index]['name']}: {len(procs)} stored procedures ({elapsed:.1f}s)")
+
+    return run_concurrent(crawl, targets, max_workers=max_workers or max_concurrent_databases(), on_complete=report)
+
+def assign_owners(procs_by_target):
+    """
+    Give each distinct definition to the first database (in inventory order) that has it.
+    Returns (owned_by_target, hashes_by_target): the procedures each database analyzes
+    itself, and the definition hash of every procedure.
+    """
+    owners = set()
+    owned_by_target = []
+    hashes_by_target = []
+    for procs in procs_by_target:
+        hashes = [definition_hash(proc["definition"]) for proc in procs]
+        owned = []
+        for proc, digest in zip(procs, hashes):
+            if digest not in owners:
+                owners.add(digest)
+                owned.append(proc)
+        owned_by_target.append(owned)
+        hashes_by_target.append(hashes)
+    return owned_by_target, hashes_by_target
+
+def analyze_targets(targets, output_dir=DEFAULT_OUTPUT_DIR, incremental=False, batch_summaries=None, max_databases=None, dataset=None, resume_run_id=None):
+    """
+    Crawl and analyze several databases concurrently with the direct pipeline.
+    At most max_databases (DB_MAX_CONCURRENT_DATABASES) run at once, and LLM_MAX_CONCURRENCY
+    is split between them so the number of LLM calls in flight stays under the global cap.
+    Byte-identical definitions are analyzed once, by the first database that has them,
+    and their results are reused everywhere else.
+    Each database is journaled under <output_dir>/inventory_runs/<run_id>/<name>/; with
+    resume_run_id, journaled databases are reloaded instead of crawled and their completed
+    stages are reused. A database that fails to crawl or analyze is reported and skipped,
+    and the others still get their reports.
+    Writes analysis.csv and summary.docx per database under <output_dir>/databases/<name>/
+    plus consolidated ones (with a database column) in output_dir.
+    With dataset ("parquet" or "arrow") the consolidated rows are also written to
+    <output_dir>/analysis_dataset/, partitioned by run date and database.
+    Returns (rows, technical_analyses, run_id, failures), failures mapping database names to errors.
+    """
+    max_databases = max(1, min(max_databases or max_concurrent_databases(), len(targets)))
+    llm_workers = max(1, get_max_concurrency() // max_databases)
+    run_id = resume_run_id or new_run_id()
+    runs_dir = os.path.join(output_dir, "inventory_runs", run_id)
+    if resume_run_id and not os.path.isdir(runs_dir):
+        raise FileNotFoundError(f"No inventory run '{resume_run_id}' found in {os.path.dirname(runs_dir)}")
+    failures = {}
+    journals = [None] * len(targets)
+    try:
+        # Databases journaled by an earlier attempt of this run are not crawled again
+        for index, target in enumerate(targets):
+            if os.path.exists(os.path.join(runs_dir, _safe_name(target), "run.json")):
+                journals[index] = RunJournal.open(_safe_name(target), runs_dir)
+        to_crawl = [target for target, journal in zip(targets, journals) if journal is None]
+        if to_crawl:
+            print(f"📊 Extracting stored procedures from {len(to_crawl)} databases...")
+        crawled = iter(crawl_targets(to_crawl, max_databases, failures))
+        procs_by_target = []
+        for index, target in enumerate(targets):
+            if journals[index] is not None:
+                procs_by_target.append(journals[index].load_procedures())
+                continue
+            procs = next(crawled)
+            if procs is not None:
+                journals[index] = RunJournal.create(procs, options={"database": target["name"], "incremental": incremental},
+                                                    runs_dir=runs_dir, run_id=_safe_name(target))
+            procs_by_target.append(procs)
+        print(f"📓 Inventory run ID: {run_id}")
+
+        active = [index for index, procs in enumerate(procs_by_target) if procs is not None]
+        owned, hashes = assign_owners([procs_by_target[index] for index in active])
+        owned_by_target = dict(zip(active, owned))
+        hashes_by_target = dict(zip(active, hashes))
+        total = sum(len(procs_by_target[index]) for index in active)
+        unique = sum(len(procs) for procs in owned)
+        print(f"♻️  {total} procedures, {unique} distinct definitions to analyze ({total - unique} shared across databases)")
+
+        def analyze_target(index):
+            target, journal = targets[index], journals[index]
+            directory = target_directory(target, output_dir)
+            os.makedirs(directory, exist_ok=True)
+
+            def report_progress(position, row, elapsed):
+                if row.get("analysis_error"):
+                    print(f"   ❌ {target['name']}.{row['sp_name']} - Failed: {row['analysis_error']}")
+                else:
+                    print(f"   ✅ {target['name']}.{row['sp_name']} - Complexity: {row['complexity']}/10 ({elapsed:.1f}s)")
+                csv_writer.append(row)
+
+            # Rows stream to this database's analysis.csv.partial while it is analyzed
+            csv_writer = CsvStreamWriter(os.path.join(directory, "analysis.csv"))
+            try:
+                with csv_writer:
+                    if incremental:
+                        rows, technical_analyses, _ = analyze_procedures_incremental(
+                            owned_by_target[index], manifest_path=os.path.join(directory, "manifest.json"), max_workers=llm_workers,
+                            on_complete=report_progress, batch_summaries=batch_summaries, journal=journal
+                        )
+                    else:
+                        rows, technical_analyses = analyze_procedures(owned_by_target[index], max_workers=llm_workers, on_complete=report_progress,
+                                                                      batch_summaries=batch_summaries, journal=journal)
+            except Exception as e:
+                # Completed stages stay in the journal for a resume; the other databases carry on
+                failures[target["name"]] = _error_text(e)
+                print(f"   ❌ {target['name']}: analysis failed: {failures[target['name']]}")
+                return None
+            return csv_writer, rows, technical_analyses
+
+        print(f"\n⚡ Analyzing {len(active)} databases, {max_databases} at a time with {llm_workers} LLM calls each...")
+        analyzed = dict(zip(active, run_concurrent(analyze_target, active, max_workers=max_databases)))
+        completed = [index for index in active if analyzed[index] is not None]
+
+        # Every definition's result, from the database that owned it
+        rows_by_hash = {}
+        analyses_by_hash = {}
+        for index in completed:
+            _, rows, technical_analyses = analyzed[index]
+            owned_hashes = {proc["name"]: definition_hash(proc["definition"]) for proc in owned_by_target[index]}
+            for row in rows:
+                rows_by_hash[owned_hashes[row["sp_name"]]] = row
+            for technical_analysis in technical_analyses:
+                analyses_by_hash[owned_hashes[technical_analysis["name"]]] = technical_analysis
+
+        print("\n📄 Generating reports...")
+        all_rows = []
+        all_analyses = []
+        for index in completed:
+            target, csv_writer = targets[index], analyzed[index][0]
+            rows = []
+            technical_analyses = []
+            missing = 0
+            for proc, digest in zip(procs_by_target[index], hashes_by_target[index]):
+                if digest not in rows_by_hash:
+                    # Shared with a database whose analysis failed
+                    missing += 1
+                    continue
+                # Shared definitions keep this database's own runtime cost and priority
+                rows.append(refresh_runtime(dict(rows_by_hash[digest], sp_name=proc["name"], schema=proc.get("schema")), proc))
+                if digest in analyses_by_hash:
+                    technical_analyses.append(dict(analyses_by_hash[digest], name=proc["name"]))
+            directory = target_directory(target, output_dir)
+            csv_writer.finalize(rows)
+            write_summary(rows, technical_analyses, os.path.join(directory, "summary.docx"))
+            if missing:
+                print(f"   ⚠️  {target['name']}: {missing} procedures shared with a failed database are missing from its reports")
+            else:
+                journals[index].mark_complete()
+
+            # Consolidated reports qualify names with the database so they stay unique
+            all_rows.extend({"database": target["name"], **row} for row in rows)
+            all_analyses.extend(dict(ta, name=f"{target['name']}.{ta['name']}") for ta in technical_analyses)
+
+        write_csv(all_rows, os.path.join(output_dir, "analysis.csv"))
+        if dataset:
+            write_dataset(all_rows, run_id, directory=os.path.join(output_dir, "analysis_dataset"), fmt=dataset)
+        write_summary(
+            [dict(row, sp_name=f"{row['database']}.{row['sp_name']}") for row in all_rows],
+            all_analyses,
+            os.path.join(output_dir, "summary.docx")
+        )
+        return all_rows, all_analyses, run_id, failures
+    finally:
+        for journal in journals:
+            if journal is not None:
+                journal.close()
+        # Each database has its own engine and pool; none is needed once the run ends
+        from core.db_connector import dispose_engine
+        for target in targets:
+            dispose_engine(target["connection_string"])
@@ -0,0 +1,138 @@
+import os
+import re
+import zlib
+from core.normalizer import normalize_definition
+from core.settings import env_flag
+from core.tsql_lexer import tokenize, WORD, IDENTIFIER
+
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 128
+# 16 bands of 8 rows: pairs above ~0.7 estimated Jaccard similarity become candidates
+BANDS = 16
+_PRIME = (1 << 31) - 1
+_NAME_WORD_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|[0-9]+")
+
+def near_duplicates_enabled():
+    """Whether near-duplicate procedures share one analysis (LLM_NEAR_DUPLICATES)."""
+    return env_flag("LLM_NEAR_DUPLICATES")
+
+def similarity_threshold():
+    """Estimated Jaccard similarity above which procedures are clustered (LLM_NEAR_DUPLICATE_THRESHOLD)."""
+    return float(os.getenv("LLM_NEAR_DUPLICATE_THRESHOLD", "0.8"))
+
+def _name_words(name):
+    return {word.upper() for word in _NAME_WORD_RE.findall(name or "") if len(word) >= 3}
+
+def _masked_values(sql, name_words):
+    """
+    Upper-cased token values of sql, with identifiers built from name_words replaced
+    whole by "\x00". Only identifiers are masked: a bracketed name, the object part of a
+    qualified name (stg.Order) or a compound word (OrderId). A bare one-word token may be
+    a keyword (ORDER BY), and a schema or database qualifier (dbo.) is never masked.
+    """
+    tokens = list(tokenize(sql))
+    values = []
+    for index, token in enumerate(tokens):
+        value = token.value.upper()
+        if name_words and token.kind in (WORD, IDENTIFIER):
+            qualifier = index + 1 < len(tokens) and tokens[index + 1].value == "."
+            qualified = index > 0 and tokens[index - 1].value == "."
+            # WORD values are upper-cased; the source keeps the case that separates OrderId's words
+            text = sql[token.position:token.position + len(token.value)] if token.kind == WORD else token.value
+            parts = {part.upper() for part in _NAME_WORD_RE.findall(text)}
+            if not qualifier and parts & name_words and (token.kind == IDENTIFIER or qualified or len(parts) > 1):
+                value = "\x00"
+        values.append(value)
+    return values
+
+def shingles(definition, name=None, size=SHINGLE_SIZE):
+    """
+    Hashes of every run of size consecutive tokens of the normalized definition.
+    Identifiers made from words of the procedure's own name are masked, so generated
+    procedures such as usp_Load_Customer and usp_Load_Order (stg.Customer vs stg.Order)
+    fingerprint alike.
+    """
+    values = _masked_values(normalize_definition(definition or ""), _name_words(name))
+    if len(values) <= size:
+        return {zlib.crc32("\x1f".join(values).encode("utf-8"))}
+    return {
+        zlib.crc32("\x1f".join(values[i:i + size]).encode("utf-8"))
+        for i in range(len(values) - size + 1)
+    }
+
+def minhash_signatures(procs, num_permutations=NUM_PERMUTATIONS):
+    """(len(procs), num_permutations) MinHash signatures of the procedures' shingle sets."""
+    import numpy as np
+    rng = np.random.default_rng(20240601)
+    a = rng.integers(1, _PRIME, num_permutations, dtype=np.uint64)
+    b = rng.integers(0, _PRIME, num_permutations, dtype=np.uint64)
+    signatures = np.empty((len(procs), num_permutations), dtype=np.uint64)
+    for index, proc in enumerate(procs):
+        values = np.fromiter(shingles(proc["definition"], proc.get("object_name", proc["name"])), dtype=np.uint64) % _PRIME
+        signatures[index] = ((values[:, None] * a + b) % _PRIME).min(axis=0)
+    return signatures
+
+def cluster_procedures(procs, threshold=None, bands=BANDS):
+    """
+    Group near-duplicate procedures with MinHash and locality-sensitive hashing.
+    Only procedures that share a band bucket are compared, so the work grows with the
+    number of similar pairs rather than quadratically. Returns, for each procedure,
+    the position of its cluster representative: the first member in procs order.
+    """
+    if not procs:
+        return []
+    threshold = similarity_threshold() if threshold is None else threshold
+    signatures = minhash_signatures(procs)
+    rows = signatures.shape[1] // bands
+    parent = list(range(len(procs)))
+
+    def find(index):
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for band in range(bands):
+        buckets = {}
+        for index, key in enumerate(signatures[:, band * rows:(band + 1) * rows]):
+            buckets.setdefault(key.tobytes(), []).append(index)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                if find(first) != find(other) and (signatures[first] == signatures[other]).mean() >= threshold:
+                    low, high = sorted((find(first), find(other)))
+                    parent[high] = low
+    return [find(index) for index in range(len(procs))]
+
+def name_substitutions(source, target):
+    """
+    Text replacements turning a description of procedure source into one of target:
+    the full names, then the part of the name that differs (usp_Load_Customer ->
+    usp_Load_Order gives Customer -> Order).
+    """
+    substitutions = [(source, target)]
+    source_words = list(_NAME_WORD_RE.finditer(source))
+    target_words = list(_NAME_WORD_RE.finditer(target))
+    prefix = 0
+    while prefix < min(len(source_words), len(target_words)) and source_words[prefix].group() == target_words[prefix].group():
+        prefix += 1
+    suffix = 0
+    while (suffix < min(len(source_words), len(target_words)) - prefix
+           and source_words[-1 - suffix].group() == target_words[-1 - suffix].group()):
+        suffix += 1
+    if prefix < len(source_words) - suffix and prefix < len(target_words) - suffix:
+        source_part = source[source_words[prefix].start():source_words[-1 - suffix].end()]
+        target_part = target[target_words[prefix].start():target_words[-1 - suffix].end()]
+        if len(source_part) >= 3:
+            substitutions.append((source_part, target_part))
+            if source_part.lower() != source_part:
+                substitutions.append((source_part.lower(), target_part.lower()))
+    return substitutions
+
+def adapt_text(text, source, target):
+    """A representative's summary or analysis rewritten for another member of its cluster."""
+    if not text or source == target:
+        return text
+    for old, new in name_substitutions(source, target):
+        text = re.sub(r"(?<![A-Za-z0-9])" + re.escape(old) + r"(?=(?:e?s)?(?![A-Za-z0-9]))", lambda _: new, text)
+    return text
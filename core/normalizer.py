@@ -0,0 +1,119 @@
+import re
+from functools import lru_cache
+from core.settings import env_flag
+from core.tsql_lexer import segments, CODE, COMMENT
+
+# Session settings, collapsed into one marker line so the model still knows which are set
+_BOILERPLATE_RE = re.compile(
+    r"\bSET\s+(NOCOUNT|XACT_ABORT|ANSI_NULLS|ANSI_PADDING|ANSI_WARNINGS|ARITHABORT|"
+    r"CONCAT_NULL_YIELDS_NULL|QUOTED_IDENTIFIER)\s+ON\b[ \t]*;?",
+    re.IGNORECASE
+)
+SESSION_SETTINGS_MARKER = "-- session settings: {} ON\n"
+_LINE_BREAK_RE = re.compile(r"[ \t]*(?:\r?\n[ \t]*)+")
+_SPACES_RE = re.compile(r"[ \t]+")
+_CATCH_RE = re.compile(r"\b(?:(BEGIN)|END)\s+CATCH\b", re.IGNORECASE)
+
+# Error handlers at least this long are replaced by a reference when repeated verbatim
+MIN_REPEATED_HANDLER_CHARS = 40
+REPEATED_HANDLER = "BEGIN CATCH\n-- same error handling as above\nEND CATCH"
+
+def normalization_enabled():
+    """Whether definitions are normalized before being sent to the model (LLM_NORMALIZE_PROMPTS)."""
+    return env_flag("LLM_NORMALIZE_PROMPTS", True)
+
+def _normalize_code(code):
+    code = _LINE_BREAK_RE.sub("\n", code)
+    return _SPACES_RE.sub(" ", code)
+
+def _tidy(text):
+    """Collapse blank lines and doubled spaces left behind by removals, in code only."""
+    return "".join(
+        _normalize_code(text[start:end]) if kind == CODE else text[start:end]
+        for kind, start, end in segments(text)
+    ).strip()
+
+def _strip_comments_and_whitespace(sql):
+    parts = []
+    for kind, start, end in segments(sql):
+        if kind == CODE:
+            parts.append(_normalize_code(sql[start:end]))
+        elif kind == COMMENT:
+            # Keep a comment's line break (or word break) so the surrounding code stays apart
+            parts.append("\n" if "\n" in sql[start:end] else " ")
+        else:
+            parts.append(sql[start:end])
+    return _tidy("".join(parts))
+
+def _collapse_session_settings(sql):
+    """Replace the SET ... ON session settings with one marker line where the first one was."""
+    matches = [
+        match
+        for kind, start, end in segments(sql) if kind == CODE
+        for match in _BOILERPLATE_RE.finditer(sql, start, end)
+    ]
+    if not matches:
+        return sql
+    settings = list(dict.fromkeys(match.group(1).upper() for match in matches))
+    parts = [sql[:matches[0].start()], SESSION_SETTINGS_MARKER.format(" ON, ".join(settings))]
+    for previous, match in zip(matches, matches[1:]):
+        parts.append(sql[previous.end():match.start()])
+    parts.append(sql[matches[-1].end():])
+    return _tidy("".join(parts))
+
+def _catch_blocks(sql):
+    """(start, end) of each outermost BEGIN CATCH ... END CATCH block."""
+    blocks = []
+    depth = 0
+    block_start = None
+    for kind, start, end in segments(sql):
+        if kind != CODE:
+            continue
+        for match in _CATCH_RE.finditer(sql, start, end):
+            if match.group(1):
+                if depth == 0:
+                    block_start = match.start()
+                depth += 1
+            elif depth > 0:
+                depth -= 1
+                if depth == 0:
+                    blocks.append((block_start, match.end()))
+    return blocks
+
+def _collapse_repeated_handlers(sql):
+    seen = set()
+    parts = []
+    position = 0
+    for start, end in _catch_blocks(sql):
+        block = sql[start:end]
+        key = block.upper()
+        if len(block) >= MIN_REPEATED_HANDLER_CHARS and key in seen:
+            parts.append(sql[position:start])
+            parts.append(REPEATED_HANDLER)
+            position = end
+        seen.add(key)
+    parts.append(sql[position:])
+    return "".join(parts)
+
+@lru_cache(maxsize=256)
+def normalize_definition(sql, collapse_handlers=True):
+    """
+    A definition reduced to what the model needs: comments (including commented-out code)
+    are removed, session settings such as SET NOCOUNT ON are collapsed into one
+    "-- session settings: ..." line, indentation and runs of blanks are collapsed, and
+    (with collapse_handlers) error handlers repeated verbatim are replaced by a reference
+    to the first one. String literals and delimited identifiers are untouched.
+    """
+    if not sql:
+        return sql
+    sql = _collapse_session_settings(_strip_comments_and_whitespace(sql))
+    return _collapse_repeated_handlers(sql) if collapse_handlers else sql
+
+def prompt_definition(proc, technical=False):
+    """
+    The definition text to put in prompts for proc (normalized unless LLM_NORMALIZE_PROMPTS
+    is off). technical prompts review error handling, so repeated handlers are kept verbatim.
+    """
+    if normalization_enabled():
+        return normalize_definition(proc["definition"], collapse_handlers=not technical)
+    return proc["definition"]
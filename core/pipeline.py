@@ -0,0 +1,332 @@
+from collections import Counter
+from agents.reverse_engineer import reverse_engineer, reverse_engineer_batch, is_batchable, plan_batches
+from agents.complexity_analyzer import analyze, analyze_many
+from agents.technical_analyzer import analyze_for_refactoring
+from core.executor import run_concurrent, run_after_dependencies
+from core.manifest import DEFAULT_MANIFEST_PATH, load_manifest, save_manifest, partition, merge_results, build_manifest
+from core.runtime_stats import runtime_columns
+from core.chunking import estimate_tokens
+from core.normalizer import prompt_definition
+from core.near_duplicates import near_duplicates_enabled, cluster_procedures, adapt_text
+from core.journal import SUMMARY, COMPLEXITY, TECHNICAL_ANALYSIS
+from core.metrics import get_metrics, procedure_label
+from core.settings import env_flag
+
+# Procedures scoring above this get a detailed technical analysis
+REFACTORING_THRESHOLD = 3
+
+def analyze_procedure(proc, on_stage=None, complexity=None, summary=None, journal=None, callee_summaries=None, technical_analysis=None):
+    """
+    Run the Reverse Engineer, Complexity Analyzer and (for complex procedures)
+    Technical Analyzer agents on a single procedure.
+    on_stage(name, agent, status) is called as each agent starts and finishes.
+    Pass a precomputed complexity result (from analyze_many) to skip scoring, and a
+    precomputed summary (from a batched request) to skip reverse engineering, and a
+    precomputed technical_analysis (adapted from a near-duplicate) to skip that agent.
+    With a RunJournal, stages already journaled are reused and new ones are recorded.
+    callee_summaries ([{"name", "summary"}]) give the summary prompt the procedures it calls.
+    Each agent that runs is timed in the run metrics under the procedure's name.
+    An LLM agent that fails (after its retries) doesn't stop the run: the row gets an
+    "Analysis failed" summary and analysis_error, and the failed stage is not journaled,
+    so a resumed run tries it again.
+    Returns (combined_row, technical_analysis); technical_analysis is None when skipped.
+    """
+    def report(agent, status):
+        if on_stage:
+            on_stage(proc["name"], agent, status)
+
+    def journaled(stage):
+        return journal is not None and journal.has(proc["name"], stage)
+
+    def record(stage, result):
+        if journal is not None:
+            journal.record(proc["name"], stage, result)
+
+    metrics = get_metrics()
+    label = procedure_label(proc)
+    error = None
+
+    if journaled(SUMMARY):
+        summary = journal.get(proc["name"], SUMMARY)
+        report("reverse_engineer", "completed")
+    elif summary is None:
+        report("reverse_engineer", "active")
+        try:
+            with metrics.stage("reverse_engineer", label):
+                summary = reverse_engineer(proc, callee_summaries)
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            summary = {"name": proc["name"], "summary": f"Analysis failed: {error}"}
+            report("reverse_engineer", "failed")
+        else:
+            record(SUMMARY, summary)
+            report("reverse_engineer", "completed")
+    else:
+        record(SUMMARY, summary)
+        report("reverse_engineer", "completed")
+
+    if journaled(COMPLEXITY):
+        complexity = journal.get(proc["name"], COMPLEXITY)
+    else:
+        if complexity is None:
+            report("complexity_analyzer", "active")
+            with metrics.stage("complexity_analyzer", label):
+                complexity = analyze(proc)
+        record(COMPLEXITY, complexity)
+    report("complexity_analyzer", "completed")
+
+    if complexity["complexity"] > REFACTORING_THRESHOLD and not error:
+        if journaled(TECHNICAL_ANALYSIS):
+            technical_analysis = journal.get(proc["name"], TECHNICAL_ANALYSIS)
+            report("technical_analyzer", "completed")
+        elif technical_analysis is not None:
+            record(TECHNICAL_ANALYSIS, technical_analysis)
+            report("technical_analyzer", "completed")
+        else:
+            report("technical_analyzer", "active")
+            try:
+                with metrics.stage("technical_analyzer", label):
+                    technical_analysis = analyze_for_refactoring(proc, complexity["complexity"])
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+                technical_analysis = None
+                report("technical_analyzer", "failed")
+            else:
+                record(TECHNICAL_ANALYSIS, technical_analysis)
+                report("technical_analyzer", "completed")
+    else:
+        technical_analysis = None
+        report("technical_analyzer", "skipped")
+
+    row = build_row(proc, summary["summary"], complexity)
+    if error:
+        row["analysis_error"] = error
+    return row, technical_analysis
+
+def build_row(proc, summary_text, complexity):
+    """
+    Combined CSV/report row for a procedure from its summary text and complexity result,
+    with its runtime cost and priority_score (complexity x hotness).
+    definition_tokens and prompt_tokens record the definition's estimated size before
+    and after prompt normalization.
+    """
+    return {
+        "sp_name": proc["name"],
+        "schema": proc.get("schema"),
+        "summary": summary_text,
+        "complexity": complexity["complexity"],
+        "lines_of_code": complexity["lines_of_code"],
+        "complexity_factors": complexity["complexity_factors"],
+        "nesting_depth": complexity["nesting_depth"],
+        "branch_count": complexity["branch_count"],
+        "last_execution_time": proc["last_execution_time"],
+        "definition_tokens": estimate_tokens(proc["definition"]),
+        "prompt_tokens": estimate_tokens(prompt_definition(proc)),
+        **runtime_columns(proc, complexity["complexity"])
+    }
+
+def batching_enabled():
+    return env_flag("LLM_BATCH_SUMMARIES")
+
+def summarize_in_batches(procs, max_workers=None, on_stage=None):
+    """
+    Summarize small procedures several to a request, with batches sent concurrently.
+    Returns {name: reverse_engineer-style result}.
+    """
+    def summarize(batch):
+        if on_stage:
+            for proc in batch:
+                on_stage(proc["name"], "reverse_engineer", "active")
+        # The shared request's usage is split in proportion to each procedure's prompt size
+        shares = {procedure_label(proc): max(1, estimate_tokens(prompt_definition(proc))) for proc in batch}
+        try:
+            with get_metrics().stage("batch_summary", shares=shares):
+                return reverse_engineer_batch(batch)
+        except Exception as e:
+            # Left unsummarized, these procedures are retried one by one in the per-procedure pass
+            print(f"   ⚠️  Batched summary failed ({type(e).__name__}: {str(e)[:100]}), summarizing {len(batch)} procedures individually")
+            return []
+
+    results = run_concurrent(summarize, plan_batches(procs), max_workers=max_workers)
+    return {summary["name"]: summary for batch in results for summary in batch}
+
+def adapt_result(result, source, target, complexity):
+    """
+    A cluster representative's (row, technical_analysis) rewritten for another member:
+    returns (summary, technical_analysis) with the member's name and complexity.
+    """
+    row, technical_analysis = result
+
+    def adapt(text):
+        text = adapt_text(text, source["name"], target["name"])
+        # Crawled names are schema-qualified, but descriptions usually use the bare name
+        if source.get("object_name") and target.get("object_name"):
+            text = adapt_text(text, source["object_name"], target["object_name"])
+        return text
+
+    summary = {"name": target["name"], "summary": adapt(row["summary"])}
+    if technical_analysis is not None:
+        technical_analysis = {
+            "name": target["name"],
+            "complexity": complexity["complexity"],
+            "technical_analysis": adapt(technical_analysis["technical_analysis"])
+        }
+    return summary, technical_analysis
+
+def analyze_procedures(procs, max_workers=None, on_stage=None, on_complete=None, batch_summaries=None, journal=None, call_graph=None, known_callee_summaries=None, near_duplicates=None, complexities=None):
+    """
+    Analyze procedures concurrently with at most max_workers in flight.
+    complexities optionally supplies analyze_many(procs) results computed earlier.
+    With batch_summaries (default LLM_BATCH_SUMMARIES) small procedures are summarized
+    several per request before the per-procedure fan-out.
+    With a RunJournal, every completed stage is recorded and stages from an interrupted
+    run are reused rather than repeated.
+    With a call_graph (callee positions per procedure, from core.call_graph), each
+    procedure starts once the procedures it calls are done and gets their summaries;
+    independent procedures still run in parallel. known_callee_summaries optionally adds,
+    per procedure, summaries of callees outside procs (e.g. carried forward).
+    With near_duplicates (default LLM_NEAR_DUPLICATES), procedures are clustered by
+    MinHash/LSH and only the first of each cluster goes to the LLM; the others reuse its
+    summary and technical analysis with the names adapted. Rows then carry cluster_id,
+    cluster_size and cluster_representative.
+    on_complete(index, combined_row, elapsed_seconds) is called from the calling thread.
+    Returns (combined_rows, technical_analyses) in the original procedure order,
+    ready for write_csv/write_summary.
+    """
+    def complete(index, result, elapsed):
+        if on_complete:
+            on_complete(index, result[0], elapsed)
+
+    # Scoring is local and cheap, so do the whole batch up front and fan out only the LLM work
+    metrics = get_metrics()
+    if complexities is None:
+        with metrics.stage("complexity_scoring"):
+            complexities = analyze_many(procs).to_dict("records")
+    if near_duplicates is None:
+        near_duplicates = near_duplicates_enabled()
+    representatives = list(range(len(procs)))
+    if near_duplicates:
+        with metrics.stage("near_duplicate_clustering"):
+            representatives = cluster_procedures(procs)
+    cluster_ids = {rep: number for number, rep in enumerate(sorted(set(representatives)), 1)}
+    cluster_sizes = Counter(representatives)
+
+    if batch_summaries is None:
+        batch_summaries = batching_enabled()
+    summaries = {}
+    if batch_summaries:
+        # Callers are summarized on their own so they can be given their callees' summaries,
+        # and near-duplicates reuse their representative's summary
+        pending = [
+            proc for index, proc in enumerate(procs)
+            if is_batchable(proc) and not (call_graph and call_graph[index]) and representatives[index] == index
+            and not (journal and journal.has(proc["name"], SUMMARY))
+        ]
+        summaries = summarize_in_batches(pending, max_workers, on_stage)
+
+    def analyze_item(item, dependency_results=()):
+        index, proc, complexity = item
+        rep = representatives[index]
+        # A representative that failed has nothing to adapt; the member is analyzed on its own
+        if rep != index and dependency_results and not dependency_results[0][0].get("analysis_error"):
+            summary, technical_analysis = adapt_result(dependency_results[0], procs[rep], proc, complexity)
+            row, technical_analysis = analyze_procedure(proc, on_stage, complexity=complexity, summary=summary,
+                                                        journal=journal, technical_analysis=technical_analysis)
+        else:
+            callee_summaries = [
+                {"name": row["sp_name"], "summary": row["summary"]}
+                for row, _ in dependency_results if not row.get("analysis_error")
+            ]
+            if known_callee_summaries:
+                callee_summaries += known_callee_summaries[index]
+            row, technical_analysis = analyze_procedure(proc, on_stage, complexity=complexity, summary=summaries.get(proc["name"]),
+                                                        journal=journal, callee_summaries=callee_summaries or None)
+        if near_duplicates:
+            row.update(cluster_id=cluster_ids[rep], cluster_size=cluster_sizes[rep], cluster_representative=procs[rep]["name"])
+        return row, technical_analysis
+
+    items = [(index, proc, complexity) for index, (proc, complexity) in enumerate(zip(procs, complexities))]
+    if call_graph or near_duplicates:
+        # Near-duplicates wait for their representative; representatives for their callees
+        dependencies = [
+            [rep] if rep != index else (call_graph[index] if call_graph else [])
+            for index, rep in enumerate(representatives)
+        ]
+        results = run_after_dependencies(analyze_item, items, dependencies, max_workers=max_workers, on_complete=complete)
+    else:
+        results = run_concurrent(analyze_item, items, max_workers=max_workers, on_complete=complete)
+    combined = [row for row, _ in results]
+    technical_analyses = [ta for _, ta in results if ta is not None]
+    return combined, technical_analyses
+
+def include_stale_callers(procs, changed, carried, call_graph):
+    """
+    Move every carried-forward procedure that calls a changed one, directly or through
+    other callers, into changed: its summary was built from its callees' summaries.
+    Returns (changed, carried) with changed in crawl order.
+    """
+    callers = [[] for _ in procs]
+    for caller, callees in enumerate(call_graph):
+        for callee in callees:
+            callers[callee].append(caller)
+    positions = {proc["name"]: index for index, proc in enumerate(procs)}
+    stale = set()
+    pending = [positions[proc["name"]] for proc in changed]
+    while pending:
+        for caller in callers[pending.pop()]:
+            name = procs[caller]["name"]
+            if name in carried and name not in stale:
+                stale.add(name)
+                pending.append(caller)
+    if not stale:
+        return changed, carried
+    changed_names = {proc["name"] for proc in changed} | stale
+    return (
+        [proc for proc in procs if proc["name"] in changed_names],
+        {name: entry for name, entry in carried.items() if name not in stale}
+    )
+
+def restrict_call_graph(procs, subset, carried, call_graph):
+    """
+    call_graph re-indexed to the procedures in subset, plus for each of them the
+    summaries of callees that are not in subset but were carried forward.
+    """
+    subset_positions = {proc["name"]: index for index, proc in enumerate(subset)}
+    positions = {proc["name"]: index for index, proc in enumerate(procs)}
+    restricted = []
+    known = []
+    for proc in subset:
+        callees = [procs[callee]["name"] for callee in call_graph[positions[proc["name"]]]]
+        restricted.append([subset_positions[name] for name in callees if name in subset_positions])
+        known.append([
+            {"name": name, "summary": carried[name]["row"]["summary"]}
+            for name in callees if name not in subset_positions and name in carried
+        ])
+    return restricted, known
+
+def analyze_procedures_incremental(procs, manifest_path=DEFAULT_MANIFEST_PATH, max_workers=None, on_stage=None, on_complete=None, batch_summaries=None, journal=None, call_graph=None):
+    """
+    Like analyze_procedures, but only new or modified procedures are analyzed.
+    Unchanged procedures reuse the results recorded in the manifest from the previous run,
+    and the manifest is rewritten to cover this run.
+    on_complete indexes and call_graph positions refer to procs; unchanged callees
+    contribute their carried-forward summaries, and unchanged callers of changed
+    procedures are analyzed again.
+    Returns (combined_rows, technical_analyses, analyzed_count).
+    """
+    changed, carried = partition(procs, load_manifest(manifest_path))
+    positions = {proc["name"]: index for index, proc in enumerate(procs)}
+    changed_call_graph, known_callee_summaries = None, None
+    if call_graph:
+        changed, carried = include_stale_callers(procs, changed, carried, call_graph)
+        changed_call_graph, known_callee_summaries = restrict_call_graph(procs, changed, carried, call_graph)
+
+    def complete(index, row, elapsed):
+        if on_complete:
+            on_complete(positions[row["sp_name"]], row, elapsed)
+
+    new_rows, new_analyses = analyze_procedures(changed, max_workers=max_workers, on_stage=on_stage, on_complete=complete, batch_summaries=batch_summaries,
+                                                journal=journal, call_graph=changed_call_graph, known_callee_summaries=known_callee_summaries)
+    combined, technical_analyses = merge_results(procs, carried, new_rows, new_analyses)
+    save_manifest(build_manifest(procs, combined, technical_analyses), manifest_path)
+    return combined, technical_analyses, len(changed)
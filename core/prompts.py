@@ -1,3 +1,11 @@
+SUMMARY_INSTRUCTIONS = """Provide a concise 3-sentence summary suitable for a moderately technical functional person. Focus on:
+1. What business function this procedure serves
+2. What data it works with or produces
+3. Any key business rules or logic it implements
+
+Keep it clear and business-focused, avoiding technical SQL details.
+"""
+
 REVERSE_ENGINEER_PROMPT = """
 You are a business analyst explaining database procedures to functional users. Analyze this stored procedure:
 
@@ -6,24 +14,23 @@ Stored Procedure: {name}
 SQL Code:
 {code}
 
-Provide a concise 3-sentence summary suitable for a moderately technical functional person. Focus on:
-1. What business function this procedure serves
-2. What data it works with or produces
-3. Any key business rules or logic it implements
+""" + SUMMARY_INSTRUCTIONS
 
-Keep it clear and business-focused, avoiding technical SQL details.
-"""
-
-TECHNICAL_ANALYSIS_PROMPT = """
-You are a senior database developer conducting a technical review of stored procedures for potential refactoring. Analyze this stored procedure:
+# Callers analyzed after their callees get the callee summaries instead of re-inferring them
+CALLER_REVERSE_ENGINEER_PROMPT = """
+You are a business analyst explaining database procedures to functional users. Analyze this stored procedure:
 
 Stored Procedure: {name}
-Complexity Score: {complexity}
+
+Procedures it calls (already analyzed; rely on these summaries rather than re-deriving what they do):
+{callees}
 
 SQL Code:
 {code}
 
-Provide a detailed technical analysis suitable for developers considering refactoring. Include:
+""" + SUMMARY_INSTRUCTIONS
+
+TECHNICAL_ANALYSIS_INSTRUCTIONS = """Provide a detailed technical analysis suitable for developers considering refactoring. Include:
 
 1. **Code Structure Analysis**: Evaluate the overall structure, organization, and readability
 2. **Performance Concerns**: Identify potential performance bottlenecks, inefficient queries, or resource-intensive operations
@@ -40,3 +47,98 @@ Provide a detailed technical analysis suitable for developers considering refact
 
 Focus on actionable insights that would help developers prioritize and plan refactoring efforts.
 """
+
+TECHNICAL_ANALYSIS_PROMPT = """
+You are a senior database developer conducting a technical review of stored procedures for potential refactoring. Analyze this stored procedure:
+
+Stored Procedure: {name}
+Complexity Score: {complexity}
+
+SQL Code:
+{code}
+
+""" + TECHNICAL_ANALYSIS_INSTRUCTIONS
+
+# Map-reduce prompts for definitions too large for a single request.
+# Chunk prompts deliberately omit the section number so each chunk's response is cached by content alone.
+CHUNK_REVERSE_ENGINEER_PROMPT = """
+You are a business analyst explaining database procedures to functional users. Below is one section of a larger stored procedure.
+
+Stored Procedure: {name}
+
+SQL Code (partial):
+{code}
+
+Write brief notes on this section only: the business purpose it appears to serve, the data it reads or changes, and any business rules it applies. Do not speculate about code outside this section.
+"""
+
+REDUCE_REVERSE_ENGINEER_PROMPT = """
+You are a business analyst explaining database procedures to functional users. The stored procedure below was too large to review at once, so it was analyzed in sections:
+
+Stored Procedure: {name}
+
+Section Notes:
+{notes}
+
+Using these notes, describe the procedure as a whole.
+""" + SUMMARY_INSTRUCTIONS
+
+CALLER_REDUCE_REVERSE_ENGINEER_PROMPT = """
+You are a business analyst explaining database procedures to functional users. The stored procedure below was too large to review at once, so it was analyzed in sections:
+
+Stored Procedure: {name}
+
+Procedures it calls (already analyzed; rely on these summaries rather than re-deriving what they do):
+{callees}
+
+Section Notes:
+{notes}
+
+Using these notes, describe the procedure as a whole.
+""" + SUMMARY_INSTRUCTIONS
+
+CHUNK_TECHNICAL_ANALYSIS_PROMPT = """
+You are a senior database developer conducting a technical review of stored procedures for potential refactoring. Below is one section of a larger stored procedure.
+
+Stored Procedure: {name}
+
+SQL Code (partial):
+{code}
+
+Write concise technical review notes on this section only: structure and readability, performance concerns, maintainability issues, best practices violations and refactoring opportunities. Do not speculate about code outside this section.
+"""
+
+REDUCE_TECHNICAL_ANALYSIS_PROMPT = """
+You are a senior database developer conducting a technical review of stored procedures for potential refactoring. The stored procedure below was too large to review at once, so it was reviewed in sections:
+
+Stored Procedure: {name}
+Complexity Score: {complexity}
+
+Section Review Notes:
+{notes}
+
+Using these notes, review the procedure as a whole.
+""" + TECHNICAL_ANALYSIS_INSTRUCTIONS
+
+BATCH_REVERSE_ENGINEER_PROMPT = """
+You are a business analyst explaining database procedures to functional users. Analyze each of these stored procedures:
+
+{procedures}
+
+For each procedure, provide a concise 3-sentence summary suitable for a moderately technical functional person. Focus on:
+1. What business function this procedure serves
+2. What data it works with or produces
+3. Any key business rules or logic it implements
+
+Keep it clear and business-focused, avoiding technical SQL details.
+
+Respond with only a JSON array containing one object per procedure, using the exact procedure names given above:
+[{{"name": "<procedure name>", "summary": "<3-sentence summary>"}}]
+"""
+
+BATCH_PROCEDURE_ENTRY = """---
+Stored Procedure: {name}
+
+SQL Code:
+{code}
+"""
@@ -0,0 +1,243 @@
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from dotenv import load_dotenv
+from core.executor import get_max_concurrency
+from core.metrics import get_metrics
+
+# Load environment variables
+load_dotenv('config/settings.env')
+
+DEFAULT_MAX_RETRIES = 6
+DEFAULT_BACKOFF_BASE_SECONDS = 1.0
+DEFAULT_BACKOFF_MAX_SECONDS = 60.0
+# Status codes worth retrying; the THROTTLE ones also mean "send less" and halve concurrency
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504, 529}
+THROTTLE_STATUS = {429, 503, 529}
+
+def _env_int(name, default):
+    try:
+        return int(os.getenv(name, default))
+    except ValueError:
+        return default
+
+def _env_float(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+class _Bucket:
+    """Token bucket refilled continuously at limit per minute, holding at most limit."""
+
+    def __init__(self, limit):
+        self.capacity = float(limit)
+        self.rate = limit / 60.0
+        self.level = float(limit)
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (0 if it can be taken now)."""
+        self._refill(now)
+        amount = min(amount, self.capacity)
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, amount):
+        # Settle an estimate against actual usage; the level may go negative (debt)
+        self.level = min(self.capacity, self.level + amount)
+
+class AdaptiveLimiter:
+    """
+    Process-wide admission control for LLM requests.
+    At most int(concurrency) requests are in flight. Concurrency grows by one per window
+    of successful requests (additive increase) and halves when the provider throttles
+    (multiplicative decrease), at most once per round of requests already in flight.
+    Optional requests-per-minute and tokens-per-minute buckets pace admission, and a
+    Retry-After from the provider pauses every caller, not only the one that got it.
+    """
+
+    def __init__(self, max_concurrency, requests_per_minute=0, tokens_per_minute=0, min_concurrency=1):
+        self.max_concurrency = max(1, max_concurrency)
+        self.min_concurrency = max(1, min(min_concurrency, self.max_concurrency))
+        self.concurrency = float(self.max_concurrency)
+        self.in_flight = 0
+        self._requests = _Bucket(requests_per_minute) if requests_per_minute else None
+        self._tokens = _Bucket(tokens_per_minute) if tokens_per_minute else None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+    def _wait_time(self, tokens, now):
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self.in_flight >= int(self.concurrency):
+            return None
+        waits = [0.0]
+        if self._requests:
+            waits.append(self._requests.wait_time(1, now))
+        if self._tokens and tokens:
+            waits.append(self._tokens.wait_time(tokens, now))
+        return max(waits)
+
+    def acquire(self, tokens=0):
+        """Block until a request estimated at tokens may start; returns its start time."""
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = self._wait_time(tokens, now)
+                if wait == 0:
+                    break
+                self._cond.wait(wait)
+            self.in_flight += 1
+            if self._requests:
+                self._requests.take(1)
+            if self._tokens and tokens:
+                self._tokens.take(tokens)
+            return now
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, tokens=0):
+        started = self.acquire(tokens)
+        try:
+            yield started
+        finally:
+            self.release()
+
+    def pace(self, requests=1):
+        """
+        Take requests more from the requests-per-minute bucket, waiting for them, for a slot
+        that sends several HTTP requests; the slot itself only accounts for the first.
+        """
+        if not self._requests:
+            return
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                wait = max(self._paused_until - now, self._requests.wait_time(requests, now))
+                if wait <= 0:
+                    break
+                self._cond.wait(wait)
+            self._requests.take(requests)
+
+    def on_success(self):
+        with self._cond:
+            self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+            self._cond.notify_all()
+
+    def on_throttle(self, started, retry_after=None):
+        """
+        The request admitted at started was throttled. Requests that were already in
+        flight at the last decrease don't halve concurrency again.
+        """
+        with self._cond:
+            now = time.monotonic()
+            if started >= self._last_decrease:
+                self.concurrency = max(self.min_concurrency, self.concurrency / 2)
+                self._last_decrease = now
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct the tokens-per-minute bucket once a request's real usage is known."""
+        if self._tokens and actual_tokens:
+            with self._cond:
+                self._tokens.adjust(estimated_tokens - actual_tokens)
+
+def status_code(error):
+    """HTTP status of an API error (openai/requests style), or None."""
+    status = getattr(error, "status_code", None)
+    if status is None:
+        status = getattr(getattr(error, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+def retry_after(error):
+    """Seconds the provider asked us to wait (Retry-After / retry-after-ms headers), or None."""
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms") is not None:
+            return max(0.0, float(headers["retry-after-ms"]) / 1000)
+        value = headers.get("retry-after")
+        if value is None:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+def backoff_delay(attempt, base=None, cap=None):
+    """Full-jitter exponential backoff: uniform(0, min(cap, base * 2**attempt))."""
+    base = _env_float("LLM_RETRY_BASE_SECONDS", DEFAULT_BACKOFF_BASE_SECONDS) if base is None else base
+    cap = _env_float("LLM_RETRY_MAX_SECONDS", DEFAULT_BACKOFF_MAX_SECONDS) if cap is None else cap
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def call_with_retry(request, estimated_tokens=0, limiter=None, max_retries=None, retryable_exceptions=(), usage=None, base=None, cap=None, llm=True):
+    """
+    Call request() inside a limiter slot, retrying throttled (429/503), transient 5xx and
+    retryable_exceptions (e.g. connection errors and timeouts) up to max_retries times
+    (LLM_MAX_RETRIES). Waits Retry-After when the provider sends one, else a jittered
+    exponential backoff from base up to cap seconds (LLM_RETRY_BASE_SECONDS, LLM_RETRY_MAX_SECONDS).
+    usage(response) optionally returns the request's real token count.
+    Other APIs pass their own limiter and retry settings, and llm=False so their retries
+    are counted for the current stage rather than as LLM retries.
+    """
+    limiter = limiter or get_limiter()
+    max_retries = _env_int("LLM_MAX_RETRIES", DEFAULT_MAX_RETRIES) if max_retries is None else max_retries
+    attempt = 0
+    while True:
+        with limiter.slot(estimated_tokens) as started:
+            try:
+                response = request()
+            except Exception as e:
+                status = status_code(e)
+                if attempt >= max_retries or not (status in RETRYABLE_STATUS or isinstance(e, retryable_exceptions)):
+                    raise
+                delay = retry_after(e)
+                if status in THROTTLE_STATUS:
+                    limiter.on_throttle(started, delay)
+                error = e
+            else:
+                limiter.on_success()
+                if usage:
+                    limiter.record_usage(estimated_tokens, usage(response))
+                return response
+        wait = delay + random.uniform(0, 0.1 * delay + 0.05) if delay is not None else backoff_delay(attempt, base, cap)
+        get_metrics().record_retry(llm)
+        print(f"   ⏳ {type(error).__name__}{f' ({status})' if status else ''}, retrying in {wait:.1f}s (attempt {attempt + 1}/{max_retries})")
+        time.sleep(wait)
+        attempt += 1
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+def get_limiter():
+    """
+    Process-wide limiter sized from LLM_MAX_CONCURRENCY, LLM_REQUESTS_PER_MINUTE and
+    LLM_TOKENS_PER_MINUTE (0 = no limit).
+    """
+    global _limiter
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdaptiveLimiter(
+                get_max_concurrency(),
+                requests_per_minute=_env_int("LLM_REQUESTS_PER_MINUTE", 0),
+                tokens_per_minute=_env_int("LLM_TOKENS_PER_MINUTE", 0)
+            )
+        return _limiter
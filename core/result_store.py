@@ -0,0 +1,130 @@
+import json
+import os
+import sqlite3
+from datetime import datetime
+from core.pipeline import REFACTORING_THRESHOLD
+
+DEFAULT_RESULTS_PATH = "outputs/results.sqlite"
+# Completed runs kept in the store; older ones are pruned when a run is saved
+DEFAULT_KEEP_RUNS = 5
+
+# Result orderings offered to the UI (fixed strings, never user input, in the ORDER BY)
+SORT_ORDERS = {
+    "priority": "priority_score DESC, complexity DESC, position",
+    "complexity": "complexity DESC, position",
+    "name": "name COLLATE NOCASE",
+    "crawl": "position",
+}
+
+def _connect(path):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            run_id TEXT PRIMARY KEY,
+            completed_at TEXT NOT NULL,
+            database TEXT,
+            procedures INTEGER NOT NULL,
+            high_complexity INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS results (
+            run_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            name TEXT NOT NULL,
+            summary TEXT,
+            complexity INTEGER NOT NULL,
+            priority_score REAL,
+            row TEXT NOT NULL,
+            technical_analysis TEXT,
+            PRIMARY KEY (run_id, position)
+        );
+        CREATE INDEX IF NOT EXISTS idx_results_name ON results(run_id, name);
+        CREATE INDEX IF NOT EXISTS idx_results_complexity ON results(run_id, complexity);
+    """)
+    return conn
+
+def save_results(run_id, combined, technical_analyses, database=None, path=DEFAULT_RESULTS_PATH, keep_runs=DEFAULT_KEEP_RUNS):
+    """
+    Persist a completed run's rows and technical analyses so the UI can reopen it without
+    re-analyzing. Returns the run's entry as latest_run() would.
+    """
+    analyses = {ta["name"]: ta["technical_analysis"] for ta in technical_analyses}
+    conn = _connect(path)
+    try:
+        with conn:
+            conn.execute("DELETE FROM results WHERE run_id = ?", (run_id,))
+            conn.executemany(
+                "INSERT INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (run_id, position, row["sp_name"], row.get("summary"), row["complexity"], row.get("priority_score"),
+                     json.dumps(row, default=str), analyses.get(row["sp_name"]))
+                    for position, row in enumerate(combined)
+                ]
+            )
+            run = {
+                "run_id": run_id,
+                "completed_at": datetime.now().isoformat(timespec="seconds"),
+                "database": database,
+                "procedures": len(combined),
+                "high_complexity": sum(1 for row in combined if row["complexity"] > REFACTORING_THRESHOLD)
+            }
+            conn.execute("INSERT OR REPLACE INTO runs VALUES (:run_id, :completed_at, :database, :procedures, :high_complexity)", run)
+            stale = [row["run_id"] for row in conn.execute(
+                "SELECT run_id FROM runs ORDER BY completed_at DESC, run_id DESC LIMIT -1 OFFSET ?", (keep_runs,)
+            )]
+            for stale_run in stale:
+                conn.execute("DELETE FROM results WHERE run_id = ?", (stale_run,))
+                conn.execute("DELETE FROM runs WHERE run_id = ?", (stale_run,))
+    finally:
+        conn.close()
+    return run
+
+def latest_run(path=DEFAULT_RESULTS_PATH):
+    """The most recently completed run ({run_id, completed_at, database, procedures, high_complexity}), or None."""
+    if not os.path.exists(path):
+        return None
+    conn = _connect(path)
+    try:
+        row = conn.execute("SELECT * FROM runs ORDER BY completed_at DESC, run_id DESC LIMIT 1").fetchone()
+        return dict(row) if row else None
+    finally:
+        conn.close()
+
+def _filters(run_id, search, complexity_above):
+    clauses, params = ["run_id = ?"], [run_id]
+    if search:
+        pattern = "%" + search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        clauses.append("(name LIKE ? ESCAPE '\\' OR summary LIKE ? ESCAPE '\\')")
+        params += [pattern, pattern]
+    if complexity_above is not None:
+        clauses.append("complexity > ?")
+        params.append(complexity_above)
+    return " AND ".join(clauses), params
+
+def count_results(run_id, search="", complexity_above=None, path=DEFAULT_RESULTS_PATH):
+    """Number of results in run_id matching search (name or summary) and scoring above complexity_above."""
+    where, params = _filters(run_id, search, complexity_above)
+    conn = _connect(path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM results WHERE {where}", params).fetchone()[0]
+    finally:
+        conn.close()
+
+def load_results(run_id, search="", complexity_above=None, sort="priority", offset=0, limit=50, path=DEFAULT_RESULTS_PATH):
+    """
+    One page of results: the combined rows, each with its "technical_analysis" text
+    (None when it was skipped).
+    """
+    where, params = _filters(run_id, search, complexity_above)
+    conn = _connect(path)
+    try:
+        rows = conn.execute(
+            f"SELECT row, technical_analysis FROM results WHERE {where} ORDER BY {SORT_ORDERS[sort]} LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+    finally:
+        conn.close()
+    return [{**json.loads(row["row"]), "technical_analysis": row["technical_analysis"]} for row in rows]
@@ -0,0 +1,52 @@
+import math
+
+SECONDS_PER_DAY = 86400
+# Shortest stats window used for rates, so a plan cached a minute ago doesn't look extremely hot
+MIN_STATS_AGE_SECONDS = 3600
+
+def executions_per_day(proc):
+    """Executions per day since the plan was cached (sys.dm_exec_procedure_stats only counts from then)."""
+    count = proc.get("execution_count") or 0
+    age = proc.get("stats_age_seconds")
+    if not count or age is None:
+        return 0.0
+    return count * SECONDS_PER_DAY / max(age, MIN_STATS_AGE_SECONDS)
+
+def hotness(proc):
+    """log10(1 + executions per day): 0 for never run, 3 for a thousand a day, 6 for a million."""
+    return math.log10(1 + executions_per_day(proc))
+
+def _average(total, count):
+    return round(total / count, 2) if count else 0
+
+def runtime_columns(proc, complexity):
+    """
+    Runtime cost columns for a procedure's report row, plus its priority_score
+    (complexity x hotness) used to rank refactoring candidates.
+    """
+    count = proc.get("execution_count") or 0
+    worker = proc.get("total_worker_time_ms") or 0
+    elapsed = proc.get("total_elapsed_time_ms") or 0
+    reads = proc.get("total_logical_reads") or 0
+    proc_hotness = hotness(proc)
+    return {
+        "execution_count": count,
+        "executions_per_day": round(executions_per_day(proc), 2),
+        "total_worker_time_ms": round(worker, 2),
+        "avg_worker_time_ms": _average(worker, count),
+        "total_elapsed_time_ms": round(elapsed, 2),
+        "avg_elapsed_time_ms": _average(elapsed, count),
+        "total_logical_reads": reads,
+        "avg_logical_reads": _average(reads, count),
+        "cached_time": proc.get("cached_time") or "",
+        "hotness": round(proc_hotness, 2),
+        "priority_score": round(complexity * proc_hotness, 2)
+    }
+
+def refresh_runtime(row, proc):
+    """A previously built row with the runtime columns taken from a fresh crawl of proc."""
+    return dict(row, last_execution_time=proc["last_execution_time"], **runtime_columns(proc, row["complexity"]))
+
+def rank_by_priority(rows):
+    """Rows ordered by priority_score (hotness x complexity), then complexity, highest first."""
+    return sorted(rows, key=lambda row: (row.get("priority_score", 0), row["complexity"]), reverse=True)
@@ -0,0 +1,11 @@
+import os
+
+# Values that switch a boolean setting on; anything else switches it off
+TRUE_VALUES = ("1", "true", "yes")
+
+def env_flag(name, default=False):
+    """Boolean setting from the environment ("1", "true" or "yes", any case, mean on); default when unset."""
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in TRUE_VALUES
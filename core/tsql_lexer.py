@@ -0,0 +1,106 @@
+import re
+from collections import namedtuple
+
+# Segment kinds produced by segments()
+CODE = "code"
+COMMENT = "comment"
+STRING = "string"          # 'literal' or N'literal'
+IDENTIFIER = "identifier"  # [bracketed] or "quoted" identifier
+
+# Additional token kinds produced by tokenize()
+WORD = "word"              # keyword or bare identifier, value upper-cased
+VARIABLE = "variable"      # @local or @@global
+SYMBOL = "symbol"          # . ; , ( )
+
+Token = namedtuple("Token", ["kind", "value", "position"])
+
+# Everything that is not plain code: comments, literals and delimited identifiers.
+# Keywords inside these must never be reported.
+_NON_CODE_RE = re.compile(r"""
+     (?P<line_comment>--[^\n]*)
+    |(?P<block_comment>/\*)
+    |(?P<string>[Nn]?'[^']*(?:''[^']*)*')
+    |(?P<bracketed>\[[^\]]*(?:\]\][^\]]*)*\])
+    |(?P<quoted>"[^"]*(?:""[^"]*)*")
+""", re.VERBOSE)
+
+_BLOCK_COMMENT_RE = re.compile(r"/\*|\*/")
+
+# Same rules with non-nesting block comments, for scanners that run a single finditer;
+# combine it with a pattern for code tokens (see agents.complexity_analyzer)
+FLAT_NON_CODE_PATTERN = r"""
+     --[^\n]*
+    |/\*[\s\S]*?(?:\*/|\Z)
+    |[Nn]?'[^']*(?:''[^']*)*'
+    |\[[^\]]*(?:\]\][^\]]*)*\]
+    |"[^"]*(?:""[^"]*)*"
+"""
+
+# A block comment opening inside another one; may also fire on "/*" inside literals,
+# which only costs taking the exact (slower) path
+_NESTED_COMMENT_HINT_RE = re.compile(r"/\*(?:(?!\*/)[\s\S])*?/\*")
+
+_CODE_TOKEN_RE = re.compile(r"(?P<variable>@@?[A-Za-z0-9_#$@]+)|(?P<word>[A-Za-z_#][A-Za-z0-9_#$@]*)|(?P<symbol>[.;,()])")
+
+def _skip_block_comment(sql, position):
+    """Return the index just past the block comment starting at position (T-SQL block comments nest)."""
+    depth = 0
+    for match in _BLOCK_COMMENT_RE.finditer(sql, position):
+        depth += 1 if match.group() == "/*" else -1
+        if depth == 0:
+            return match.end()
+    return len(sql)
+
+def segments(sql):
+    """
+    Split T-SQL source into (kind, start, end) segments in a single left-to-right pass.
+    kind is CODE, COMMENT, STRING or IDENTIFIER; segments are contiguous and cover all of sql.
+    """
+    if not sql:
+        return
+    position = 0
+    search = _NON_CODE_RE.search
+    while True:
+        match = search(sql, position)
+        if match is None:
+            if position < len(sql):
+                yield CODE, position, len(sql)
+            return
+        start = match.start()
+        if start > position:
+            yield CODE, position, start
+        kind = match.lastgroup
+        if kind == "block_comment":
+            end = _skip_block_comment(sql, start)
+            yield COMMENT, start, end
+        else:
+            end = match.end()
+            if kind == "line_comment":
+                yield COMMENT, start, end
+            elif kind == "string":
+                yield STRING, start, end
+            else:
+                yield IDENTIFIER, start, end
+        position = end
+
+def tokenize(sql):
+    """
+    Yield Tokens from T-SQL source.
+    Comments and whitespace are skipped; operators and numbers are ignored.
+    """
+    for kind, start, end in segments(sql):
+        if kind == CODE:
+            for match in _CODE_TOKEN_RE.finditer(sql, start, end):
+                token_kind = match.lastgroup
+                value = match.group().upper() if token_kind == "word" else match.group()
+                yield Token(token_kind, value, match.start())
+        elif kind == STRING:
+            yield Token(STRING, sql[start:end], start)
+        elif kind == IDENTIFIER:
+            quote = sql[start]
+            closing = "]" if quote == "[" else quote
+            yield Token(IDENTIFIER, sql[start + 1:end - 1].replace(closing * 2, closing), start)
+
+def may_nest_comments(sql):
+    """False when sql certainly has no nested block comments, so FLAT_NON_CODE_PATTERN lexes it exactly."""
+    return "/*" in sql and _NESTED_COMMENT_HINT_RE.search(sql) is not None
@@ -1,10 +1,23 @@
 from crewai import Agent, Task, Crew
 from crewai.tools import tool
 from agents.schema_crawler import extract_schema
-from core.prompts import REVERSE_ENGINEER_PROMPT
-from core.llm import call_llm
-from agents.documentation_writer import write_summary
-from agents.csv_generator import write_csv
+from agents.reverse_engineer import reverse_engineer
+from agents.documentation_writer import validate_report_settings, write_summary
+from agents.csv_generator import CsvStreamWriter, DATASET_FORMATS, validate_dataset_format, write_dataset
+from agents.technical_analyzer import analyze_for_refactoring
+from agents.complexity_analyzer import analyze
+from core.executor import run_concurrent
+from core.pipeline import REFACTORING_THRESHOLD, analyze_procedures, build_row, include_stale_callers, restrict_call_graph
+from core.call_graph import call_graph_enabled, load_call_graph
+from core.journal import RunJournal, SUMMARY, COMPLEXITY, TECHNICAL_ANALYSIS
+from core.llm_cache import cache_enabled, get_cache
+from core.manifest import load_manifest, save_manifest, partition, merge_results, build_manifest
+from core.inventory import load_targets, database_name
+from core.multi_database import analyze_targets
+from core.metrics import get_metrics, reset_metrics
+from core.result_store import save_results
+import argparse
+import os
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -13,63 +26,26 @@ load_dotenv('config/settings.env')
 # Core functions that can be called directly
 def reverse_engineer_logic(proc):
     """Core logic for reverse engineering a stored procedure."""
-    return call_llm(REVERSE_ENGINEER_PROMPT.format(name=proc["name"], code=proc["definition"]))
+    return reverse_engineer(proc)["summary"]
 
 def complexity_analysis_logic(proc):
     """Core logic for analyzing complexity of a stored procedure."""
-    definition_upper = proc["definition"].upper()
-    lines = proc["definition"].count("\n")
-    
-    # Calculate complexity factors
-    factors = []
-    weight = 1
-    
-    # Check for complexity factors
-    if "CURSOR" in definition_upper:
-        weight = 2
-        factors.append("Contains CURSOR (2x multiplier)")
-    elif "JOIN" in definition_upper:
-        weight = 1.5
-        factors.append("Contains JOIN operations (1.5x multiplier)")
-    
-    # Count other complexity indicators
-    if "WHILE" in definition_upper or "LOOP" in definition_upper:
-        factors.append("Contains loops")
-    if "IF" in definition_upper or "CASE" in definition_upper:
-        factors.append("Contains conditional logic")
-    if "TRY" in definition_upper and "CATCH" in definition_upper:
-        factors.append("Contains error handling")
-    if "TRANSACTION" in definition_upper or "BEGIN TRAN" in definition_upper:
-        factors.append("Contains transaction management")
-    if "EXEC" in definition_upper or "EXECUTE" in definition_upper:
-        factors.append("Calls other procedures/functions")
-    if "CREATE" in definition_upper and ("TABLE" in definition_upper or "VIEW" in definition_upper):
-        factors.append("Creates database objects")
-    
-    # Add line count factor
-    if lines > 100:
-        factors.append(f"Large procedure ({lines} lines)")
-    elif lines > 50:
-        factors.append(f"Medium-sized procedure ({lines} lines)")
-    else:
-        factors.append(f"Small procedure ({lines} lines)")
-    
-    # Calculate final complexity
-    complexity = min(10, int((lines / 20) * weight))
-    
-    # Create factors explanation
-    factors_explanation = "; ".join(factors) if factors else "Simple procedure with basic operations"
-    
-    return {
-        "complexity": complexity,
-        "lines_of_code": lines,
-        "complexity_factors": factors_explanation
-    }
+    result = analyze(proc)
+    del result["name"]
+    return result
 
 # CrewAI tool wrappers that work with the current procedure context
 # Global counter to make tool calls unique
 tool_call_counter = 0
 
+# Summaries produced by reverse_engineer_tool during kickoff, keyed by procedure name,
+# so the crew run never has to call the LLM a second time for the same procedure
+tool_results = {}
+
+# Errors raised by reverse_engineer_tool, keyed by procedure name. call_llm has already
+# retried them, so the crew run marks the procedure failed instead of calling the LLM again
+tool_errors = {}
+
 @tool("Reverse Engineer Procedure")
 def reverse_engineer_tool(procedure_name: str, analysis_context: str = "default") -> str:
     """Reverse engineer a stored procedure to understand its business logic and functionality.
@@ -94,10 +70,12 @@ def reverse_engineer_tool(procedure_name: str, analysis_context: str = "default"
             if proc["name"] == clean_name:
                 print(f"   🔍 Found procedure {clean_name}, analyzing... (Context: {analysis_context}, Call ID: {unique_call_id})")
                 result = reverse_engineer_logic(proc)
+                tool_results[clean_name] = result
                 print(f"   ✅ Analysis complete for {clean_name}")
                 return result
         return f"Could not find procedure {clean_name} in current context (Context: {analysis_context}, Call ID: {unique_call_id})"
     except Exception as e:
+        tool_errors[clean_name] = e
         error_msg = f"Error analyzing procedure {clean_name}: {str(e)} (Context: {analysis_context}, Call ID: {unique_call_id})"
         print(f"   ❌ {error_msg}")
         return error_msg
@@ -131,16 +109,14 @@ def complexity_tool(procedure_name: str, complexity_context: str = "default") ->
 # Global variable to hold current procedures for tools
 current_procedures = []
 
-def main():
-    global current_procedures
-    
-    print("🚀 Starting CrewAI Stored Procedure Analysis...")
-    print("📊 Extracting stored procedures from database...")
+def run_crew_analysis(procs, csv_writer=None, journal=None):
+    """
+    Analyze procedures one at a time with CrewAI agents, then fan out technical analysis.
+    Stages already in the journal are reused; new ones are recorded as they complete.
+    """
+    global tool_call_counter
     
-    procs = extract_schema()
-    current_procedures = procs  # Set global variable for tools to access
-    print(f"✅ Found {len(procs)} stored procedures")
-
+    metrics = get_metrics()
     summaries = []
     technical_analyses = []
 
@@ -149,8 +125,16 @@ def main():
     for i, proc in enumerate(procs, 1):
         print(f"📋 Analyzing procedure {i}/{len(procs)}: {proc['name']}")
         
+        # Procedures finished before an interruption are rebuilt from the journal
+        if journal and journal.has(proc["name"], SUMMARY) and journal.has(proc["name"], COMPLEXITY):
+            summary = build_row(proc, journal.get(proc["name"], SUMMARY)["summary"], journal.get(proc["name"], COMPLEXITY))
+            summaries.append(summary)
+            if csv_writer:
+                csv_writer.append(summary)
+            print(f"   ⏭️  Already analyzed in this run (journal) - Complexity: {summary['complexity']}/10")
+            continue
+        
         # Reset tool counter for each procedure to ensure uniqueness
-        global tool_call_counter
         tool_call_counter = i * 100  # Ensure unique counter per procedure
         
         # Create fresh agents for each procedure to avoid repetition detection
@@ -204,16 +188,17 @@ def main():
         try:
             # Execute the crew with timeout protection
             print(f"   🚀 Starting CrewAI analysis for {proc['name']}...")
-            result = crew.kickoff()
+            with metrics.stage("crew_analysis", proc["name"]):
+                result = crew.kickoff()
             
-            # Get results from the core logic functions as backup
+            # For complexity, we'll use our direct calculation since it returns structured data
             complexity_data = complexity_analysis_logic(proc)
-            summary_text = reverse_engineer_logic(proc)
+            # Reuse the summary the tool generated during kickoff rather than regenerating it
+            summary_text = tool_results.get(proc["name"])
             
-            # Use CrewAI results if available, otherwise use direct function results
+            # Use CrewAI results if available, otherwise fall back to the tool's result
             if hasattr(result, 'tasks_output') and len(result.tasks_output) >= 1:
                 crew_summary = result.tasks_output[0].raw if result.tasks_output[0] else summary_text
-                # For complexity, we'll use our direct calculation since it returns structured data
                 summary_text = crew_summary
                 print(f"   ✅ CrewAI analysis successful for {proc['name']}")
             else:
@@ -221,32 +206,235 @@ def main():
             
         except Exception as e:
             print(f"   ⚠️  CrewAI execution issue for {proc['name']}: {str(e)[:100]}... Using direct analysis.")
-            # Fallback to direct function calls
             complexity_data = complexity_analysis_logic(proc)
-            summary_text = reverse_engineer_logic(proc)
+            summary_text = tool_results.get(proc["name"])
         
-        summary = {
-            "sp_name": proc["name"],
-            "summary": summary_text,
-            "complexity": complexity_data["complexity"],
-            "lines_of_code": complexity_data["lines_of_code"],
-            "complexity_factors": complexity_data["complexity_factors"],
-            "last_execution_time": proc["last_execution_time"]
-        }
+        # Only call the LLM directly if the tool never ran; a tool failure was already retried
+        error = None
+        if not summary_text:
+            if proc["name"] in tool_errors:
+                error = f"{type(tool_errors[proc['name']]).__name__}: {tool_errors[proc['name']]}"
+                summary_text = f"Analysis failed: {error}"
+            else:
+                summary_text = reverse_engineer_logic(proc)
+        
+        if journal:
+            # A failed summary is left out of the journal so --resume retries it
+            if not error:
+                journal.record(proc["name"], SUMMARY, {"name": proc["name"], "summary": summary_text})
+            journal.record(proc["name"], COMPLEXITY, complexity_data)
+        
+        summary = build_row(proc, summary_text, complexity_data)
+        if error:
+            summary["analysis_error"] = error
         summaries.append(summary)
+        if csv_writer:
+            csv_writer.append(summary)
         
-        print(f"   ✅ Completed - Complexity: {complexity_data['complexity']}/10")
+        if error:
+            print(f"   ❌ Failed - {error}; continuing with the next procedure")
+        else:
+            print(f"   ✅ Completed - Complexity: {complexity_data['complexity']}/10")
+
+    # Technical analysis is independent per procedure, so fan it out concurrently
+    high_complexity = [
+        (proc, summary) for proc, summary in zip(procs, summaries)
+        if summary["complexity"] > REFACTORING_THRESHOLD and not summary.get("analysis_error")
+    ]
+    if high_complexity:
+        print(f"\n🔧 Generating technical analysis for {len(high_complexity)} high-complexity procedures...")
+
+        def technical_analysis(item):
+            proc, summary = item
+            if journal and journal.has(proc["name"], TECHNICAL_ANALYSIS):
+                return journal.get(proc["name"], TECHNICAL_ANALYSIS)
+            with metrics.stage("technical_analyzer", proc["name"]):
+                result = analyze_for_refactoring(proc, summary["complexity"])
+            if journal:
+                journal.record(proc["name"], TECHNICAL_ANALYSIS, result)
+            return result
+
+        def report_latency(index, result, elapsed):
+            print(f"   ✅ Technical analysis complete for {result['name']} ({elapsed:.1f}s)")
+
+        technical_analyses = run_concurrent(technical_analysis, high_complexity, on_complete=report_latency)
+
+    return summaries, technical_analyses
+
+def run_direct_analysis(procs, batch_summaries=None, csv_writer=None, journal=None, call_graph=None, known_callee_summaries=None, near_duplicates=None):
+    """
+    Run the agents' tool logic directly, without CrewAI orchestration, with LLM calls in parallel.
+    With a call_graph, callees are analyzed before their callers and their summaries reused.
+    With near_duplicates, one procedure per near-duplicate cluster is sent to the LLM.
+    """
+    print(f"\n⚡ Direct pipeline - analyzing {len(procs)} procedures concurrently...")
+
+    def report_progress(index, row, elapsed):
+        if row.get("analysis_error"):
+            print(f"   ❌ {row['sp_name']} - Failed: {row['analysis_error']}; continuing with the next procedure")
+        else:
+            print(f"   ✅ {row['sp_name']} - Complexity: {row['complexity']}/10 ({elapsed:.1f}s)")
+        if csv_writer:
+            csv_writer.append(row)
+
+    return analyze_procedures(procs, on_complete=report_progress, batch_summaries=batch_summaries, journal=journal,
+                              call_graph=call_graph, known_callee_summaries=known_callee_summaries, near_duplicates=near_duplicates)
+
+def report_prompt_tokens(rows):
+    """Print how much prompt normalization shrank the definitions sent to the model."""
+    definition_tokens = sum(row.get("definition_tokens") or 0 for row in rows)
+    prompt_tokens = sum(row.get("prompt_tokens") or 0 for row in rows)
+    if definition_tokens:
+        print(f"✂️  Definition tokens: {definition_tokens:,} raw, {prompt_tokens:,} after normalization ({1 - prompt_tokens / definition_tokens:.0%} fewer)")
+
+def report_metrics():
+    """Export the run metrics next to the reports and print the headline numbers."""
+    metrics = get_metrics()
+    json_path, prom_path = metrics.export()
+    totals = metrics.summary()["totals"]
+    print(f"💰 LLM usage: {totals['llm_calls']} calls, {totals['prompt_tokens']:,} prompt + {totals['completion_tokens']:,} completion tokens, "
+          f"~${totals['cost_usd']:.2f} estimated ({totals['cache_hits']} cache hits, {totals['retries']} retries)")
+    print(f"📈 Run metrics saved to {json_path} and {prom_path}")
+
+def main(incremental=False, mode="crew", batch_summaries=None, resume=None, call_graph=None, near_duplicates=None, dataset=None):
+    global current_procedures
+    
+    # Report settings are only read at the end; check them before spending on the LLM
+    validate_report_settings()
+    dataset = validate_dataset_format(dataset)
+    metrics = reset_metrics()
+    if resume:
+        # Pick up an interrupted run with its original options and procedure snapshot
+        journal = RunJournal.open(resume)
+        incremental = journal.options.get("incremental", False)
+        mode = journal.options.get("mode", "crew")
+        batch_summaries = journal.options.get("batch_summaries")
+        call_graph = journal.options.get("call_graph")
+        near_duplicates = journal.options.get("near_duplicates")
+        print(f"🔁 Resuming {'CrewAI' if mode == 'crew' else 'direct'} Stored Procedure Analysis run {resume}...")
+        procs = journal.load_procedures()
+    else:
+        print(f"🚀 Starting {'CrewAI' if mode == 'crew' else 'direct'} Stored Procedure Analysis...")
+        print("📊 Extracting stored procedures from database...")
+        with metrics.stage("crawl"):
+            procs = extract_schema()
+        journal = RunJournal.create(procs, options={"incremental": incremental, "mode": mode, "batch_summaries": batch_summaries, "call_graph": call_graph, "near_duplicates": near_duplicates})
+    current_procedures = procs  # Set global variable for tools to access
+    print(f"✅ Found {len(procs)} stored procedures")
+    print(f"📓 Run ID: {journal.run_id} (resume with: python main.py --resume {journal.run_id})")
+
+    # In incremental mode only new or modified procedures go through the agents
+    to_analyze, carried = procs, {}
+    if incremental:
+        to_analyze, carried = partition(procs, load_manifest())
+        print(f"♻️  {len(carried)} unchanged procedures carried forward, {len(to_analyze)} new or modified")
+
+    # Direct mode can analyze callees first and hand their summaries to callers
+    graph, known_callee_summaries = None, None
+    if mode == "direct" and (call_graph if call_graph is not None else call_graph_enabled()):
+        print("🕸️  Building procedure call graph...")
+        with metrics.stage("call_graph"):
+            full_graph = load_call_graph(procs)
+            if carried:
+                # Unchanged callers of changed procedures were summarized from stale callee summaries
+                modified = len(to_analyze)
+                to_analyze, carried = include_stale_callers(procs, to_analyze, carried, full_graph)
+                if len(to_analyze) > modified:
+                    print(f"♻️  {len(to_analyze) - modified} unchanged callers of modified procedures will be analyzed again")
+            graph, known_callee_summaries = restrict_call_graph(procs, to_analyze, carried, full_graph)
+        print(f"✅ {sum(len(callees) for callees in graph)} calls between procedures to analyze")
+
+    # Rows are streamed to outputs/analysis.csv.partial as they complete, so a crash keeps them
+    csv_writer = CsvStreamWriter()
+    with csv_writer:
+        if mode == "direct":
+            summaries, technical_analyses = run_direct_analysis(to_analyze, batch_summaries, csv_writer, journal, graph, known_callee_summaries, near_duplicates)
+        else:
+            summaries, technical_analyses = run_crew_analysis(to_analyze, csv_writer, journal)
+
+    # Merge fresh results with carried-forward ones, keeping the crawl order
+    if carried:
+        summaries, technical_analyses = merge_results(procs, carried, summaries, technical_analyses)
+    save_manifest(build_manifest(procs, summaries, technical_analyses))
 
     print(f"\n📄 Generating reports...")
-    write_csv(summaries)
-    high_complexity_count = write_summary(summaries, technical_analyses)
+    with metrics.stage("reports"):
+        csv_writer.finalize(summaries)
+        high_complexity_count = write_summary(summaries, technical_analyses)
+        # Typed, partitioned copy of the CSV for dashboards (--dataset / ANALYSIS_DATASET_FORMAT)
+        if dataset:
+            write_dataset(summaries, journal.run_id, database=database_name(os.getenv("DB_CONNECTION_STRING", "")), fmt=dataset)
+    # Lets the Streamlit app open this run's results without re-analyzing
+    save_results(journal.run_id, summaries, technical_analyses, database=database_name(os.getenv("DB_CONNECTION_STRING", "")))
+    journal.mark_complete()
     
-    print(f"\n🎉 CrewAI Analysis Complete!")
+    print(f"\n🎉 {'CrewAI' if mode == 'crew' else 'Direct'} Analysis Complete!")
     print(f"📊 Total procedures analyzed: {len(procs)}")
     print(f"🔧 High-complexity procedures (>3): {high_complexity_count}")
+    failed = [row["sp_name"] for row in summaries if row.get("analysis_error")]
+    if failed:
+        print(f"❌ {len(failed)} procedures failed and are marked with analysis_error: {', '.join(failed[:10])}{' ...' if len(failed) > 10 else ''}")
+        print(f"   Retry them with: python main.py --resume {journal.run_id}")
+    if cache_enabled():
+        cache_stats = get_cache().stats()
+        print(f"💾 LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['entries']} entries)")
+    report_prompt_tokens(summaries)
+    report_metrics()
     print(f"📁 Reports saved to outputs/ directory:")
     print(f"   - outputs/analysis.csv (business summaries)")
     print(f"   - outputs/summary.docx (technical refactoring analysis)")
+    if dataset:
+        print(f"   - outputs/analysis_dataset/ ({dataset} dataset partitioned by run date and database)")
+
+def run_inventory(targets_path=None, incremental=False, batch_summaries=None, dataset=None, resume=None):
+    """Analyze every database in the target inventory with the direct pipeline (resume: an inventory run ID)."""
+    validate_report_settings()
+    dataset = validate_dataset_format(dataset)
+    reset_metrics()
+    targets = load_targets(targets_path)
+    print(f"🚀 Starting multi-database Stored Procedure Analysis ({len(targets)} databases)...")
+    rows, technical_analyses, run_id, failures = analyze_targets(targets, incremental=incremental, batch_summaries=batch_summaries, dataset=dataset, resume_run_id=resume)
+
+    if failures:
+        print(f"\n⚠️  Multi-database Analysis finished with {len(failures)} failed databases:")
+        for name, error in failures.items():
+            print(f"   ❌ {name}: {error}")
+        print(f"   Resume with: python main.py --targets{' ' + targets_path if targets_path else ''} --resume {run_id}")
+    else:
+        print("\n🎉 Multi-database Analysis Complete!")
+    print(f"📊 Total procedures analyzed: {len(rows)} across {len(targets) - len(failures)} databases")
+    print(f"🔧 High-complexity procedures (>3): {len(technical_analyses)}")
+    if cache_enabled():
+        cache_stats = get_cache().stats()
+        print(f"💾 LLM cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses ({cache_stats['entries']} entries)")
+    report_prompt_tokens(rows)
+    report_metrics()
+    print("📁 Reports saved to outputs/ directory:")
+    print("   - outputs/analysis.csv and outputs/summary.docx (all databases)")
+    print("   - outputs/databases/<database>/ (per database)")
+    if dataset:
+        print(f"   - outputs/analysis_dataset/ ({dataset} dataset partitioned by run date and database)")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Analyze stored procedures with CrewAI agents")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only analyze procedures that are new or changed since the last run")
+    parser.add_argument("--mode", choices=["crew", "direct"], default="crew",
+                        help="crew: orchestrate CrewAI agents per procedure; direct: call the agents' logic directly and concurrently")
+    parser.add_argument("--batch-summaries", action="store_true", default=None,
+                        help="Direct mode: summarize several small procedures per LLM request (LLM_BATCH_SUMMARIES)")
+    parser.add_argument("--resume", metavar="RUN_ID",
+                        help="Resume an interrupted run from its journal in outputs/runs/ (or, with --targets, outputs/inventory_runs/), reusing completed stages")
+    parser.add_argument("--call-graph", action="store_true", default=None,
+                        help="Direct mode: analyze callees before callers and give callers their callees' summaries (LLM_CALLEE_SUMMARIES)")
+    parser.add_argument("--near-duplicates", action="store_true", default=None,
+                        help="Direct mode: analyze one procedure per near-duplicate cluster and adapt its results for the rest (LLM_NEAR_DUPLICATES)")
+    parser.add_argument("--targets", nargs="?", const="", metavar="PATH",
+                        help="Analyze every database in the target inventory (default DB_TARGETS_FILE or config/targets.json) with the direct pipeline")
+    parser.add_argument("--dataset", choices=sorted(DATASET_FORMATS),
+                        help="Also write the results as a typed dataset under outputs/analysis_dataset/, partitioned by run date and database (ANALYSIS_DATASET_FORMAT; needs pyarrow)")
+    args = parser.parse_args()
+    if args.targets is not None:
+        run_inventory(args.targets or None, incremental=args.incremental, batch_summaries=args.batch_summaries, dataset=args.dataset, resume=args.resume)
+    else:
+        main(incremental=args.incremental, mode=args.mode, batch_summaries=args.batch_summaries, resume=args.resume, call_graph=args.call_graph, near_duplicates=args.near_duplicates, dataset=args.dataset)
@@ -1,288 +1,275 @@
 import streamlit as st
 import os
+import time
 from dotenv import load_dotenv
-from urllib.parse import unquote
-from agents.schema_crawler import extract_schema
-from agents.reverse_engineer import reverse_engineer
-from agents.complexity_analyzer import analyze
-from agents.technical_analyzer import analyze_for_refactoring
-from agents.documentation_writer import write_summary
-from agents.csv_generator import write_csv
+from core.pipeline import REFACTORING_THRESHOLD
+from core.manifest import DEFAULT_MANIFEST_PATH, load_manifest
+from core.journal import latest_incomplete_run
+from core.inventory import database_name
+from core.analysis_job import start_job, get_job, running_job
+from core.result_store import latest_run, count_results, load_results
+from agents.jira_creator import bulk_create_tickets
 
 # Load environment variables
 load_dotenv('config/settings.env')
 
+# How often a running analysis is polled, and how many in-flight procedures are listed
+POLL_SECONDS = 1.0
+ACTIVE_WINDOW = 20
+# Results and user stories rendered per page
+PAGE_SIZE = 25
+
+SORT_LABELS = {
+    "priority": "Priority (hotness × complexity)",
+    "complexity": "Complexity",
+    "name": "Name",
+    "crawl": "Database order",
+}
+
 def get_database_name():
     """Extract database name from connection string"""
-    connection_string = os.getenv("DB_CONNECTION_STRING", "")
-    try:
-        # Decode URL-encoded connection string
-        decoded = unquote(connection_string)
-        # Look for DATABASE= parameter
-        if "DATABASE=" in decoded:
-            db_part = decoded.split("DATABASE=")[1]
-            db_name = db_part.split(";")[0]
-            return db_name
-    except:
-        pass
-    return "Unknown Database"
+    return database_name(os.getenv("DB_CONNECTION_STRING", ""))
+
+# A saved run never changes, so its queries are cached by run_id and filters
+@st.cache_data(show_spinner=False)
+def cached_count(run_id, search="", complexity_above=None):
+    return count_results(run_id, search, complexity_above)
+
+@st.cache_data(show_spinner=False, max_entries=64)
+def cached_page(run_id, search, complexity_above, sort, offset, limit):
+    return load_results(run_id, search, complexity_above, sort, offset, limit)
+
+@st.cache_data(show_spinner=False, max_entries=4)
+def file_bytes(path, modified):
+    """Report file contents, reloaded only when the file's modification time changes."""
+    with open(path, "rb") as file:
+        return file.read()
+
+def paginate(key, total):
+    """Page picker for total items; returns the offset of the selected page."""
+    pages = max(1, -(-total // PAGE_SIZE))
+    if st.session_state.get(key, 1) > pages:
+        st.session_state[key] = pages
+    page = st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, step=1, key=key)
+    offset = (page - 1) * PAGE_SIZE
+    if total:
+        st.caption(f"Showing {offset + 1}-{min(total, offset + PAGE_SIZE)} of {total}")
+    return offset
+
+def default_story_description(row):
+    """User story description pre-populated from a procedure's summary and technical analysis."""
+    return f"""**Business Function:**
+{row['summary']}
+
+**Technical Analysis & Refactoring Recommendations:**
+{row['technical_analysis'] or 'Technical analysis not available'}
+
+**Complexity Factors:**
+- Lines of Code: {row['lines_of_code']}
+- Contributing Factors: {row['complexity_factors']}
+
+**Acceptance Criteria:**
+
+**Given** the current stored procedure has complexity issues
+**When** the refactoring is completed
+**Then** the procedure should have improved maintainability and reduced complexity score
+
+**Given** the refactored stored procedure is deployed
+**When** it is executed with the same inputs as the original
+**Then** it should produce identical results with improved performance"""
+
+def remember_story_edit(name, field, key):
+    """Keep an edit once its widget is paged out of view (Streamlit drops unrendered widget state)."""
+    st.session_state.story_edits.setdefault(name, {})[field] = st.session_state[key]
+
+def collect_user_stories(run_id):
+    """Every refactoring candidate's user story, with the edits made in this session."""
+    # The definition hash makes a story's idempotency key change when the procedure does
+    manifest = load_manifest()
+    stories = []
+    for row in load_results(run_id, complexity_above=REFACTORING_THRESHOLD, sort="priority", limit=-1):
+        edits = st.session_state.story_edits.get(row["sp_name"], {})
+        stories.append({
+            "title": edits.get("title", f"SP Refactor - {row['sp_name']}"),
+            "description": edits.get("description", default_story_description(row)),
+            "procedure_name": row["sp_name"],
+            "definition_hash": manifest.get(row["sp_name"], {}).get("definition_hash")
+        })
+    return stories
 
 st.title("Stored Procedure Analyzer")
 
 # Initialize session state
 if 'analysis_complete' not in st.session_state:
     st.session_state.analysis_complete = False
-if 'procedures_list' not in st.session_state:
-    st.session_state.procedures_list = []
-if 'current_analysis_index' not in st.session_state:
-    st.session_state.current_analysis_index = -1
+if 'results_run' not in st.session_state:
+    st.session_state.results_run = None
 if 'analysis_in_progress' not in st.session_state:
     st.session_state.analysis_in_progress = False
-if 'high_complexity_count' not in st.session_state:
-    st.session_state.high_complexity_count = 0
 if 'user_stories_generated' not in st.session_state:
     st.session_state.user_stories_generated = False
-if 'combined_data' not in st.session_state:
-    st.session_state.combined_data = []
-if 'technical_analyses' not in st.session_state:
-    st.session_state.technical_analyses = []
-if 'agent_progress' not in st.session_state:
-    st.session_state.agent_progress = {}
+if 'story_edits' not in st.session_state:
+    st.session_state.story_edits = {}
+if 'incremental' not in st.session_state:
+    st.session_state.incremental = False
+if 'resume_run_id' not in st.session_state:
+    st.session_state.resume_run_id = None
+if 'job_id' not in st.session_state:
+    st.session_state.job_id = None
+
+# Analysis runs on a background thread; reattach to it after a browser refresh,
+# otherwise a new session opens the last completed run from the result store
+if 'session_opened' not in st.session_state:
+    st.session_state.session_opened = True
+    job = running_job()
+    if job:
+        st.session_state.job_id = job.id
+        st.session_state.analysis_in_progress = True
+    else:
+        st.session_state.results_run = latest_run()
+        st.session_state.analysis_complete = st.session_state.results_run is not None
 
 # Show Run Analysis button only when not in progress and not complete
 if not st.session_state.analysis_in_progress and not st.session_state.analysis_complete:
+    incremental = st.checkbox(
+        "Only analyze new or changed procedures",
+        value=os.path.exists(DEFAULT_MANIFEST_PATH),
+        help="Procedures whose definition is unchanged since the last run reuse their previous results"
+    )
     if st.button("Run Analysis"):
         st.session_state.analysis_in_progress = True
+        st.session_state.incremental = incremental
+        st.session_state.resume_run_id = None
         st.rerun()
 
-# Run analysis if triggered
+    # Offer to pick up a run that was interrupted (API outage, browser refresh, server restart)
+    interrupted_run = latest_incomplete_run()
+    if interrupted_run:
+        st.info(f"⏸️ Run **{interrupted_run}** did not finish. Resuming reuses every completed agent step.")
+        if st.button("Resume Interrupted Run"):
+            st.session_state.analysis_in_progress = True
+            st.session_state.resume_run_id = interrupted_run
+            st.rerun()
+
+# Start the analysis if triggered, then follow its progress
 if st.session_state.analysis_in_progress and not st.session_state.analysis_complete:
-    with st.spinner("🔍 Schema Crawler Agent: Connecting to database and extracting stored procedures..."):
-        procs = extract_schema()
-    
-    # Store procedures in session state and display count
-    st.session_state.procedures_list = procs
-    st.session_state.current_analysis_index = 0
-    st.session_state.analysis_complete = False
-    
-    # Display total count with database name
-    db_name = get_database_name()
-    st.markdown(f"## {len(procs)} stored procedures analyzed from **{db_name}** database")
-    
-    # Create placeholder for the procedure list
-    procedure_list_placeholder = st.empty()
-    
-    summaries = []
-    complexities = []
-    combined = []
-    technical_analyses = []
+    job = get_job(st.session_state.job_id) if st.session_state.job_id else None
+    if job is None:
+        job = start_job(st.session_state.incremental, st.session_state.resume_run_id)
+        st.session_state.job_id = job.id
+    job.poll()
 
-    # Helper function to update progress display
-    def update_progress_display():
-        with procedure_list_placeholder.container():
-            st.markdown("### Analysis Progress:")
-            for j, p in enumerate(procs):
-                if j < st.session_state.current_analysis_index:
-                    # Already analyzed - show completed with agent history
-                    st.markdown(f"✅ {j+1}. **{p['name']}** - *Completed*")
-                    if p["name"] in st.session_state.agent_progress:
-                        progress = st.session_state.agent_progress[p["name"]]
-                        agent_list = "<ul style='margin-left: 25px;'>"
-                        agent_list += "<li><strong>Reverse Engineer Agent</strong>: <em style='color: green;'>Business logic analysis completed</em></li>"
-                        agent_list += "<li><strong>Complexity Analyzer Agent</strong>: <em style='color: green;'>Complexity metrics calculated</em></li>"
-                        if progress["technical_analyzer"] == "completed":
-                            agent_list += "<li><strong>Technical Analyzer Agent</strong>: <em style='color: red;'>Refactoring recommendations generated</em></li>"
-                        elif progress["technical_analyzer"] == "skipped":
-                            agent_list += "<li><strong>Technical Analyzer Agent</strong>: <em style='color: orange;'>Skipped (low complexity)</em></li>"
-                        agent_list += "</ul>"
-                        st.markdown(agent_list, unsafe_allow_html=True)
-                elif j == st.session_state.current_analysis_index:
-                    # Currently analyzing - show current progress
-                    st.markdown(f"🔄 {j+1}. **{p['name']}** - *Analysis in progress...*")
-                    if p["name"] in st.session_state.agent_progress:
-                        progress = st.session_state.agent_progress[p["name"]]
-                        agent_list = "<ul style='margin-left: 25px;'>"
-                        
-                        # Show reverse engineer status
-                        if progress["reverse_engineer"] == "active":
-                            agent_list += "<li><strong>Reverse Engineer Agent</strong>: <em>Analyzing business logic...</em></li>"
-                        elif progress["reverse_engineer"] == "completed":
-                            agent_list += "<li><strong>Reverse Engineer Agent</strong>: <em style='color: green;'>Business logic analysis completed</em></li>"
-                        
-                        # Show complexity analyzer status
-                        if progress["complexity_analyzer"] == "active":
-                            agent_list += "<li><strong>Complexity Analyzer Agent</strong>: <em>Calculating complexity metrics...</em></li>"
-                        elif progress["complexity_analyzer"] == "completed":
-                            agent_list += "<li><strong>Complexity Analyzer Agent</strong>: <em style='color: green;'>Complexity metrics calculated</em></li>"
-                        elif progress["complexity_analyzer"] == "pending" and progress["reverse_engineer"] == "completed":
-                            agent_list += "<li><strong>Complexity Analyzer Agent</strong>: <em>Pending...</em></li>"
-                        
-                        # Show technical analyzer status
-                        if progress["technical_analyzer"] == "active":
-                            agent_list += "<li><strong>Technical Analyzer Agent</strong>: <em>Generating refactoring recommendations...</em></li>"
-                        elif progress["technical_analyzer"] == "completed":
-                            agent_list += "<li><strong>Technical Analyzer Agent</strong>: <em style='color: red;'>Refactoring recommendations generated</em></li>"
-                        elif progress["technical_analyzer"] == "skipped":
-                            agent_list += "<li><strong>Technical Analyzer Agent</strong>: <em style='color: orange;'>Skipped (low complexity)</em></li>"
-                        
-                        agent_list += "</ul>"
-                        st.markdown(agent_list, unsafe_allow_html=True)
-                else:
-                    # Not yet analyzed
-                    st.markdown(f"⏳ {j+1}. **{p['name']}** - *Pending*")
+    if job.status == "complete":
+        st.session_state.results_run = job.result
+        st.session_state.story_edits = {}
+        st.session_state.analysis_complete = True
+        st.session_state.analysis_in_progress = False
+        st.session_state.job_id = None
+        st.rerun()
+    elif job.status == "failed":
+        st.error(f"❌ Analysis failed: {job.error}")
+        st.session_state.analysis_in_progress = False
+        st.session_state.job_id = None
+        if st.button("Back"):
+            st.rerun()
+    else:
+        # Only aggregate counters and a window of items are rendered, however many procedures there are
+        db_name = get_database_name()
+        if job.total:
+            st.markdown(f"## Analyzing {job.total} stored procedures from **{db_name}** database")
+        st.markdown(job.phase)
+        analyzed = job.completed + job.carried
+        st.progress(analyzed / job.total if job.total else 0.0)
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Completed", f"{analyzed}/{job.total}" if job.total else "-")
+        col2.metric("In progress", len(job.active))
+        col3.metric("Flagged for refactoring", job.high_complexity)
+        col4.metric("Elapsed", f"{job.elapsed:.0f}s")
+        if job.carried:
+            st.markdown(f"♻️ {job.carried} unchanged procedures carried forward from the previous run")
 
-    for i, proc in enumerate(procs):
-        # Update current analysis index
-        st.session_state.current_analysis_index = i
-        
-        # Initialize agent progress for this procedure
-        if proc["name"] not in st.session_state.agent_progress:
-            st.session_state.agent_progress[proc["name"]] = {
-                "reverse_engineer": "pending",
-                "complexity_analyzer": "pending", 
-                "technical_analyzer": "pending"
-            }
-        
-        # Agent 1: Reverse Engineer Agent
-        st.session_state.agent_progress[proc["name"]]["reverse_engineer"] = "active"
-        update_progress_display()
-        summary = reverse_engineer(proc)
-        st.session_state.agent_progress[proc["name"]]["reverse_engineer"] = "completed"
-        
-        # Agent 2: Complexity Analyzer Agent
-        st.session_state.agent_progress[proc["name"]]["complexity_analyzer"] = "active"
-        update_progress_display()
-        complexity = analyze(proc)
-        st.session_state.agent_progress[proc["name"]]["complexity_analyzer"] = "completed"
-        
-        # Agent 3: Technical Analyzer Agent (conditional)
-        if complexity["complexity"] > 3:
-            st.session_state.agent_progress[proc["name"]]["technical_analyzer"] = "active"
-            update_progress_display()
-            technical_analysis = analyze_for_refactoring(proc, complexity["complexity"])
-            technical_analyses.append(technical_analysis)
-            st.session_state.agent_progress[proc["name"]]["technical_analyzer"] = "completed"
-        else:
-            st.session_state.agent_progress[proc["name"]]["technical_analyzer"] = "skipped"
-        
-        # Combine all data including last execution time
-        combined_data = {
-            "sp_name": proc["name"],
-            "summary": summary["summary"],
-            "complexity": complexity["complexity"],
-            "lines_of_code": complexity["lines_of_code"],
-            "complexity_factors": complexity["complexity_factors"],
-            "last_execution_time": proc["last_execution_time"]
+        agent_labels = {
+            "reverse_engineer": "Reverse Engineer Agent: analyzing business logic...",
+            "complexity_analyzer": "Complexity Analyzer Agent: calculating complexity metrics...",
+            "technical_analyzer": "Technical Analyzer Agent: generating refactoring recommendations..."
         }
-        combined.append(combined_data)
-        summaries.append(summary)
-        complexities.append(complexity)
-
-    # Clear the progress display when analysis is complete
-    procedure_list_placeholder.empty()
+        if job.active:
+            st.markdown("### In progress:")
+            active = sorted(job.active.items())
+            for name, agent in active[:ACTIVE_WINDOW]:
+                st.markdown(f"🔄 **{name}** - *{agent_labels.get(agent, agent)}*")
+            if len(active) > ACTIVE_WINDOW:
+                st.markdown(f"*...and {len(active) - ACTIVE_WINDOW} more*")
+        if job.recent:
+            st.markdown("### Recently completed:")
+            for item in reversed(job.recent):
+                st.markdown(f"✅ **{item['name']}** - Complexity: {item['complexity']}/10 ({item['elapsed']:.1f}s)")
 
-    # Show final report generation phase
-    report_status = st.empty()
-    
-    # Generate CSV output
-    with report_status.container():
-        st.markdown("#### 📋 Final Report Generation")
-        st.markdown("📋 **CSV Generator Agent**: Creating analysis spreadsheet...")
-    write_csv(combined)
-    
-    # Generate Word document summary
-    with report_status.container():
-        st.markdown("#### 📋 Final Report Generation")
-        st.markdown("📝 **Documentation Writer Agent**: Compiling refactoring report...")
-    high_complexity_count = write_summary(combined, technical_analyses)
-    
-    # Clear report status
-    report_status.empty()
-    
-    # Store results in session state
-    st.session_state.analysis_complete = True
-    st.session_state.analysis_in_progress = False
-    st.session_state.high_complexity_count = high_complexity_count
-    st.session_state.combined_data = combined
-    st.session_state.technical_analyses = technical_analyses
-    
-    # Show completion message with summary
-    st.success("Analysis complete!")
-
-# Display procedure list if analysis has been run but not yet complete
-elif st.session_state.procedures_list and not st.session_state.analysis_complete:
-    st.markdown(f"## {len(st.session_state.procedures_list)} stored procedures found")
-    st.markdown("### Analysis Progress:")
-    for i, proc in enumerate(st.session_state.procedures_list):
-        if i < st.session_state.current_analysis_index:
-            st.markdown(f"✅ {i+1}. **{proc['name']}** - *Completed*")
-        elif i == st.session_state.current_analysis_index:
-            st.markdown(f"🔄 {i+1}. **{proc['name']}** - *Currently analyzing...*")
-        else:
-            st.markdown(f"⏳ {i+1}. **{proc['name']}** - *Pending*")
+        time.sleep(POLL_SECONDS)
+        st.rerun()
 
 # Show completed analysis results and download buttons if analysis is complete
 if st.session_state.analysis_complete:
-    # Display completed procedures list with agent audit trail
-    if st.session_state.procedures_list:
-        db_name = get_database_name()
-        st.markdown(f"## {len(st.session_state.procedures_list)} stored procedures analyzed from **{db_name}** database")
-        st.markdown("### Analysis Results:")
-        for i, proc in enumerate(st.session_state.procedures_list):
-            st.markdown(f"✅ {i+1}. **{proc['name']}** - *Completed*")
-            # Show agent audit trail
-            if proc["name"] in st.session_state.agent_progress:
-                progress = st.session_state.agent_progress[proc["name"]]
-                agent_list = "<ul style='margin-left: 25px;'>"
-                agent_list += "<li><strong>Reverse Engineer Agent</strong>: <em style='color: green;'>Business logic analysis completed</em></li>"
-                agent_list += "<li><strong>Complexity Analyzer Agent</strong>: <em style='color: green;'>Complexity metrics calculated</em></li>"
-                if progress["technical_analyzer"] == "completed":
-                    agent_list += "<li><strong>Technical Analyzer Agent</strong>: <em style='color: red;'>Refactoring recommendations generated</em></li>"
-                elif progress["technical_analyzer"] == "skipped":
-                    agent_list += "<li><strong>Technical Analyzer Agent</strong>: <em style='color: orange;'>Skipped (low complexity)</em></li>"
-                agent_list += "</ul>"
-                st.markdown(agent_list, unsafe_allow_html=True)
-        
-        # Show summary
-        st.info(f"📊 **Summary**: {len(st.session_state.procedures_list)} procedures analyzed, {st.session_state.high_complexity_count} flagged for refactoring review (complexity > 3)")
+    run = st.session_state.results_run
+    st.markdown(f"## {run['procedures']} stored procedures analyzed from **{run['database'] or get_database_name()}** database")
+    st.caption(f"Run {run['run_id']}, completed {run['completed_at']}")
+    if st.button("🔄 Run New Analysis"):
+        st.session_state.analysis_complete = False
+        st.session_state.user_stories_generated = False
+        st.rerun()
+
+    # Only the current page of results is queried and rendered
+    st.markdown("### Analysis Results:")
+    col1, col2 = st.columns([2, 1])
+    search = col1.text_input("Search", key="results_search", placeholder="Procedure name or summary text")
+    sort = col2.selectbox("Sort by", list(SORT_LABELS), format_func=SORT_LABELS.get, key="results_sort")
+    candidates_only = st.checkbox("Refactoring candidates only", key="results_candidates")
+    complexity_above = REFACTORING_THRESHOLD if candidates_only else None
+    total = cached_count(run["run_id"], search, complexity_above)
+    offset = paginate("results_page", total)
+    for row in cached_page(run["run_id"], search, complexity_above, sort, offset, PAGE_SIZE):
+        flagged = row["complexity"] > REFACTORING_THRESHOLD
+        with st.expander(f"{'🔧' if flagged else '✅'} **{row['sp_name']}** - Complexity: {row['complexity']}/10"):
+            st.markdown(f"**Business summary:** {row['summary']}")
+            st.markdown(f"**Complexity factors:** {row['complexity_factors']}")
+            if row["technical_analysis"]:
+                st.markdown("**Technical Analyzer Agent** - refactoring recommendations:")
+                st.markdown(row["technical_analysis"])
+            else:
+                st.markdown("*Technical Analyzer Agent skipped (low complexity)*")
+
+    # Show summary
+    st.info(f"📊 **Summary**: {run['procedures']} procedures analyzed, {run['high_complexity']} flagged for refactoring review (complexity > {REFACTORING_THRESHOLD})")
     st.markdown("### 📥 Download Reports")
     
     col1, col2 = st.columns(2)
     
     with col1:
         if os.path.exists("outputs/analysis.csv"):
-            with open("outputs/analysis.csv", "rb") as file:
-                st.download_button(
-                    label="📊 Download Excel/CSV Report",
-                    data=file.read(),
-                    file_name="stored_procedures_analysis.csv",
-                    mime="text/csv",
-                    help="Complete analysis with 3-sentence business summaries for all procedures"
-                )
+            st.download_button(
+                label="📊 Download Excel/CSV Report",
+                data=file_bytes("outputs/analysis.csv", os.path.getmtime("outputs/analysis.csv")),
+                file_name="stored_procedures_analysis.csv",
+                mime="text/csv",
+                help="Complete analysis with 3-sentence business summaries for all procedures"
+            )
     
     with col2:
         if os.path.exists("outputs/summary.docx"):
-            with open("outputs/summary.docx", "rb") as file:
-                st.download_button(
-                    label="📋 Download Refactoring Report",
-                    data=file.read(),
-                    file_name="refactoring_candidates.docx",
-                    mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-                    help="Detailed technical analysis for procedures with complexity > 3"
-                )
+            st.download_button(
+                label="📋 Download Refactoring Report",
+                data=file_bytes("outputs/summary.docx", os.path.getmtime("outputs/summary.docx")),
+                file_name="refactoring_candidates.docx",
+                mime="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
+                help="Detailed technical analysis for procedures with complexity > 3"
+            )
     
     # JIRA User Stories Section
     st.markdown("---")
     st.markdown("### 🎫 JIRA User Stories")
     
-    # Get high-complexity procedures for user story generation
-    high_complexity_procs = [proc for proc in st.session_state.procedures_list if any(
-        combined_data["sp_name"] == proc["name"] and combined_data["complexity"] > 3 
-        for combined_data in st.session_state.get('combined_data', [])
-    )]
-    
-    if st.session_state.high_complexity_count > 0:
-        st.info(f"📋 {st.session_state.high_complexity_count} stored procedures were identified as needing refactoring. Would you like to generate JIRA user stories for these procedures?")
+    if run["high_complexity"] > 0:
+        st.info(f"📋 {run['high_complexity']} stored procedures were identified as needing refactoring. Would you like to generate JIRA user stories for these procedures?")
         
         if st.button("🎫 Generate User Stories"):
             st.session_state.user_stories_generated = True
@@ -292,69 +279,69 @@ if st.session_state.analysis_complete:
 
 # Display user stories if generated
 if st.session_state.get('user_stories_generated', False) and st.session_state.analysis_complete:
+    run = st.session_state.results_run
     st.markdown("---")
     st.markdown("### ✏️ Edit User Stories")
     st.info("Review and edit the user stories below before pushing to JIRA. Each story is pre-populated with information from the technical analysis.")
     
-    # Get high-complexity procedures and their technical analyses
-    high_complexity_data = [data for data in st.session_state.combined_data if data["complexity"] > 3]
-    
-    user_stories = []
+    # One page of stories at a time, highest priority first; edits are kept across pages
+    story_search = st.text_input("Search", key="story_search", placeholder="Procedure name or summary text")
+    story_total = cached_count(run["run_id"], story_search, REFACTORING_THRESHOLD)
+    story_offset = paginate("story_page", story_total)
     
-    for i, proc_data in enumerate(high_complexity_data):
-        # Find corresponding technical analysis
-        tech_analysis = next((ta for ta in st.session_state.technical_analyses if ta["name"] == proc_data["sp_name"]), None)
+    for i, proc_data in enumerate(cached_page(run["run_id"], story_search, REFACTORING_THRESHOLD, "priority", story_offset, PAGE_SIZE), story_offset + 1):
+        name = proc_data["sp_name"]
+        edits = st.session_state.story_edits.get(name, {})
+        st.markdown(f"#### User Story {i}")
         
-        st.markdown(f"#### User Story {i+1}")
-        
-        # Editable title
-        title = st.text_input(
-            f"Title {i+1}:",
-            value=f"SP Refactor - {proc_data['sp_name']}",
-            key=f"title_{i}"
+        # Editable title; widget keys follow the procedure, not the position on the page
+        st.text_input(
+            f"Title {i}:",
+            value=edits.get("title", f"SP Refactor - {name}"),
+            key=f"title_{name}",
+            on_change=remember_story_edit,
+            args=(name, "title", f"title_{name}")
         )
         
-        # Create description with business summary and technical analysis
-        description_content = f"""**Business Function:**
-{proc_data['summary']}
-
-**Technical Analysis & Refactoring Recommendations:**
-{tech_analysis['technical_analysis'] if tech_analysis else 'Technical analysis not available'}
-
-**Complexity Factors:**
-- Lines of Code: {proc_data['lines_of_code']}
-- Contributing Factors: {proc_data['complexity_factors']}
-
-**Acceptance Criteria:**
-
-**Given** the current stored procedure has complexity issues
-**When** the refactoring is completed
-**Then** the procedure should have improved maintainability and reduced complexity score
-
-**Given** the refactored stored procedure is deployed
-**When** it is executed with the same inputs as the original
-**Then** it should produce identical results with improved performance"""
-        
-        # Editable description
-        description = st.text_area(
-            f"Description {i+1}:",
-            value=description_content,
-            height=300,
-            key=f"description_{i}"
-        )
-        
-        user_stories.append({
-            "title": title,
-            "description": description,
-            "procedure_name": proc_data['sp_name']
-        })
+        # Editable description, pre-populated only when first shown
+        with st.expander("Description", expanded=False):
+            st.text_area(
+                f"Description {i}:",
+                value=edits.get("description") or default_story_description(proc_data),
+                height=300,
+                key=f"description_{name}",
+                on_change=remember_story_edit,
+                args=(name, "description", f"description_{name}")
+            )
         
         st.markdown("---")
     
-    # Store user stories in session state
-    st.session_state.user_stories = user_stories
-    
-    # Push to JIRA button (placeholder)
+    # Push to JIRA in bulk; stories pushed before (same procedure and definition) are not recreated
     if st.button("🚀 Push User Stories to JIRA", type="primary"):
-        st.warning("🚧 JIRA integration coming soon! Your user stories are ready to be pushed.")
-        st.success(f"✅ {len(user_stories)} user stories prepared for JIRA")
+        if not os.getenv("JIRA_SERVER"):
+            st.error("❌ JIRA_SERVER is not set in config/settings.env")
+        else:
+            user_stories = collect_user_stories(run["run_id"])
+            st.session_state.user_stories = user_stories
+            push_progress = st.progress(0.0, text=f"Pushing {len(user_stories)} user stories to JIRA...")
+            try:
+                pushed = bulk_create_tickets(
+                    user_stories,
+                    on_batch=lambda done, total: push_progress.progress(done / total, text=f"Pushed batch {done} of {total}")
+                )
+            except Exception as e:
+                st.error(f"❌ JIRA push failed: {e}")
+            else:
+                push_progress.empty()
+                statuses = {status: [p for p in pushed if p["status"] == status] for status in ("created", "existing", "failed")}
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Created", len(statuses["created"]))
+                col2.metric("Already in JIRA", len(statuses["existing"]))
+                col3.metric("Failed", len(statuses["failed"]))
+                if statuses["failed"]:
+                    st.error(f"❌ {len(statuses['failed'])} user stories could not be pushed; pushing again retries only these")
+                    with st.expander("Failures"):
+                        for p in statuses["failed"]:
+                            st.write(f"**{p['procedure_name']}**: {p['error']}")
+                else:
+                    st.success(f"✅ {len(pushed)} user stories are in JIRA")